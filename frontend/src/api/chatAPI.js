@@ -2,16 +2,17 @@ import api from './axiosConfig';
 
 const chatAPI = {
   // Pokoje
-  getChatRooms: () => api.get('/chat/rooms/'),
-  createChatRoom: (name) => api.post('/chat/rooms/', { name }),
-  getChatRoomDetail: (id) => api.get(`/chat/rooms/${id}/`),
-  updateChatRoom: (id, data) => api.put(`/chat/rooms/${id}/`, data),
-  deleteChatRoom: (id) => api.delete(`/chat/rooms/${id}/`),
+  getChatRooms: () => api.get('/court/chat/rooms/'),
+  createChatRoom: (name) => api.post('/court/chat/rooms/', { name }),
+  getChatRoomDetail: (id) => api.get(`/court/chat/rooms/${id}/`),
+  updateChatRoom: (id, data) => api.put(`/court/chat/rooms/${id}/`, data),
+  deleteChatRoom: (id) => api.delete(`/court/chat/rooms/${id}/`),
 
   // Wiadomości
-  getRoomMessages: (roomId) => api.get(`/chat/rooms/${roomId}/messages/`),
+  // Stronicowane: { results, before, after, has_more }; starsze przez params.before
+  getRoomMessages: (roomId, params = {}) => api.get(`/court/chat/rooms/${roomId}/messages/`, { params }),
   sendMessage: (roomId, content) => 
-    api.post(`/chat/rooms/${roomId}/messages/`, { content }),
+    api.post(`/court/chat/rooms/${roomId}/messages/`, { content }),
   getMessageDetail: (messageId) => api.get(`/chat/messages/${messageId}/`),
   editMessage: (messageId, content) => 
     api.put(`/chat/messages/${messageId}/`, { content }),
@@ -0,0 +1,72 @@
+import API from './axiosConfig';
+
+// Pliki większe od progu idą w kawałkach (/court/uploads/), mniejsze zwykłym multipart
+export const CHUNKED_UPLOAD_THRESHOLD = 8 * 1024 * 1024;
+const MAX_RETRIES = 3;
+
+const toHex = (buffer) =>
+  Array.from(new Uint8Array(buffer)).map((b) => b.toString(16).padStart(2, '0')).join('');
+
+const sha256 = async (blob) => toHex(await crypto.subtle.digest('SHA-256', await blob.arrayBuffer()));
+
+const sleep = (ms) => new Promise((resolve) => setTimeout(resolve, ms));
+
+const putChunk = async (sessionId, file, offset, chunkSize) => {
+  const chunk = file.slice(offset, Math.min(offset + chunkSize, file.size));
+  const chunkSum = await sha256(chunk);
+
+  for (let attempt = 0; ; attempt += 1) {
+    try {
+      return await API.put(`/court/uploads/${sessionId}/`, chunk, {
+        headers: {
+          'Content-Type': 'application/octet-stream',
+          'Content-Range': `bytes ${offset}-${offset + chunk.size - 1}/${file.size}`,
+          'X-Chunk-SHA256': chunkSum,
+        },
+        timeout: 0,
+      });
+    } catch (err) {
+      const status = err.response?.status;
+      // 409/410 - sesja zamknięta lub wygasła, ponawianie nic nie da
+      if (attempt >= MAX_RETRIES || status === 409 || status === 410) throw err;
+      await sleep(500 * 2 ** attempt);
+    }
+  }
+};
+
+/**
+ * Wznawialne przesyłanie pliku w kawałkach.
+ * purpose: 'document' ({title, description, case}) albo 'attachment' ({recipient_id, content}).
+ * Zwraca utworzony dokument / wiadomość (jak zwykły POST).
+ */
+export const uploadInChunks = async (file, purpose, fields, { onProgress } = {}) => {
+  const checksum = await sha256(file);
+  const { data: session } = await API.post('/court/uploads/', {
+    filename: file.name,
+    size: file.size,
+    purpose,
+    checksum,
+  });
+
+  // Serwer zwraca brakujące offsety - po przerwie wysyłamy tylko je
+  const pending = [...session.missing_offsets];
+  let sent = session.bytes_received;
+  const worker = async () => {
+    while (pending.length > 0) {
+      const offset = pending.shift();
+      const { data } = await putChunk(session.id, file, offset, session.chunk_size);
+      sent += data.size;
+      if (onProgress) onProgress(Math.round((sent / file.size) * 100));
+    }
+  };
+
+  try {
+    const workers = Math.min(session.max_concurrency, pending.length);
+    await Promise.all(Array.from({ length: workers }, worker));
+    const { data } = await API.post(`/court/uploads/${session.id}/complete/`, { ...fields, checksum }, { timeout: 0 });
+    return data;
+  } catch (err) {
+    API.delete(`/court/uploads/${session.id}/`).catch(() => {});
+    throw err;
+  }
+};
@@ -29,7 +29,6 @@ import {
 } from '@mui/icons-material';
 import { useNavigate } from 'react-router-dom';
 import { ThemeContext } from '../contexts/ThemeContext';
-import useNotifications from '../hooks/useNotifications';
 import useAuth from '../hooks/useAuth';
 import API from '../api/axiosConfig'; // Dodane do pobrania statusu
 
@@ -42,13 +41,14 @@ const getNotificationIcon = (type) => {
     }
 };
 
-const Header = () => {
+const Header = ({ notificationState }) => {
   const navigate = useNavigate();
   const theme = useTheme();
   const { currentTheme } = useContext(ThemeContext);
   
   const { user: authUser } = useAuth();
-  const { notifications, unreadCount, markAsRead, markAllAsRead, deleteNotification } = useNotifications();
+  // Stan powiadomień pochodzi z DashboardLayout (jedno połączenie WebSocket dla nagłówka i menu)
+  const { notifications, unreadCount, markAsRead, markAllAsRead, deleteNotification } = notificationState;
 
   // Ograniczenie do 5 ostatnich powiadomień
   const displayedNotifications = notifications.slice(0, 5);
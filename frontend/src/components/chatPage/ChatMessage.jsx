@@ -148,8 +148,8 @@ const ChatMessage = ({ message, currentUserId, selectedUser }) => {
                       maxWidth: '200px'
                     }}
                   >
-                    {/* Jeśli nie mamy nazwy pliku w URL, wyświetl generyczną */}
-                    {attachmentUrl.split('/').pop() || 'Dokument'}
+                    {/* Oryginalna nazwa pliku - w URL jest suma treści z magazynu plików */}
+                    {message.attachment_name || attachmentUrl.split('/').pop() || 'Dokument'}
                   </Typography>
                   <Typography variant="caption" sx={{ opacity: 0.8 }}>
                     Kliknij, aby pobrać
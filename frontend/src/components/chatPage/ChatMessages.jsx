@@ -2,6 +2,7 @@
 import React, { useRef, useEffect } from 'react';
 import {
   Box,
+  Button,
   Divider,
   Chip,
   CircularProgress,
@@ -34,14 +35,18 @@ const ChatMessages = ({
   error,
   currentUserId,
   selectedUser,
+  hasOlder = false,
+  loadingOlder = false,
+  onLoadOlder,
 }) => {
   const theme = useTheme();
   const messagesEndRef = useRef(null);
+  const lastMessageId = messages.length ? messages[messages.length - 1].id : null;
 
-  // Scroll do ostatniej wiadomości
+  // Scroll do ostatniej wiadomości (nie przy doładowaniu starszych)
   useEffect(() => {
     messagesEndRef.current?.scrollIntoView({ behavior: 'smooth' });
-  }, [messages]);
+  }, [lastMessageId]);
 
   // Grupuj wiadomości po dacie
   const groupedMessages = messages.reduce((acc, msg) => {
@@ -80,6 +85,14 @@ const ChatMessages = ({
         </Alert>
       )}
 
+      {!loading && hasOlder && (
+        <Box sx={{ display: 'flex', justifyContent: 'center' }}>
+          <Button size="small" onClick={onLoadOlder} disabled={loadingOlder}>
+            {loadingOlder ? 'Ładowanie...' : 'Wcześniejsze wiadomości'}
+          </Button>
+        </Box>
+      )}
+
       {loading ? (
         <Box
           sx={{
@@ -13,6 +13,7 @@ import {
   InputAdornment,
   Box,
   Badge,
+  Chip,
   CircularProgress,
   Alert,
 } from '@mui/material';
@@ -193,10 +194,20 @@ const ChatUsersList = ({
                         display: 'block',
                       }}
                     >
-                      {u.is_online ? 'Dostępny' : 'Niedostępny'}
+                      {u.last_message
+                        ? (u.last_message.content || (u.last_message.has_attachment ? '📎 Załącznik' : ''))
+                        : (u.is_online ? 'Dostępny' : 'Niedostępny')}
                     </Typography>
                   }
                 />
+                {u.unread_count > 0 && (
+                  <Chip
+                    label={u.unread_count}
+                    size="small"
+                    color="primary"
+                    sx={{ ml: 1, fontWeight: '600' }}
+                  />
+                )}
               </ListItemButton>
               {index < users.length - 1 && (
                 <Divider sx={{ borderColor: theme.palette.divider }} />
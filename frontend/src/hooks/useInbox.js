@@ -0,0 +1,30 @@
+import { useState, useEffect, useCallback } from 'react';
+import API from '../api/axiosConfig';
+
+// Rozmowy prywatne: rozmówca, ostatnia wiadomość i liczba nieprzeczytanych
+const useInbox = () => {
+  const [data, setData] = useState([]);
+  const [loading, setLoading] = useState(true);
+  const [error, setError] = useState(null);
+
+  const fetchInbox = useCallback(async () => {
+    try {
+      setError(null);
+      const response = await API.get('/court/messages/inbox/');
+      setData(response.data);
+    } catch (err) {
+      setError(err.message || 'Błąd przy pobieraniu rozmów');
+      console.error('Error fetching inbox:', err);
+    } finally {
+      setLoading(false);
+    }
+  }, []);
+
+  useEffect(() => {
+    fetchInbox();
+  }, [fetchInbox]);
+
+  return { data, loading, error, refetch: fetchInbox };
+};
+
+export default useInbox;
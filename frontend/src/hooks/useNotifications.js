@@ -2,9 +2,12 @@ import { useState, useEffect, useCallback } from 'react';
 import API from '../api/axiosConfig';
 import useWebSocket from './useWebSocket';
 
+const NOTIFICATIONS_PAGE_SIZE = 20;
+
 const useNotifications = () => {
   const [notifications, setNotifications] = useState([]);
   const [unreadCount, setUnreadCount] = useState(0);
+  const [unreadMessagesCount, setUnreadMessagesCount] = useState(0);
   const [loading, setLoading] = useState(true);
 
   // Funkcja pomocnicza do odtwarzania dźwięku
@@ -27,10 +30,11 @@ const useNotifications = () => {
   const fetchNotifications = useCallback(async () => {
     try {
       const [listRes, countRes] = await Promise.all([
-        API.get('/court/notifications/'),
+        // Tylko pierwsza strona - nagłówek pokazuje najnowsze, licznik przychodzi osobno
+        API.get('/court/notifications/', { params: { page_size: NOTIFICATIONS_PAGE_SIZE } }),
         API.get('/court/notifications/unread-count/')
       ]);
-      setNotifications(listRes.data);
+      setNotifications(listRes.data.results);
       setUnreadCount(countRes.data.unread_count);
     } catch (error) {
       console.error("Błąd pobierania powiadomień:", error);
@@ -48,11 +52,15 @@ const useNotifications = () => {
     if (message.type === 'notification') {
       const newNotif = message.data;
       
+      // Licznik przychodzi zaraz potem ramką unread_counts (wartość bezwzględna z serwera)
       setNotifications(prev => [newNotif, ...prev]);
-      setUnreadCount(prev => prev + 1);
 
       // ODTWÓRZ DŹWIĘK przy nadejściu nowego powiadomienia
       playNotificationSound();
+    } else if (message.type === 'unread_counts') {
+      // Serwer wysyła aktualne liczniki po każdej zmianie - bez odpytywania API
+      setUnreadCount(message.notifications);
+      setUnreadMessagesCount(message.messages);
     }
   }, []);
 
@@ -63,10 +71,10 @@ const useNotifications = () => {
     try {
       await API.put(`/court/notifications/${id}/read/`);
       
+      // Licznik aktualizuje ramka unread_counts - bez lokalnego odejmowania
       setNotifications(prev => prev.map(n => 
         n.id === id ? { ...n, is_read: true } : n
       ));
-      setUnreadCount(prev => Math.max(0, prev - 1));
     } catch (error) {
       console.error("Błąd oznaczania powiadomienia:", error);
     }
@@ -76,7 +84,6 @@ const useNotifications = () => {
     try {
       await API.put('/court/notifications/read-all/');
       setNotifications(prev => prev.map(n => ({ ...n, is_read: true })));
-      setUnreadCount(0);
     } catch (error) {
       console.error("Błąd oznaczania wszystkich:", error);
     }
@@ -87,18 +94,8 @@ const useNotifications = () => {
     try {
         await API.delete(`/court/notifications/${id}/delete/`);
         
-        setNotifications(prev => {
-            // Znajdź usuwane powiadomienie
-            const target = prev.find(n => n.id === id);
-            
-            // Jeśli usuwamy nieprzeczytane, zmniejsz licznik
-            if (target && !target.is_read) {
-                setUnreadCount(current => Math.max(0, current - 1));
-            }
-            
-            // Zwróć nową listę bez tego elementu
-            return prev.filter(n => n.id !== id);
-        });
+        // Licznik aktualizuje ramka unread_counts z serwera
+        setNotifications(prev => prev.filter(n => n.id !== id));
     } catch (error) {
         console.error("Błąd usuwania powiadomienia:", error);
     }
@@ -107,6 +104,7 @@ const useNotifications = () => {
   return {
     notifications,
     unreadCount,
+    unreadMessagesCount,
     loading,
     markAsRead,
     markAllAsRead,
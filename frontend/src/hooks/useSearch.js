@@ -0,0 +1,43 @@
+import { useState, useEffect } from 'react';
+import API from '../api/axiosConfig';
+
+const MIN_QUERY_LENGTH = 2;
+const DEBOUNCE_MS = 300;
+
+// Wyszukiwanie pełnotekstowe na serwerze (/court/search/) z opóźnieniem po wpisywaniu.
+// results = null, gdy zapytanie jest za krótkie (widok pokazuje wtedy wszystko).
+const useSearch = (query, { types = 'case,party,document', pageSize = 100 } = {}) => {
+  const [results, setResults] = useState(null);
+  const [loading, setLoading] = useState(false);
+
+  useEffect(() => {
+    const q = query.trim();
+    if (q.length < MIN_QUERY_LENGTH) {
+      setResults(null);
+      return undefined;
+    }
+
+    let cancelled = false;
+    const timer = setTimeout(async () => {
+      try {
+        setLoading(true);
+        const response = await API.get('/court/search/', { params: { q, type: types, page_size: pageSize } });
+        if (!cancelled) setResults(response.data.results);
+      } catch (err) {
+        console.error('Error searching:', err);
+        if (!cancelled) setResults(null);
+      } finally {
+        if (!cancelled) setLoading(false);
+      }
+    }, DEBOUNCE_MS);
+
+    return () => {
+      cancelled = true;
+      clearTimeout(timer);
+    };
+  }, [query, types, pageSize]);
+
+  return { results, loading };
+};
+
+export default useSearch;
@@ -1,9 +1,13 @@
 import { useEffect, useRef, useCallback } from "react";
 
+// Co ile ms wysyłamy heartbeat - serwer uznaje połączenie za martwe po 90 s ciszy
+const HEARTBEAT_INTERVAL = 30000;
+
 export default function useWebSocket(baseUrl, onMessage) {
   const socketRef = useRef(null);
   const onMessageRef = useRef(onMessage); // Przechowujemy referencję do handlera
   const reconnectTimeoutRef = useRef(null);
+  const heartbeatRef = useRef(null);
 
   // Aktualizujemy ref handlera, gdy się zmienia, bez restartowania połączenia
   useEffect(() => {
@@ -40,6 +44,13 @@ export default function useWebSocket(baseUrl, onMessage) {
             clearTimeout(reconnectTimeoutRef.current);
             reconnectTimeoutRef.current = null;
         }
+
+        if (heartbeatRef.current) clearInterval(heartbeatRef.current);
+        heartbeatRef.current = setInterval(() => {
+          if (ws.readyState === WebSocket.OPEN) {
+            ws.send(JSON.stringify({ type: "heartbeat" }));
+          }
+        }, HEARTBEAT_INTERVAL);
       };
 
       ws.onmessage = (event) => {
@@ -55,6 +66,11 @@ export default function useWebSocket(baseUrl, onMessage) {
       };
 
       ws.onclose = (event) => {
+        if (heartbeatRef.current) {
+            clearInterval(heartbeatRef.current);
+            heartbeatRef.current = null;
+        }
+
         // Kod 1000 = normalne zamknięcie (np. przy wylogowaniu). 
         // Inne kody (np. 1006) = błąd/zerwanie -> próbujemy reconnectu
         if (event.code !== 1000) {
@@ -92,6 +108,11 @@ export default function useWebSocket(baseUrl, onMessage) {
           clearTimeout(reconnectTimeoutRef.current);
           reconnectTimeoutRef.current = null;
       }
+
+      if (heartbeatRef.current) {
+          clearInterval(heartbeatRef.current);
+          heartbeatRef.current = null;
+      }
       
       // Zamykamy socket przy odmontowaniu
       if (socketRef.current) {
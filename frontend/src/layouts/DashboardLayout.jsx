@@ -1,17 +1,23 @@
 import React from 'react';
 import Header from '../components/Header';
 import Sidebar from '../components/Sidebar';
+import useNotifications from '../hooks/useNotifications';
 import { Box, Toolbar } from '@mui/material';
 
-const DashboardLayout = ({ children }) => (
-  <Box sx={{ display: 'flex' }}>
-    <Header />
-    <Sidebar />
-    <Box component="main" sx={{ flexGrow: 1, p: 3 }}>
-      <Toolbar />
-      {children}
+const DashboardLayout = ({ children }) => {
+  // Liczniki plakietek przychodzą przez WebSocket (ramki unread_counts)
+  const notificationState = useNotifications();
+
+  return (
+    <Box sx={{ display: 'flex' }}>
+      <Header notificationState={notificationState} />
+      <Sidebar unreadMessagesCount={notificationState.unreadMessagesCount} />
+      <Box component="main" sx={{ flexGrow: 1, p: 3 }}>
+        <Toolbar />
+        {children}
+      </Box>
     </Box>
-  </Box>
-);
+  );
+};
 
-export default DashboardLayout;
\ No newline at end of file
+export default DashboardLayout;
@@ -1,5 +1,6 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useMemo } from 'react';
 import API from '../api/axiosConfig';
+import useSearch from '../hooks/useSearch';
 import {
     Box,
     Paper,
@@ -66,6 +67,12 @@ const AdminCasesPage = () => {
     const [page, setPage] = useState(0);
     const [rowsPerPage, setRowsPerPage] = useState(10);
     const [searchTerm, setSearchTerm] = useState('');
+    // Serwer szuka też w opisach, stronach i treści dokumentów
+    const { results: searchResults } = useSearch(searchTerm);
+    const matchedCaseIds = useMemo(
+        () => (searchResults ? new Set(searchResults.map(r => r.case_id)) : null),
+        [searchResults]
+    );
     const [orderBy, setOrderBy] = useState('created_at');
     const [order, setOrder] = useState('desc');
 
@@ -136,7 +143,8 @@ const AdminCasesPage = () => {
     const filteredCases = cases.filter(c => 
         c.case_number.toLowerCase().includes(searchTerm.toLowerCase()) ||
         c.title.toLowerCase().includes(searchTerm.toLowerCase()) ||
-        (c.assigned_judge_username && c.assigned_judge_username.toLowerCase().includes(searchTerm.toLowerCase()))
+        (c.assigned_judge_username && c.assigned_judge_username.toLowerCase().includes(searchTerm.toLowerCase())) ||
+        (matchedCaseIds !== null && matchedCaseIds.has(c.id))
     );
 
     const sortedCases = filteredCases.sort((a, b) => {
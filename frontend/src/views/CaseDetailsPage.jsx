@@ -131,7 +131,12 @@ const CaseDetailsPage = () => {
                                                 }
                                             >
                                                 <ListItemAvatar>
-                                                    <Avatar sx={{ bgcolor: 'primary.light' }}>
+                                                    {/* Miniatura generowana w tle - bez pobierania całego pliku */}
+                                                    <Avatar
+                                                        variant="rounded"
+                                                        src={doc.thumbnail_url || undefined}
+                                                        sx={{ bgcolor: 'primary.light' }}
+                                                    >
                                                         <InsertDriveFileIcon />
                                                     </Avatar>
                                                 </ListItemAvatar>
@@ -143,6 +148,11 @@ const CaseDetailsPage = () => {
                                                                 Dodano: {new Date(doc.uploaded_at).toLocaleDateString()} 
                                                             </Typography>
                                                             {doc.file_size && ` — ${formatBytes(doc.file_size)}`}
+                                                            {doc.text_excerpt && (
+                                                                <Typography component="span" variant="caption" color="text.secondary" sx={{ display: 'block', mt: 0.5 }}>
+                                                                    {doc.text_excerpt.slice(0, 200)}…
+                                                                </Typography>
+                                                            )}
                                                         </>
                                                     } 
                                                 />
@@ -2,7 +2,9 @@
 import React, { useState, useEffect, useCallback, useMemo } from 'react';
 import { Box, useTheme } from '@mui/material';
 import API from '../api/axiosConfig';
+import { CHUNKED_UPLOAD_THRESHOLD, uploadInChunks } from '../api/chunkedUpload';
 import useUsers from '../hooks/useUsers';
+import useInbox from '../hooks/useInbox';
 import useWebSocket from '../hooks/useWebSocket';
 import ChatUsersList from '../components/chatPage/ChatUsersList';
 import ChatHeader from '../components/chatPage/ChatHeader';
@@ -14,6 +16,8 @@ const ChatView = () => {
   const theme = useTheme();
   // Pobieramy użytkowników z API (to jest baza danych)
   const { data: apiUsers, loading: usersLoading, error: usersError } = useUsers();
+  // Podgląd rozmów (ostatnia wiadomość, nieprzeczytane) - jedno zapytanie zamiast wątku na osobę
+  const { data: inbox, refetch: refetchInbox } = useInbox();
 
   // Mapa statusów online aktualizowana przez WebSocket { userId: boolean }
   const [onlineStatuses, setOnlineStatuses] = useState({});
@@ -22,6 +26,8 @@ const ChatView = () => {
   const [messages, setMessages] = useState([]);
   const [searchText, setSearchText] = useState('');
   const [messagesLoading, setMessagesLoading] = useState(false);
+  const [olderCursor, setOlderCursor] = useState(null);
+  const [loadingOlder, setLoadingOlder] = useState(false);
   const [sendingMessage, setSendingMessage] = useState(false);
   const [error, setError] = useState(null);
   const [currentUserId, setCurrentUserId] = useState(null);
@@ -35,28 +41,49 @@ const ChatView = () => {
         // WAŻNE: Konwersja na Number, bo WS może przysłać string "5", a API ma liczbę 5
         [Number(data.user_id)]: data.status === 'online'
       }));
+    } else if (data.type === 'presence_snapshot') {
+      // Snapshot po połączeniu: lista obserwowanych osób, które są online
+      setOnlineStatuses(prev => {
+        const next = { ...prev };
+        data.online.forEach(id => { next[Number(id)] = true; });
+        return next;
+      });
+    } else if (data.type === 'presence_batch') {
+      // Zbiorcza paczka zmian statusów
+      setOnlineStatuses(prev => {
+        const next = { ...prev };
+        data.changes.forEach(change => { next[Number(change.user_id)] = change.status === 'online'; });
+        return next;
+      });
     }
   }, []);
 
-  useWebSocket('ws://127.0.0.1:8000/ws/notifications/', handlePresenceMessage);
+  const { send: sendPresence } = useWebSocket('ws://127.0.0.1:8000/ws/notifications/', handlePresenceMessage);
 
   // --- 2. LISTA UŻYTKOWNIKÓW (COMPUTED STATE) ---
   // Łączymy dane z API (bazowe) ze statusem z WebSocketa (live)
   // Używamy useMemo, aby lista była zawsze świeża i przeliczana automatycznie
   const users = useMemo(() => {
     if (!apiUsers) return [];
+
+    const conversations = {};
+    (inbox || []).forEach(c => { conversations[c.user.id] = c; });
     
     return apiUsers.map(u => {
         // Sprawdzamy status w mapie (WS). Jeśli brak, bierzemy z API (Baza). Jeśli brak, false.
         const wsStatus = onlineStatuses[u.id];
         const isOnline = wsStatus !== undefined ? wsStatus : (u.is_online || false);
+        const conversation = conversations[u.id];
         
         return {
             ...u,
-            is_online: isOnline
+            is_online: isOnline,
+            last_message: conversation ? conversation.last_message : null,
+            unread_count: conversation ? conversation.unread_count : 0,
         };
-    });
-  }, [apiUsers, onlineStatuses]);
+    // Najpierw rozmowy z najnowszą wiadomością
+    }).sort((a, b) => (b.last_message?.created_at || '').localeCompare(a.last_message?.created_at || ''));
+  }, [apiUsers, inbox, onlineStatuses]);
 
   // Synchronizacja statusu wybranego użytkownika
   // Jeśli status usera na liście się zmienił, aktualizujemy też obiekt selectedUser
@@ -70,6 +97,15 @@ const ChatView = () => {
   }, [users, selectedUser]);
 
 
+  // Serwer wysyła statusy tylko obserwowanych osób - dopisujemy otwartego rozmówcę
+  const selectedUserId = selectedUser?.id;
+  useEffect(() => {
+    if (selectedUserId) {
+      sendPresence({ type: 'presence_subscribe', user_ids: [selectedUserId] });
+    }
+  }, [selectedUserId, sendPresence]);
+
+
   // --- 3. OBSŁUGA CZATU ---
   const roomName = currentUserId && selectedUser
     ? [currentUserId, selectedUser.id].sort((a, b) => a - b).join('_')
@@ -93,11 +129,36 @@ const ChatView = () => {
         }
         return [...prevMessages, data.message];
       });
+    } else if (data.type === 'chat_message_error') {
+      // Serwer nie zapisał wiadomości - usuwamy jej optymistyczną kopię
+      if (data.temp_id) {
+        setMessages((prevMessages) => prevMessages.filter(msg => msg.id !== data.temp_id));
+      }
+      setError(data.error || 'Nie udało się wysłać wiadomości.');
+    } else if (data.type === 'messages_read') {
+      // Rozmówca przeczytał nasze wiadomości do znacznika
+      setMessages((prevMessages) => prevMessages.map(msg =>
+        typeof msg.id === 'number' && msg.id <= data.last_read_message_id && msg.sender_id !== data.reader_id
+          ? { ...msg, is_read: true }
+          : msg
+      ));
     }
   }, []);
 
   const { send } = useWebSocket(wsUrl, handleIncomingMessage);
 
+  // Nowa wiadomość od rozmówcy w otwartym czacie - przesuwamy znacznik przeczytania
+  const lastIncomingId = useMemo(() => {
+    const incoming = messages.filter(msg => typeof msg.id === 'number' && msg.sender_id !== currentUserId);
+    return incoming.length ? incoming[incoming.length - 1].id : null;
+  }, [messages, currentUserId]);
+
+  useEffect(() => {
+    if (lastIncomingId) {
+      send({ type: 'mark_read', message_id: lastIncomingId });
+    }
+  }, [lastIncomingId, send]);
+
   // Pobranie current user
   useEffect(() => {
     const fetchCurrentUser = async () => {
@@ -118,17 +179,40 @@ const ChatView = () => {
       const fetchMessages = async (userId) => {
         try {
           setMessagesLoading(true);
+          // Tylko najnowsza strona - starsze wiadomości doładowuje loadOlderMessages
           const response = await API.get(`/court/messages/?recipient_id=${userId}`);
-          setMessages(response.data);
+          setMessages(response.data.results);
+          setOlderCursor(response.data.has_more ? response.data.before : null);
+          // Cała rozmowa przeczytana - jedno żądanie zamiast jednego na wiadomość
+          if (response.data.results.length > 0) {
+            await API.post('/court/messages/read/', { recipient_id: userId });
+          }
         } catch (err) {
           setError('Błąd przy pobieraniu wiadomości');
         } finally {
           setMessagesLoading(false);
         }
       };
-      fetchMessages(selectedUser.id);
+      fetchMessages(selectedUser.id).then(refetchInbox);
+    }
+  }, [selectedUser, refetchInbox]);
+
+  // Doładowanie starszej strony historii (paginacja kursorowa ?before=)
+  const loadOlderMessages = async () => {
+    if (!selectedUser || !olderCursor || loadingOlder) return;
+    try {
+      setLoadingOlder(true);
+      const response = await API.get('/court/messages/', {
+        params: { recipient_id: selectedUser.id, before: olderCursor },
+      });
+      setMessages(prev => [...response.data.results, ...prev]);
+      setOlderCursor(response.data.has_more ? response.data.before : null);
+    } catch (err) {
+      setError('Błąd przy pobieraniu wiadomości');
+    } finally {
+      setLoadingOlder(false);
     }
-  }, [selectedUser]);
+  };
 
   // Wysyłanie wiadomości
   const sendMessage = async (content, attachments = []) => {
@@ -187,14 +271,23 @@ const ChatView = () => {
 
             setMessages((prev) => [...prev, optimisticFileMessage]);
 
-            const formData = new FormData();
-            formData.append('recipient_id', selectedUser.id);
-            formData.append('content', content || 'Przesłano plik'); 
-            formData.append('attachment', file);
+            let response;
+            if (file.size > CHUNKED_UPLOAD_THRESHOLD) {
+              const data = await uploadInChunks(file, 'attachment', {
+                recipient_id: selectedUser.id,
+                content: content || 'Przesłano plik',
+              });
+              response = { data };
+            } else {
+              const formData = new FormData();
+              formData.append('recipient_id', selectedUser.id);
+              formData.append('content', content || 'Przesłano plik'); 
+              formData.append('attachment', file);
 
-            const response = await API.post('/court/messages/', formData, {
-              headers: { 'Content-Type': 'multipart/form-data' },
-            });
+              response = await API.post('/court/messages/', formData, {
+                headers: { 'Content-Type': 'multipart/form-data' },
+              });
+            }
             
             setMessages((prev) => {
               const realMessageAlreadyExists = prev.some(msg => msg.id === response.data.id);
@@ -242,6 +335,9 @@ const ChatView = () => {
               error={error}
               currentUserId={currentUserId}
               selectedUser={selectedUser}
+              hasOlder={Boolean(olderCursor)}
+              loadingOlder={loadingOlder}
+              onLoadOlder={loadOlderMessages}
             />
             <ChatInput
               onSendMessage={sendMessage}
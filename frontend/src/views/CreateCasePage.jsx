@@ -1,5 +1,6 @@
 import React, { useState, useEffect } from 'react';
 import API from '../api/axiosConfig';
+import { CHUNKED_UPLOAD_THRESHOLD, uploadInChunks } from '../api/chunkedUpload';
 import {
     Box,
     Paper,
@@ -200,6 +201,13 @@ const CreateCasePage = () => {
             
             if (files.length > 0) {
                 const uploadPromises = files.map(file => {
+                    if (file.size > CHUNKED_UPLOAD_THRESHOLD) {
+                        return uploadInChunks(file, 'document', {
+                            title: file.name,
+                            case: newCaseId,
+                            description: 'Dokument dodany podczas rejestracji sprawy',
+                        });
+                    }
                     const fileFormData = new FormData();
                     fileFormData.append('file', file);
                     fileFormData.append('title', file.name); 
@@ -1,7 +1,8 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useMemo } from 'react';
 import { useNavigate } from 'react-router-dom';
 import API from '../api/axiosConfig.js';
 import useAuth from '../hooks/useAuth';
+import useSearch from '../hooks/useSearch';
 import {
     Box,
     Paper,
@@ -30,6 +31,12 @@ const UserCases = () => {
     const [loading, setLoading] = useState(true);
     const [error, setError] = useState(null);
     const [searchTerm, setSearchTerm] = useState('');
+    // Serwer szuka też w opisach, stronach i treści dokumentów
+    const { results: searchResults } = useSearch(searchTerm);
+    const matchedCaseIds = useMemo(
+        () => (searchResults ? new Set(searchResults.map(r => r.case_id)) : null),
+        [searchResults]
+    );
 
     useEffect(() => {
         const fetchData = async () => {
@@ -88,7 +95,8 @@ const UserCases = () => {
 
     const displayedCases = cases.filter(c => 
         c.case_number.toLowerCase().includes(searchTerm.toLowerCase()) ||
-        c.title.toLowerCase().includes(searchTerm.toLowerCase())
+        c.title.toLowerCase().includes(searchTerm.toLowerCase()) ||
+        (matchedCaseIds !== null && matchedCaseIds.has(c.id))
     );
 
     if (loading) return <CircularProgress sx={{ display: 'block', mx: 'auto', mt: 4 }} />;
@@ -1,5 +1,6 @@
 from django.contrib import admin
 from .models import User, Role, Case, CaseParty, Hearing, Document, Notification, CaseParticipant, AuditLog, Message, ChatRoom
+from .search import get_search_backend
 
 # 1. Konfiguracja Użytkownika
 @admin.register(User)
@@ -20,15 +21,27 @@ class CasePartyInline(admin.TabularInline):
     model = CaseParty
     extra = 1
 
+class FullTextSearchMixin:
+    """Wyszukiwarka admina przez indeks FTS (court/search.py) zamiast skanów icontains"""
+    search_kind = None
+
+    def get_search_results(self, request, queryset, search_term):
+        ids = get_search_backend().matching_ids(search_term, self.search_kind) if search_term else None
+        if ids is None:
+            return super().get_search_results(request, queryset, search_term)
+        return queryset.filter(pk__in=ids), False
+
 @admin.register(Case)
-class CaseAdmin(admin.ModelAdmin):
+class CaseAdmin(FullTextSearchMixin, admin.ModelAdmin):
+    search_kind = 'case'
     list_display = ('case_number', 'title', 'status', 'assigned_judge', 'created_at')
     list_filter = ('status', 'assigned_judge')
     search_fields = ('case_number', 'title')
     inlines = [CasePartyInline]
 
 @admin.register(CaseParty)
-class CasePartyAdmin(admin.ModelAdmin):
+class CasePartyAdmin(FullTextSearchMixin, admin.ModelAdmin):
+    search_kind = 'party'
     list_display = ('name', 'role', 'case')
     search_fields = ('name', 'role')
 
@@ -0,0 +1,365 @@
+"""
+Asynchroniczny, wsadowy zapis dziennika audytu.
+
+AuditLogMiddleware nie zapisuje już wpisów w trakcie obsługi żądania -
+wrzuca je do ograniczonej kolejki w pamięci procesu. Wątek w tle zbiera
+wpisy i zapisuje je jednym bulk_create, gdy uzbiera się BATCH_SIZE wpisów
+albo minie FLUSH_INTERVAL sekund.
+
+Gdy kolejka jest pełna, zapis do bazy się nie powiedzie albo proces się
+zamyka, wpisy trafiają do pliku spool (NDJSON, tylko dopisywanie).
+Spool wczytuje z powrotem do bazy komenda `replay_audit_spool`.
+
+Każdy zapis aktualizuje też dzienne liczniki AuditLogDailyStat
+(increment_daily_stats), z których korzysta endpoint statystyk.
+"""
+import atexit
+import glob
+import json
+import os
+import queue
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+DEFAULTS = {
+    'ASYNC': True,
+    'BATCH_SIZE': 200,
+    'FLUSH_INTERVAL': 1.0,
+    'QUEUE_SIZE': 10000,
+    'SPOOL_PATH': os.path.join(settings.BASE_DIR, 'audit_spool.ndjson'),
+}
+
+STOP_POLL_INTERVAL = 0.2
+
+# Liczba wierszy pobieranych z bazy na raz przy eksporcie i archiwizacji
+EXPORT_CHUNK_SIZE = 2000
+
+EXPORT_FIELDS = [
+    'id', 'user', 'user_username', 'action', 'action_display',
+    'object_type', 'object_type_display', 'object_id', 'object_name',
+    'description', 'old_value', 'new_value', 'ip_address', 'user_agent',
+    'timestamp'
+]
+
+
+def get_writer_settings():
+    conf = dict(DEFAULTS)
+    conf.update(getattr(settings, 'AUDIT_LOG_WRITER', {}))
+    return conf
+
+
+class AuditLogWriter:
+    """Kolejka wpisów audytu z wątkiem zapisującym je partiami"""
+
+    def __init__(self, batch_size=200, flush_interval=1.0, queue_size=10000,
+                 spool_path=None, async_mode=True):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.spool_path = str(spool_path) if spool_path else None
+        self.async_mode = async_mode
+        self.queue = queue.Queue(maxsize=queue_size)
+
+        self._thread = None
+        self._stopping = threading.Event()
+        self._lock = threading.Lock()
+        self._spool_lock = threading.Lock()
+        self._atexit_registered = False
+        self._counters = {
+            'enqueued': 0,
+            'flushed': 0,
+            'spooled': 0,
+            'dropped': 0,
+            'failed_flushes': 0,
+        }
+
+    @classmethod
+    def from_settings(cls):
+        conf = get_writer_settings()
+        return cls(
+            batch_size=conf['BATCH_SIZE'],
+            flush_interval=conf['FLUSH_INTERVAL'],
+            queue_size=conf['QUEUE_SIZE'],
+            spool_path=conf['SPOOL_PATH'],
+            async_mode=conf['ASYNC'],
+        )
+
+    # --- API PUBLICZNE ---
+
+    def enqueue(self, **fields):
+        """
+        Dodaje wpis (pola modelu AuditLog, np. user_id, action, object_type).
+        Nigdy nie blokuje - przy pełnej kolejce wpis idzie do spoola.
+        """
+        fields.setdefault('timestamp', timezone.now())
+
+        if not self.async_mode:
+            self._write([fields])
+            return
+
+        self._ensure_started()
+        try:
+            self.queue.put_nowait(fields)
+        except queue.Full:
+            self._spool([fields])
+            return
+        self._increment('enqueued')
+
+    def flush(self):
+        """Synchronicznie zapisuje wszystko, co aktualnie czeka w kolejce"""
+        entries = self._drain()
+        if entries:
+            self._write(entries)
+
+    def shutdown(self, timeout=5.0):
+        """Zatrzymuje wątek i zapisuje resztę kolejki (lub odkłada ją do spoola)"""
+        self._stopping.set()
+        thread = self._thread
+        if thread is not None and thread.is_alive():
+            thread.join(timeout)
+        self.flush()
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+        stats['pending'] = self.queue.qsize()
+        return stats
+
+    def replay_spool(self):
+        """
+        Zapisuje do bazy wpisy ze spoola i usuwa plik. Podejmuje też pliki
+        .replay-* pozostawione przez przerwane wcześniej odtwarzanie.
+        Zwraca liczbę odtworzonych wpisów.
+        """
+        if not self.spool_path:
+            return 0
+
+        replay_path = f"{self.spool_path}.replay-{os.getpid()}"
+        replayed = 0
+        for orphan in sorted(glob.glob(f"{glob.escape(self.spool_path)}.replay-*")):
+            if orphan == replay_path or orphan.endswith('.tmp'):
+                continue
+            claimed = f"{replay_path}-{os.path.basename(orphan).rsplit('-', 1)[-1]}"
+            try:
+                # Przejęcie pliku przez zmianę nazwy - równoległe odtwarzanie go nie dostanie
+                os.replace(orphan, claimed)
+            except FileNotFoundError:
+                continue
+            replayed += self._replay_file(claimed)
+
+        if os.path.exists(self.spool_path):
+            # Zmiana nazwy jest atomowa - nowe wpisy trafią już do świeżego pliku
+            with self._spool_lock:
+                os.replace(self.spool_path, replay_path)
+            replayed += self._replay_file(replay_path)
+        return replayed
+
+    def _replay_file(self, path):
+        """
+        Odtwarza jeden plik partiami. Przy błędzie plik zostaje z wpisami,
+        których jeszcze nie zapisano - kolejne odtwarzanie zacznie od nich.
+        """
+        from court.models import AuditLog
+
+        with open(path, encoding='utf-8') as f:
+            lines = [line for line in (raw.strip() for raw in f) if line]
+
+        replayed = 0
+        for start in range(0, len(lines), self.batch_size):
+            chunk = lines[start:start + self.batch_size]
+            try:
+                batch = []
+                for line in chunk:
+                    entry = json.loads(line)
+                    entry['timestamp'] = parse_datetime(entry['timestamp'])
+                    batch.append(AuditLog(**entry))
+                replayed += len(self._bulk_create(batch))
+            except Exception:
+                tmp_path = f'{path}.tmp'
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    f.writelines(line + '\n' for line in lines[start:])
+                os.replace(tmp_path, path)
+                raise
+
+        os.remove(path)
+        return replayed
+
+    # --- WĄTEK ZAPISUJĄCY ---
+
+    def _ensure_started(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._run, name='audit-log-writer', daemon=True)
+            self._thread.start()
+            if not self._atexit_registered:
+                atexit.register(self.shutdown)
+                self._atexit_registered = True
+
+    def _run(self):
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while not self._stopping.is_set():
+            # Krótki limit czekania, żeby szybko zauważyć shutdown()
+            timeout = min(max(0.0, deadline - time.monotonic()), STOP_POLL_INTERVAL)
+            try:
+                batch.append(self.queue.get(timeout=timeout))
+            except queue.Empty:
+                pass
+
+            if len(batch) >= self.batch_size or time.monotonic() >= deadline:
+                if batch:
+                    # Tylko w wątku w tle - w żądaniu zamknęłoby jego połączenie
+                    close_old_connections()
+                    self._write(batch)
+                    batch = []
+                deadline = time.monotonic() + self.flush_interval
+
+        if batch:
+            close_old_connections()
+            self._write(batch)
+
+    def _drain(self):
+        entries = []
+        while True:
+            try:
+                entries.append(self.queue.get_nowait())
+            except queue.Empty:
+                return entries
+
+    def _write(self, entries):
+        from court.models import AuditLog
+
+        try:
+            self._bulk_create([AuditLog(**entry) for entry in entries])
+        except Exception as e:
+            print(f"❌ AuditLogWriter: błąd zapisu partii ({len(entries)} wpisów): {e}")
+            self._increment('failed_flushes')
+            self._spool(entries)
+            return
+        self._increment('flushed', len(entries))
+
+    def _bulk_create(self, logs):
+        from court.models import AuditLog
+
+        logs = AuditLog.objects.bulk_create(logs, batch_size=self.batch_size)
+        # bulk_create nie wysyła post_save - liczniki aktualizujemy sami.
+        # Błąd liczników nie może cofnąć zapisanych wpisów (spool = duplikaty).
+        try:
+            increment_daily_stats(logs)
+        except Exception as e:
+            print(f"❌ AuditLogWriter: błąd aktualizacji statystyk: {e}")
+        return logs
+
+    def _spool(self, entries):
+        if not self.spool_path:
+            self._increment('dropped', len(entries))
+            return
+        try:
+            with self._spool_lock, open(self.spool_path, 'a', encoding='utf-8') as f:
+                for entry in entries:
+                    f.write(json.dumps(entry, default=str) + '\n')
+        except OSError as e:
+            print(f"❌ AuditLogWriter: nie można zapisać spoola {self.spool_path}: {e}")
+            self._increment('dropped', len(entries))
+            return
+        self._increment('spooled', len(entries))
+
+    def _increment(self, counter, value=1):
+        with self._lock:
+            self._counters[counter] += value
+
+
+def iter_audit_log_rows(logs):
+    """
+    Generator słowników z polami EXPORT_FIELDS.
+    Wiersze pobierane są porcjami przez .iterator(), więc zużycie pamięci
+    nie zależy od liczby eksportowanych wpisów.
+    """
+    from court.models import AuditLog
+
+    action_display = dict(AuditLog.ACTION_CHOICES)
+    object_type_display = dict(AuditLog.OBJECT_TYPE_CHOICES)
+    rows = logs.values(
+        'id', 'user_id', 'user__username', 'action', 'object_type', 'object_id',
+        'object_name', 'description', 'old_value', 'new_value', 'ip_address',
+        'user_agent', 'timestamp'
+    )
+    for row in rows.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        row['user'] = row.pop('user_id')
+        row['user_username'] = row.pop('user__username')
+        row['action_display'] = action_display.get(row['action'], row['action'])
+        row['object_type_display'] = object_type_display.get(row['object_type'], row['object_type'])
+        row['timestamp'] = row['timestamp'].isoformat()
+        yield {field: row[field] for field in EXPORT_FIELDS}
+
+
+def increment_daily_stats(logs):
+    """
+    Dolicza wpisy AuditLog do dziennych liczników AuditLogDailyStat.
+    Jedno UPDATE (lub INSERT) na każdą kombinację dzień/akcja/typ/użytkownik.
+    """
+    counts = Counter(
+        (timezone.localdate(log.timestamp), log.action, log.object_type, log.user_id)
+        for log in logs
+    )
+    with transaction.atomic():
+        for (day, action, object_type, user_id), count in counts.items():
+            _add_daily_count(
+                {'date': day, 'action': action, 'object_type': object_type, 'user_id': user_id},
+                count,
+            )
+
+
+def release_user_daily_stats(user_id):
+    """
+    Przenosi liczniki usuwanego użytkownika do wierszy bez użytkownika.
+    Samo SET_NULL zderzyłoby się z istniejącym wierszem anonimowym tego dnia.
+    """
+    from court.models import AuditLogDailyStat
+
+    with transaction.atomic():
+        stats = AuditLogDailyStat.objects.select_for_update().filter(user_id=user_id)
+        for stat in stats:
+            _add_daily_count(
+                {'date': stat.date, 'action': stat.action, 'object_type': stat.object_type, 'user_id': None},
+                stat.count,
+            )
+        stats.delete()
+
+
+def _add_daily_count(key, count):
+    """UPDATE dokładnie jednego wiersza licznika albo INSERT, gdy go jeszcze nie ma"""
+    from court.models import AuditLogDailyStat
+
+    if AuditLogDailyStat.objects.filter(**key).update(count=F('count') + count):
+        return
+    try:
+        with transaction.atomic():
+            AuditLogDailyStat.objects.create(count=count, **key)
+    except IntegrityError:
+        # Wiersz utworzył równolegle inny proces
+        AuditLogDailyStat.objects.filter(**key).update(count=F('count') + count)
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_audit_writer():
+    """Wspólna (na proces) instancja AuditLogWriter skonfigurowana z settings"""
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = AuditLogWriter.from_settings()
+    return _writer
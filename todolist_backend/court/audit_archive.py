@@ -0,0 +1,241 @@
+"""
+Archiwizacja dziennika audytu.
+
+Wpisy starsze niż RETENTION_DAYS są przenoszone z tabeli AuditLog do plików
+gzip NDJSON, po jednym pliku na miesiąc i typ obiektu:
+
+    <PATH>/2025-01/Case.ndjson.gz
+
+Każde uruchomienie zapisuje najpierw osobny segment (*.segment), który
+jest dopisywany do pliku miesiąca dopiero po commicie usunięcia wierszy
+z tabeli. Segment pozostawiony przez przerwany przebieg jest przy
+następnym uruchomieniu dopisywany albo odrzucany - zależnie od tego, czy
+jego wiersze nadal są w tabeli - więc ponowne uruchomienie nie dubluje wpisów.
+
+Pliki indeksuje model AuditLogArchive, więc odczyt historii
+(load_archived_logs) otwiera tylko pliki z pasującego okresu i typu.
+Dzienne liczniki AuditLogDailyStat nie są zmniejszane - statystyki
+obejmują także wpisy zarchiwizowane (rebuild_audit_stats nie przelicza
+dni sprzed archive_horizon).
+"""
+import gzip
+import heapq
+import json
+import os
+import re
+import shutil
+import uuid
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max, Min
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from court.audit import iter_audit_log_rows
+from court.models import AuditLog, AuditLogArchive
+
+DEFAULTS = {
+    'PATH': os.path.join(settings.BASE_DIR, 'audit_archive'),
+    'RETENTION_DAYS': 365,
+    'MAX_READ_ROWS': 1000,   # limit wpisów w jednej odpowiedzi (tabela + archiwum)
+}
+
+
+def get_archive_settings():
+    conf = dict(DEFAULTS)
+    conf.update(getattr(settings, 'AUDIT_LOG_ARCHIVE', {}))
+    conf['PATH'] = str(conf['PATH'])
+    return conf
+
+
+def _next_month(day):
+    return (day.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def _start_of_day(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def _file_name(object_type):
+    return re.sub(r'[^A-Za-z0-9_-]', '_', object_type or '') or '_'
+
+
+def archive_logs(before):
+    """
+    Przenosi wpisy z timestamp < before do archiwum, miesiąc po miesiącu.
+    Zwraca słownik {'RRRR-MM': liczba_przeniesionych_wpisów}.
+    """
+    archive_dir = get_archive_settings()['PATH']
+    if os.path.isdir(archive_dir):
+        for name in sorted(os.listdir(archive_dir)):
+            if os.path.isdir(os.path.join(archive_dir, name)):
+                _recover_segments(os.path.join(archive_dir, name))
+
+    oldest = AuditLog.objects.filter(timestamp__lt=before).aggregate(oldest=Min('timestamp'))['oldest']
+    summary = {}
+    if oldest is None:
+        return summary
+
+    month = timezone.localdate(oldest).replace(day=1)
+    while _start_of_day(month) < before:
+        end = min(_start_of_day(_next_month(month)), before)
+        count = _archive_month(archive_dir, month, _start_of_day(month), end)
+        if count:
+            summary[f'{month:%Y-%m}'] = count
+        month = _next_month(month)
+    return summary
+
+
+def _archive_month(archive_dir, month, start, end):
+    month_dir = os.path.join(archive_dir, f'{month:%Y-%m}')
+    os.makedirs(month_dir, exist_ok=True)
+
+    logs = AuditLog.objects.filter(timestamp__gte=start, timestamp__lt=end)
+    # Wpisy dopisane w trakcie archiwizacji (np. z replay_audit_spool) zostają w tabeli
+    max_id = logs.aggregate(max_id=Max('id'))['max_id']
+    if max_id is None:
+        return 0
+    logs = logs.filter(id__lte=max_id)
+
+    files = {}
+    segments = {}
+    # object_type -> [liczba, pierwszy timestamp, ostatni timestamp]
+    stats = {}
+    try:
+        try:
+            for row in iter_audit_log_rows(logs.order_by('timestamp', 'id')):
+                object_type = row['object_type']
+                if object_type not in files:
+                    path = os.path.join(month_dir, f'{_file_name(object_type)}.ndjson.gz')
+                    segments[object_type] = f'{path}.{uuid.uuid4().hex}.segment'
+                    files[object_type] = gzip.open(segments[object_type], 'wt', encoding='utf-8')
+                    stats[object_type] = [0, row['timestamp'], row['timestamp']]
+                files[object_type].write(json.dumps(row, ensure_ascii=False) + '\n')
+                stats[object_type][0] += 1
+                stats[object_type][2] = row['timestamp']
+        finally:
+            for f in files.values():
+                f.close()
+
+        # Segmenty są już zapisane - dopiero teraz usuwamy wiersze z tabeli
+        with transaction.atomic():
+            for object_type, (count, first, last) in stats.items():
+                first, last = parse_datetime(first), parse_datetime(last)
+                archive, created = AuditLogArchive.objects.select_for_update().get_or_create(
+                    month=month,
+                    object_type=object_type,
+                    defaults={
+                        'file_path': f'{month:%Y-%m}/{_file_name(object_type)}.ndjson.gz',
+                        'row_count': count,
+                        'first_timestamp': first,
+                        'last_timestamp': last,
+                    },
+                )
+                if not created:
+                    archive.row_count += count
+                    archive.first_timestamp = min(archive.first_timestamp, first)
+                    archive.last_timestamp = max(archive.last_timestamp, last)
+                    archive.save()
+            logs.delete()
+    except Exception:
+        # Wiersze zostały w tabeli - segmenty byłyby duplikatami
+        for segment in segments.values():
+            if os.path.exists(segment):
+                os.remove(segment)
+        raise
+
+    for segment in segments.values():
+        _publish_segment(segment)
+    return sum(entry[0] for entry in stats.values())
+
+
+def _publish_segment(segment):
+    """Dopisuje segment do pliku miesiąca (kopia + os.replace, plik nigdy nie jest urwany)"""
+    path = segment.rsplit('.', 2)[0]
+    if os.path.exists(path):
+        # Sklejone człony gzip to nadal poprawny plik gzip
+        tmp_path = f'{segment}.tmp'
+        shutil.copyfile(path, tmp_path)
+        with open(tmp_path, 'ab') as dst, open(segment, 'rb') as src:
+            shutil.copyfileobj(src, dst)
+        os.replace(tmp_path, path)
+        os.remove(segment)
+    else:
+        os.replace(segment, path)
+
+
+def _recover_segments(month_dir):
+    """
+    Segmenty po przerwanym przebiegu: jeśli ich wiersze są jeszcze w tabeli,
+    usunięcie się nie powiodło i segment jest odrzucany; jeśli nie -
+    commit przeszedł, a zabrakło tylko dopisania do pliku.
+    """
+    for name in sorted(os.listdir(month_dir)):
+        path = os.path.join(month_dir, name)
+        if name.endswith('.segment.tmp'):
+            os.remove(path)
+            continue
+        if not name.endswith('.segment'):
+            continue
+        try:
+            with gzip.open(path, 'rt', encoding='utf-8') as f:
+                ids = [json.loads(line)['id'] for line in f]
+        except (OSError, EOFError, ValueError):
+            # Segment urwany w trakcie zapisu - usunięcie wierszy nigdy się nie zaczęło
+            ids = None
+        if ids is None or AuditLog.objects.filter(id__in=ids[:1]).exists():
+            os.remove(path)
+        else:
+            _publish_segment(path)
+
+
+def archive_horizon():
+    """Najpóźniejszy zarchiwizowany timestamp albo None, gdy archiwum jest puste"""
+    return AuditLogArchive.objects.aggregate(horizon=Max('last_timestamp'))['horizon']
+
+
+def _iter_archived_rows(archives, object_id, user_id, date_from, date_to):
+    archive_dir = get_archive_settings()['PATH']
+    for archive in archives:
+        path = os.path.join(archive_dir, archive.file_path)
+        if not os.path.exists(path):
+            print(f"❌ Brak pliku archiwum audytu: {path}")
+            continue
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            for line in f:
+                row = json.loads(line)
+                if object_id is not None and row['object_id'] != object_id:
+                    continue
+                if user_id is not None and row['user'] != user_id:
+                    continue
+                if date_from or date_to:
+                    timestamp = parse_datetime(row['timestamp'])
+                    if date_from and timestamp < date_from:
+                        continue
+                    if date_to and timestamp >= date_to:
+                        continue
+                yield row
+
+
+def load_archived_logs(object_type=None, object_id=None, user_id=None, date_from=None, date_to=None, limit=None):
+    """
+    Najnowsze wpisy z archiwum (słowniki jak z iter_audit_log_rows), maksymalnie
+    limit (domyślnie MAX_READ_ROWS). date_from włącznie, date_to wyłącznie.
+    Czytane są tylko pliki, których zakres czasu w indeksie AuditLogArchive
+    pokrywa się z zapytaniem; wiersze są strumieniowane, w pamięci zostaje limit.
+    """
+    archives = AuditLogArchive.objects.all()
+    if object_type:
+        archives = archives.filter(object_type=object_type)
+    if date_from:
+        archives = archives.filter(last_timestamp__gte=date_from)
+    if date_to:
+        archives = archives.filter(first_timestamp__lt=date_to)
+
+    if limit is None:
+        limit = get_archive_settings()['MAX_READ_ROWS']
+    rows = _iter_archived_rows(archives, object_id, user_id, date_from, date_to)
+    return heapq.nlargest(limit, rows, key=lambda row: (row['timestamp'], row['id']))
+
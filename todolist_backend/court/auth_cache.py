@@ -0,0 +1,133 @@
+"""
+Pamięć podręczna autoryzacji WebSocket (JwtAuthMiddleware).
+
+- token_cache: zweryfikowane tokeny JWT -> payload, ważne do czasu `exp` tokena,
+  więc ponowne połączenie z tym samym tokenem nie dekoduje go od nowa.
+- user_cache: user_id -> obiekt User (TTL + LRU), unieważniany sygnałami
+  post_save/post_delete modelu User (court/signals.py).
+- handshake_metrics: trafienia w cache i czas uwierzytelnienia połączenia.
+
+Cache jest lokalny dla procesu - TTL ogranicza nieaktualność danych
+zmienionych w innym workerze.
+"""
+import threading
+import time
+from collections import OrderedDict, deque
+
+from django.conf import settings
+
+DEFAULTS = {
+    'USER_TTL': 300,
+    'MAX_USERS': 10000,
+    'MAX_TOKENS': 50000,
+}
+
+
+def get_auth_cache_settings():
+    conf = dict(DEFAULTS)
+    conf.update(getattr(settings, 'WS_AUTH_CACHE', {}))
+    return conf
+
+
+class LRUCache:
+    """Słownik z limitem rozmiaru (LRU) i czasem wygaśnięcia wpisów"""
+
+    def __init__(self, max_size, ttl=None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[1] <= now:
+                if entry is not None:
+                    del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key, value, expires_at=None):
+        if expires_at is None:
+            expires_at = time.time() + self.ttl
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def incr(self, key, delta):
+        """Zmienia wartość liczbową wpisu bez przedłużania jego ważności. Zwraca nową wartość albo None."""
+        now = time.time()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[1] <= now:
+                return None
+            value = max(entry[0] + delta, 0)
+            self._data[key] = (value, entry[1])
+            return value
+
+    def invalidate(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def get_stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'size': len(self._data),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / total, 4) if total else None,
+            }
+
+
+class LatencyMetrics:
+    """Rozkład czasów operacji (ostatnie `window` próbek), np. handshake WebSocket"""
+
+    def __init__(self, window=1000):
+        self.count = 0
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        with self._lock:
+            self.count += 1
+            self._samples.append(seconds)
+
+    def get_stats(self):
+        with self._lock:
+            samples = sorted(self._samples)
+            count = self.count
+        if not samples:
+            return {'count': count}
+        return {
+            'count': count,
+            'p50_ms': round(samples[len(samples) // 2] * 1000, 3),
+            'p95_ms': round(samples[max(int(len(samples) * 0.95) - 1, 0)] * 1000, 3),
+            'max_ms': round(samples[-1] * 1000, 3),
+        }
+
+
+_conf = get_auth_cache_settings()
+user_cache = LRUCache(_conf['MAX_USERS'], ttl=_conf['USER_TTL'])
+token_cache = LRUCache(_conf['MAX_TOKENS'])
+handshake_metrics = LatencyMetrics()
+
+
+def get_auth_cache_stats():
+    return {
+        'users': user_cache.get_stats(),
+        'tokens': token_cache.get_stats(),
+        'handshakes': handshake_metrics.get_stats(),
+    }
@@ -0,0 +1,233 @@
+"""
+Magazyn plików adresowany treścią (Document.file, Message.attachment).
+
+BlobStorage zapisuje przesłany plik strumieniowo do pliku tymczasowego,
+licząc przy tym SHA-256, a potem przenosi go pod nazwę wyznaczoną przez
+sumę: <LOCATION>/<ab>/<sha256><rozszerzenie>. Ten sam plik dodany w kilku
+sprawach (wyroki, załączniki) leży na dysku raz - kolejny zapis tylko
+usuwa plik tymczasowy.
+
+Odwołania liczy model FileBlob: sygnały (court/signals.py) zwiększają
+licznik po zapisaniu dokumentu/wiadomości z nowym plikiem i zmniejszają
+go po usunięciu lub podmianie pliku. Gdy licznik spadnie do zera, wiersz
+znika, a plik jest usuwany po zatwierdzeniu transakcji.
+
+Między zapisem pliku a sygnałem nowy rekord nie ma jeszcze odwołania.
+Dlatego ponowne użycie istniejącego bloba odświeża jego mtime, a
+collect_blob nie usuwa plików młodszych niż COLLECT_GRACE - zostają dla
+komendy `collect_unused_blobs`.
+
+Pliki sprzed wprowadzenia magazynu przenosi komenda `deduplicate_files`,
+która też przelicza liczniki od nowa.
+"""
+import hashlib
+import os
+import tempfile
+import time
+import uuid
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+DEFAULTS = {
+    'LOCATION': 'blobs',        # katalog w MEDIA_ROOT
+    'CHUNK_SIZE': 64 * 1024,
+    'COLLECT_GRACE': 3600,      # sekundy - świeżo zapisanych/użytych plików nie usuwamy
+}
+
+
+def get_blob_store_settings():
+    conf = dict(DEFAULTS)
+    conf.update(getattr(settings, 'BLOB_STORAGE', {}))
+    return conf
+
+
+class BlobStorage(FileSystemStorage):
+    """FileSystemStorage, w którym nazwę pliku wyznacza suma SHA-256 treści"""
+
+    def __init__(self, location_prefix='blobs', chunk_size=64 * 1024, **kwargs):
+        super().__init__(**kwargs)
+        self.location_prefix = location_prefix.strip('/')
+        self.chunk_size = chunk_size
+
+    def blob_name(self, sha256, extension=''):
+        return f'{self.location_prefix}/{sha256[:2]}/{sha256}{extension}'
+
+    def is_blob(self, name):
+        return bool(name) and name.startswith(self.location_prefix + '/')
+
+    def hash_from_name(self, name):
+        """Suma SHA-256 zapisana w nazwie bloba (None dla plików spoza magazynu)"""
+        if not self.is_blob(name):
+            return None
+        return os.path.splitext(os.path.basename(name))[0]
+
+    def get_available_name(self, name, max_length=None):
+        # Nazwę wyznacza treść w _save - istniejący plik o tej nazwie to ten sam plik
+        return name
+
+    def tmp_path(self, suffix=''):
+        tmp_dir = self.path(f'{self.location_prefix}/tmp')
+        os.makedirs(tmp_dir, exist_ok=True)
+        return os.path.join(tmp_dir, uuid.uuid4().hex + suffix)
+
+    def _place(self, path, full_path):
+        """
+        Przenosi plik pod nazwę bloba. Gdy blob już istnieje, plik jest usuwany,
+        a blobowi odświeżamy mtime - collect_blob nie skasuje go, zanim nowy
+        rekord zdąży zwiększyć licznik odwołań.
+        """
+        try:
+            os.utime(full_path)
+        except FileNotFoundError:
+            os.makedirs(os.path.dirname(full_path), exist_ok=True)
+            if self.file_permissions_mode is not None:
+                os.chmod(path, self.file_permissions_mode)
+            os.replace(path, full_path)
+        else:
+            os.remove(path)
+
+    def _save(self, name, content):
+        extension = os.path.splitext(name)[1].lower()[:16]
+        tmp_dir = self.path(f'{self.location_prefix}/tmp')
+        os.makedirs(tmp_dir, exist_ok=True)
+
+        digest = hashlib.sha256()
+        fd, tmp_path = tempfile.mkstemp(dir=tmp_dir)
+        try:
+            with os.fdopen(fd, 'wb') as out:
+                if hasattr(content, 'seek'):
+                    content.seek(0)
+                for chunk in content.chunks(self.chunk_size):
+                    digest.update(chunk)
+                    out.write(chunk)
+
+            name = self.blob_name(digest.hexdigest(), extension)
+            self._place(tmp_path, self.path(name))
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return name
+
+    def adopt(self, path, sha256, extension=''):
+        """
+        Przenosi gotowy plik z dysku (o znanej sumie) do magazynu bez kopiowania.
+        Plik musi leżeć na tym samym systemie plików co magazyn. Zwraca nazwę bloba.
+        """
+        name = self.blob_name(sha256, extension.lower()[:16])
+        self._place(path, self.path(name))
+        return name
+
+
+def build_blob_storage():
+    conf = get_blob_store_settings()
+    return BlobStorage(location_prefix=conf['LOCATION'], chunk_size=conf['CHUNK_SIZE'])
+
+
+blob_storage = build_blob_storage()
+
+
+def get_blob_storage():
+    """Magazyn dla FileField(storage=...) - funkcja, żeby migracje nie zapisywały ustawień"""
+    return blob_storage
+
+
+# --- LICZNIKI ODWOŁAŃ ---
+
+def acquire_blob(name, size=None):
+    """Zwiększa licznik odwołań bloba (pliki spoza magazynu są pomijane)"""
+    from court.models import FileBlob
+
+    if not blob_storage.is_blob(name):
+        return
+    with transaction.atomic():
+        # Najpierw UPDATE - istniejący wiersz nie może zniknąć między odczytem a zwiększeniem
+        if FileBlob.objects.filter(name=name).update(ref_count=F('ref_count') + 1):
+            return
+        if size is None:
+            size = blob_storage.size(name)
+        try:
+            with transaction.atomic():
+                FileBlob.objects.create(
+                    name=name, sha256=blob_storage.hash_from_name(name), size=size, ref_count=1
+                )
+        except IntegrityError:
+            # Równoległy zapis utworzył wiersz pierwszy
+            FileBlob.objects.filter(name=name).update(ref_count=F('ref_count') + 1)
+
+
+def release_blob(name):
+    """Zmniejsza licznik odwołań; ostatnie odwołanie usuwa plik po commit"""
+    from court.models import FileBlob
+
+    if not blob_storage.is_blob(name):
+        return
+    with transaction.atomic():
+        FileBlob.objects.filter(name=name, ref_count__gt=0).update(ref_count=F('ref_count') - 1)
+        deleted, _ = FileBlob.objects.filter(name=name, ref_count=0).delete()
+    if deleted:
+        transaction.on_commit(lambda: collect_blob(name))
+
+
+def collect_blob(name):
+    """
+    Usuwa plik bloba bez odwołań. Zwraca True, gdy plik został usunięty.
+
+    Plik jest najpierw przenoszony do katalogu tmp (rename jest atomowy).
+    Równoległy zapis tej samej treści albo zdążył odświeżyć mtime (plik
+    wraca na miejsce), albo nie znajdzie pliku i zapisze go od nowa.
+    """
+    from court.models import FileBlob
+
+    if not blob_storage.is_blob(name):
+        return False
+    full_path = blob_storage.path(name)
+    grace = get_blob_store_settings()['COLLECT_GRACE']
+    with transaction.atomic():
+        if FileBlob.objects.filter(name=name).exists():
+            return False
+        collected_path = blob_storage.tmp_path('.collect')
+        try:
+            os.rename(full_path, collected_path)
+        except FileNotFoundError:
+            return False
+        try:
+            recent = time.time() - os.stat(collected_path).st_mtime < grace
+            # Ponowne sprawdzenie po rename - odwołanie mogło powstać w międzyczasie
+            if recent or FileBlob.objects.filter(name=name).exists():
+                if os.path.exists(full_path):
+                    # Zapis zdążył położyć ten sam plik - treść jest identyczna
+                    os.remove(collected_path)
+                else:
+                    os.replace(collected_path, full_path)
+                return False
+            os.remove(collected_path)
+        except OSError as e:
+            print(f"❌ BlobStorage: nie udało się usunąć {name}: {e}")
+            return False
+    return True
+
+
+def collect_unused_blobs():
+    """
+    Usuwa pliki magazynu bez wiersza FileBlob - pominięte wcześniej przez
+    collect_blob jako zbyt świeże. Zwraca liczbę usuniętych plików.
+    """
+    from court.models import FileBlob
+
+    root = blob_storage.path(blob_storage.location_prefix)
+    if not os.path.isdir(root):
+        return 0
+    known = set(FileBlob.objects.values_list('name', flat=True))
+    removed = 0
+    for directory in sorted(os.listdir(root)):
+        if directory == 'tmp' or not os.path.isdir(os.path.join(root, directory)):
+            continue
+        for file_name in os.listdir(os.path.join(root, directory)):
+            name = f'{blob_storage.location_prefix}/{directory}/{file_name}'
+            if name not in known and collect_blob(name):
+                removed += 1
+    return removed
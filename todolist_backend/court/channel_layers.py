@@ -0,0 +1,190 @@
+"""
+Channel layer oparty o wspólny plik SQLite.
+
+InMemoryChannelLayer działa tylko w obrębie jednego procesu - czat
+i powiadomienia nie docierają do gniazd obsługiwanych przez inne workery.
+Ta warstwa przechowuje wiadomości i grupy w pliku SQLite (tryb WAL),
+więc kilka procesów Daphne na jednej maszynie widzi te same grupy.
+Nie wymaga zewnętrznych usług - do wdrożeń na wielu maszynach służy
+RedisChannelLayer (CHANNEL_LAYER_BACKEND=redis w settings).
+
+Odbiór jest realizowany odpytywaniem z narastającym odstępem
+(poll_interval -> max_poll_interval).
+"""
+import asyncio
+import random
+import sqlite3
+import string
+import threading
+import time
+
+import msgpack
+from channels.exceptions import ChannelFull
+from channels.layers import BaseChannelLayer
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS channel_messages (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    channel TEXT NOT NULL,
+    expires REAL NOT NULL,
+    body BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS channel_messages_channel_id ON channel_messages (channel, id);
+CREATE TABLE IF NOT EXISTS channel_groups (
+    grp TEXT NOT NULL,
+    channel TEXT NOT NULL,
+    expires REAL NOT NULL,
+    PRIMARY KEY (grp, channel)
+);
+"""
+
+# Co ile sekund usuwamy przeterminowane wiadomości i członkostwa w grupach
+CLEANUP_INTERVAL = 30
+
+
+class SQLiteChannelLayer(BaseChannelLayer):
+    extensions = ["groups", "flush"]
+
+    def __init__(self, path='channel_layer.sqlite3', expiry=60, group_expiry=86400,
+                 capacity=100, channel_capacity=None, poll_interval=0.005,
+                 max_poll_interval=0.1, **kwargs):
+        super().__init__(expiry=expiry, capacity=capacity, channel_capacity=channel_capacity, **kwargs)
+        self.channel_capacity = self.compile_capacities(channel_capacity or {})
+        self.path = str(path)
+        self.group_expiry = group_expiry
+        self.poll_interval = poll_interval
+        self.max_poll_interval = max_poll_interval
+        self.client_prefix = ''.join(random.choices(string.ascii_letters, k=12))
+
+        self._conn = None
+        self._lock = threading.Lock()
+        self._last_cleanup = 0.0
+
+    # --- POŁĄCZENIE Z BAZĄ ---
+
+    def _connection(self):
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.executescript(SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def _call(self, func, *args):
+        with self._lock:
+            conn = self._connection()
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                result = func(conn, *args)
+            except BaseException:
+                conn.execute('ROLLBACK')
+                raise
+            conn.execute('COMMIT')
+            return result
+
+    async def _run(self, func, *args):
+        # sqlite3 blokuje - operacje wykonujemy w puli wątków
+        return await asyncio.get_running_loop().run_in_executor(None, self._call, func, *args)
+
+    # --- OPERACJE NA BAZIE (wykonywane w transakcji) ---
+
+    def _insert(self, conn, channel, body, now):
+        (count,) = conn.execute(
+            'SELECT COUNT(*) FROM channel_messages WHERE channel = ? AND expires > ?', (channel, now)
+        ).fetchone()
+        if count >= self.get_capacity(channel):
+            return False
+        conn.execute(
+            'INSERT INTO channel_messages (channel, expires, body) VALUES (?, ?, ?)',
+            (channel, now + self.expiry, body)
+        )
+        return True
+
+    def _send(self, conn, channel, body, now):
+        if not self._insert(conn, channel, body, now):
+            raise ChannelFull(channel)
+
+    def _group_send(self, conn, group, body, now):
+        channels = [
+            row[0] for row in conn.execute(
+                'SELECT channel FROM channel_groups WHERE grp = ? AND expires > ?', (group, now)
+            )
+        ]
+        # Jak w RedisChannelLayer: pełne kanały pomijamy bez błędu
+        for channel in channels:
+            self._insert(conn, channel, body, now)
+
+    def _pop(self, conn, channel, now):
+        if now - self._last_cleanup > CLEANUP_INTERVAL:
+            conn.execute('DELETE FROM channel_messages WHERE expires <= ?', (now,))
+            conn.execute('DELETE FROM channel_groups WHERE expires <= ?', (now,))
+            self._last_cleanup = now
+        row = conn.execute(
+            'DELETE FROM channel_messages WHERE id = ('
+            '  SELECT id FROM channel_messages WHERE channel = ? AND expires > ? ORDER BY id LIMIT 1'
+            ') RETURNING body',
+            (channel, now)
+        ).fetchone()
+        return row[0] if row else None
+
+    def _group_add(self, conn, group, channel, now):
+        conn.execute(
+            'INSERT OR REPLACE INTO channel_groups (grp, channel, expires) VALUES (?, ?, ?)',
+            (group, channel, now + self.group_expiry)
+        )
+
+    def _group_discard(self, conn, group, channel):
+        conn.execute('DELETE FROM channel_groups WHERE grp = ? AND channel = ?', (group, channel))
+
+    def _flush(self, conn):
+        conn.execute('DELETE FROM channel_messages')
+        conn.execute('DELETE FROM channel_groups')
+
+    # --- API CHANNEL LAYER ---
+
+    async def send(self, channel, message):
+        assert isinstance(message, dict), "message is not a dict"
+        assert self.valid_channel_name(channel), "Channel name not valid"
+        assert "__asgi_channel__" not in message
+        body = msgpack.packb(message, use_bin_type=True)
+        await self._run(self._send, channel, body, time.time())
+
+    async def receive(self, channel):
+        assert self.valid_channel_name(channel)
+        delay = self.poll_interval
+        while True:
+            body = await self._run(self._pop, channel, time.time())
+            if body is not None:
+                return msgpack.unpackb(body, raw=False)
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.max_poll_interval)
+
+    async def new_channel(self, prefix="specific"):
+        suffix = ''.join(random.choices(string.ascii_letters + string.digits, k=12))
+        return f"{prefix}.{self.client_prefix}!{suffix}"
+
+    async def group_add(self, group, channel):
+        assert self.valid_group_name(group), "Group name not valid"
+        assert self.valid_channel_name(channel), "Channel name not valid"
+        await self._run(self._group_add, group, channel, time.time())
+
+    async def group_discard(self, group, channel):
+        assert self.valid_group_name(group), "Group name not valid"
+        assert self.valid_channel_name(channel), "Channel name not valid"
+        await self._run(self._group_discard, group, channel)
+
+    async def group_send(self, group, message):
+        assert isinstance(message, dict), "Message is not a dict"
+        assert self.valid_group_name(group), "Group name not valid"
+        body = msgpack.packb(message, use_bin_type=True)
+        await self._run(self._group_send, group, body, time.time())
+
+    async def flush(self):
+        await self._run(self._flush)
+
+    async def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
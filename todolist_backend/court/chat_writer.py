@@ -0,0 +1,236 @@
+"""
+Wsadowy zapis wiadomości czatu (ChatConsumer).
+
+ChatConsumer nie zapisuje wiadomości sam - przekazuje je do bufora
+(chat_writer.submit) i od razu wraca do obsługi kolejnych ramek.
+Zadanie asyncio na pętli serwera co FLUSH_INTERVAL sekund (lub gdy bufor
+osiągnie BATCH_SIZE) zapisuje całą partię jednym bulk_create w jednym
+przejściu przez pulę wątków, a potem rozgłasza chat_message_event
+z identyfikatorami z bazy przypisanymi do temp_id nadane przez klienta.
+
+Odbiorców bierzemy z user_cache (court/auth_cache.py) - do bazy trafiają
+tylko identyfikatory, których nie ma w cache.
+
+Gdy zapis partii się nie powiedzie (np. odbiorca z nieaktualnego cache
+został już usunięty), wiadomości są zapisywane pojedynczo; nadawca każdej
+odrzuconej wiadomości dostaje na swój kanał ramkę chat_message_error.
+
+bulk_create nie wywołuje post_save, więc powiadomienia o nowych
+wiadomościach tworzy tu create_message_notifications (court/signals.py),
+wpisy indeksu wyszukiwania index_objects (court/search.py), a rozmowę DM
+(court/conversations.py) przypisujemy jawnie.
+"""
+import asyncio
+
+from channels.db import database_sync_to_async
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.core.exceptions import ObjectDoesNotExist
+from django.db import DatabaseError, transaction
+
+from court.auth_cache import user_cache
+from court.conversations import get_direct_room_id
+
+DEFAULTS = {
+    'FLUSH_INTERVAL': 0.005,
+    'BATCH_SIZE': 100,
+}
+
+
+def get_chat_writer_settings():
+    conf = dict(DEFAULTS)
+    conf.update(getattr(settings, 'CHAT_WRITER', {}))
+    return conf
+
+
+class PendingMessage:
+    __slots__ = ('sender', 'recipient_id', 'content', 'group_name', 'temp_id', 'reply_channel')
+
+    def __init__(self, sender, recipient_id, content, group_name, temp_id, reply_channel):
+        self.sender = sender
+        self.recipient_id = recipient_id
+        self.content = content
+        self.group_name = group_name
+        self.temp_id = temp_id
+        self.reply_channel = reply_channel
+
+
+class ChatMessageWriter:
+    """Bufor wiadomości czatu zapisywany partiami przez zadanie w tle"""
+
+    def __init__(self, flush_interval=0.005, batch_size=100):
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+
+        self._buffer = []
+        self._loop = None
+        self._task = None
+        self._pending = None
+        self._full = None
+
+    @classmethod
+    def from_settings(cls):
+        conf = get_chat_writer_settings()
+        return cls(flush_interval=conf['FLUSH_INTERVAL'], batch_size=conf['BATCH_SIZE'])
+
+    def submit(self, sender, recipient_id, content, group_name, temp_id=None, reply_channel=None):
+        """
+        Dodaje wiadomość do bufora. Wywoływane z consumera (pętla serwera).
+        reply_channel - kanał nadawcy, na który trafia ewentualny błąd zapisu.
+        """
+        try:
+            recipient_id = int(recipient_id)
+        except (TypeError, ValueError):
+            print(f"❌ save_message error: niepoprawny recipient_id {recipient_id!r}")
+            return
+        self._ensure_started()
+        self._buffer.append(PendingMessage(sender, recipient_id, content, group_name, temp_id, reply_channel))
+        self._pending.set()
+        if len(self._buffer) >= self.batch_size:
+            self._full.set()
+
+    def _ensure_started(self):
+        loop = asyncio.get_running_loop()
+        if self._task is not None and not self._task.done() and self._loop is loop:
+            return
+        self._loop = loop
+        self._pending = asyncio.Event()
+        self._full = asyncio.Event()
+        self._task = loop.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            await self._pending.wait()
+            if len(self._buffer) < self.batch_size:
+                try:
+                    await asyncio.wait_for(self._full.wait(), self.flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+            batch, self._buffer = self._buffer[:self.batch_size], self._buffer[self.batch_size:]
+            if len(self._buffer) < self.batch_size:
+                self._full.clear()
+            if not self._buffer:
+                self._pending.clear()
+            try:
+                await self.flush(batch)
+            except Exception as e:
+                print(f"❌ ChatMessageWriter: błąd zapisu partii ({len(batch)} wiadomości): {e}")
+                try:
+                    await self.send_errors([(entry, 'Nie udało się zapisać wiadomości') for entry in batch])
+                except Exception as e:
+                    print(f"❌ ChatMessageWriter: nie wysłano informacji o błędzie: {e}")
+
+    async def flush(self, batch):
+        results, rejected = await database_sync_to_async(self.save_batch)(batch)
+        channel_layer = get_channel_layer()
+        # Kolejność rozgłaszania = kolejność przyjęcia ramek
+        for entry, message in results:
+            event = {'type': 'chat_message_event', 'message': message}
+            if entry.temp_id is not None:
+                event['temp_id'] = entry.temp_id
+            await channel_layer.group_send(entry.group_name, event)
+        await self.send_errors(rejected)
+
+    async def send_errors(self, rejected):
+        """Ramka chat_message_error tylko do nadawcy (jego kanał, nie grupa pokoju)"""
+        channel_layer = get_channel_layer()
+        for entry, error in rejected:
+            if entry.reply_channel is None:
+                continue
+            event = {'type': 'chat_message_error', 'error': error}
+            if entry.temp_id is not None:
+                event['temp_id'] = entry.temp_id
+            await channel_layer.send(entry.reply_channel, event)
+
+    def save_batch(self, batch):
+        """
+        Zapisuje partię jednym bulk_create, a gdy się nie uda - wiadomość po wiadomości.
+        Zwraca (lista (PendingMessage, dane z serializera), lista (PendingMessage, błąd)).
+        """
+        from court.models import Message, User
+        from court.serializers import MessageSerializer
+        from court.signals import create_message_notifications
+        from court.search import index_objects
+
+        recipients = self.get_recipients(batch, User)
+        accepted = []
+        messages = []
+        rejected = []
+        for entry in batch:
+            recipient = recipients.get(entry.recipient_id)
+            if recipient is None:
+                print(f"❌ save_message error: odbiorca {entry.recipient_id!r} nie istnieje")
+                rejected.append((entry, 'Odbiorca nie istnieje'))
+                continue
+            if recipient.id == entry.sender.id:
+                print("❌ save_message error: nie można wysłać wiadomości do siebie")
+                rejected.append((entry, 'Nie można wysłać wiadomości do siebie'))
+                continue
+            try:
+                # bulk_create pomija Message.save() - rozmowę DM przypisujemy sami
+                room_id = get_direct_room_id(entry.sender.id, recipient.id)
+            except (DatabaseError, ObjectDoesNotExist) as e:
+                print(f"❌ save_message error: {e}")
+                # Odbiorca usunięty, a wciąż obecny w cache
+                user_cache.invalidate(str(entry.recipient_id))
+                rejected.append((entry, 'Odbiorca nie istnieje'))
+                continue
+            accepted.append(entry)
+            messages.append(Message(
+                sender=entry.sender,
+                recipient=recipient,
+                room_id=room_id,
+                content=entry.content,
+            ))
+
+        if not messages:
+            return [], rejected
+
+        def save(messages):
+            # Wiadomości, powiadomienia i wpisy outboxu zapisujemy razem albo wcale
+            with transaction.atomic():
+                Message.objects.bulk_create(messages)
+                create_message_notifications(messages)
+                index_objects(messages)
+
+        try:
+            save(messages)
+        except DatabaseError as e:
+            print(f"❌ ChatMessageWriter: partia ({len(messages)} wiadomości) odrzucona: {e} - zapis pojedynczo")
+            saved = []
+            for entry, message in zip(accepted, messages):
+                # Po wycofanej transakcji obiekt mógł zachować pk nadane przez bulk_create
+                message.pk = None
+                message._state.adding = True
+                try:
+                    save([message])
+                except DatabaseError as e:
+                    print(f"❌ save_message error: {e}")
+                    # Np. odbiorca usunięty, a wciąż obecny w cache
+                    user_cache.invalidate(str(entry.recipient_id))
+                    rejected.append((entry, 'Nie udało się zapisać wiadomości'))
+                else:
+                    saved.append((entry, message))
+            accepted = [entry for entry, _ in saved]
+            messages = [message for _, message in saved]
+        return list(zip(accepted, MessageSerializer(messages, many=True).data)), rejected
+
+    def get_recipients(self, batch, User):
+        """recipient_id -> User; istnienie odbiorców sprawdzamy najpierw w cache"""
+        recipients = {}
+        missing = set()
+        for entry in batch:
+            user = user_cache.get(str(entry.recipient_id))
+            if user is None:
+                missing.add(entry.recipient_id)
+            else:
+                recipients[entry.recipient_id] = user
+
+        if missing:
+            for user in User.objects.filter(id__in=missing):
+                user_cache.set(str(user.id), user)
+                recipients[user.id] = user
+        return recipients
+
+
+chat_writer = ChatMessageWriter.from_settings()
@@ -0,0 +1,293 @@
+"""
+Wznawialne przesyłanie dużych plików w kawałkach.
+
+Protokół (court/views/upload_views.py):
+1. POST uploads/ - sesja: nazwa, rozmiar, cel (document/attachment),
+   opcjonalnie suma SHA-256. Serwer odpowiada rozmiarem kawałka
+   i zalecaną liczbą równoległych żądań (CHUNK_SIZE, MAX_CONCURRENCY).
+2. PUT uploads/<id>/ z nagłówkiem Content-Range: bytes start-koniec/rozmiar
+   i surowymi bajtami w treści. Kawałek jest zapisywany strumieniowo prosto
+   w pliku tymczasowym (bez MultiPartParser i bez trzymania w pamięci).
+   Ponowne wysłanie tego samego kawałka go nadpisuje - po zerwanym
+   połączeniu klient pyta GET uploads/<id>/ o brakujące offsety.
+3. POST uploads/<id>/complete/ - gdy są wszystkie kawałki, serwer liczy
+   SHA-256 pliku, porównuje z sumą klienta i przenosi plik do magazynu
+   blobów (court/blob_store.py) bez kopiowania. Dokument albo wiadomość
+   z załącznikiem powstaje w jednej transakcji.
+
+Sesja rezerwuje od razu pełny rozmiar pliku na dysku, więc nowe sesje są
+odrzucane ponad limity: MAX_ACTIVE_SESSIONS i MAX_USER_RESERVED_BYTES na
+użytkownika (sesje niewygasłe) oraz MAX_TOTAL_RESERVED_BYTES dla całego
+serwera (wszystkie niezakończone sesje - ich pliki są na dysku do czasu
+sprzątania).
+
+Porzucone sesje usuwa komenda `cleanup_upload_sessions`.
+"""
+import hashlib
+import os
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.utils import timezone
+
+from court.blob_store import blob_storage, collect_blob
+
+DEFAULTS = {
+    'CHUNK_SIZE': 8 * 1024 * 1024,
+    'MIN_CHUNK_SIZE': 256 * 1024,
+    'MAX_CHUNK_SIZE': 64 * 1024 * 1024,
+    'MAX_CONCURRENCY': 4,
+    'MAX_UPLOAD_SIZE': 4 * 1024 * 1024 * 1024,
+    'SESSION_TTL': 24 * 3600,
+    'READ_SIZE': 64 * 1024,
+    'MAX_ACTIVE_SESSIONS': 10,
+    'MAX_USER_RESERVED_BYTES': 8 * 1024 * 1024 * 1024,
+    'MAX_TOTAL_RESERVED_BYTES': 100 * 1024 * 1024 * 1024,
+}
+
+SHA256_LENGTH = 64
+
+
+def get_chunked_upload_settings():
+    conf = dict(DEFAULTS)
+    conf.update(getattr(settings, 'CHUNKED_UPLOADS', {}))
+    return conf
+
+
+class UploadError(Exception):
+    """Błąd protokołu - komunikat dla klienta i kod HTTP"""
+
+    def __init__(self, message, status_code=400):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+
+
+def part_path(session):
+    # Obok magazynu blobów - przeniesienie gotowego pliku to jedno os.replace
+    return blob_storage.path(f'{blob_storage.location_prefix}/tmp/{session.id}.part')
+
+
+def is_sha256(value):
+    return len(value) == SHA256_LENGTH and all(c in '0123456789abcdef' for c in value)
+
+
+def create_session(user, purpose, filename, total_size, checksum='', chunk_size=None):
+    from court.models import UploadSession, User
+
+    conf = get_chunked_upload_settings()
+    filename = os.path.basename(str(filename or '')).strip()[:255]
+    if not filename:
+        raise UploadError('Podaj nazwę pliku')
+    if purpose not in dict(UploadSession.PURPOSE_CHOICES):
+        raise UploadError('Nieprawidłowy cel przesyłania')
+    try:
+        total_size = int(total_size)
+        chunk_size = int(chunk_size or conf['CHUNK_SIZE'])
+    except (TypeError, ValueError):
+        raise UploadError('Rozmiar musi być liczbą')
+    if total_size <= 0:
+        raise UploadError('Pusty plik')
+    if total_size > conf['MAX_UPLOAD_SIZE']:
+        raise UploadError('Plik jest za duży', 413)
+    chunk_size = max(conf['MIN_CHUNK_SIZE'], min(chunk_size, conf['MAX_CHUNK_SIZE']))
+    checksum = (checksum or '').lower()
+    if checksum and not is_sha256(checksum):
+        raise UploadError('checksum musi być sumą SHA-256 (hex)')
+
+    with transaction.atomic():
+        # Blokada wiersza użytkownika - równoległe żądania nie ominą limitu
+        User.objects.select_for_update().filter(pk=user.pk).exists()
+        check_quota(user, total_size, conf)
+        session = UploadSession.objects.create(
+            user=user,
+            purpose=purpose,
+            filename=filename,
+            total_size=total_size,
+            chunk_size=chunk_size,
+            checksum=checksum,
+            expires_at=timezone.now() + timedelta(seconds=conf['SESSION_TTL']),
+        )
+    path = part_path(session)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Plik docelowego rozmiaru - kawałki zapisujemy w dowolnej kolejności pod swoje offsety
+    with open(path, 'wb') as part:
+        part.truncate(total_size)
+    return session
+
+
+def check_quota(user, total_size, conf):
+    """Rzuca UploadError, gdy nowa sesja przekroczyłaby limity rezerwacji"""
+    from court.models import UploadSession
+
+    pending = UploadSession.objects.exclude(status='completed')
+    mine = pending.filter(user=user, expires_at__gt=timezone.now()).aggregate(
+        sessions=Count('id'), reserved=Sum('total_size')
+    )
+    if mine['sessions'] >= conf['MAX_ACTIVE_SESSIONS']:
+        raise UploadError('Za dużo rozpoczętych przesyłań - dokończ albo poczekaj na wygaśnięcie', 429)
+    if (mine['reserved'] or 0) + total_size > conf['MAX_USER_RESERVED_BYTES']:
+        raise UploadError('Przekroczono limit rozmiaru rozpoczętych przesyłań', 429)
+    reserved = pending.aggregate(reserved=Sum('total_size'))['reserved'] or 0
+    if reserved + total_size > conf['MAX_TOTAL_RESERVED_BYTES']:
+        raise UploadError('Brak miejsca na serwerze - spróbuj później', 507)
+
+
+def get_active_session(session):
+    if session.status != 'active':
+        raise UploadError('Sesja przesyłania jest już zamknięta', 409)
+    if session.expires_at <= timezone.now():
+        raise UploadError('Sesja przesyłania wygasła', 410)
+    return session
+
+
+def parse_content_range(header, total_size):
+    """(start, koniec_włącznie) z nagłówka Content-Range: bytes start-koniec/rozmiar"""
+    try:
+        unit, _, spec = header.partition(' ')
+        byte_range, _, total = spec.partition('/')
+        start, _, end = byte_range.partition('-')
+        start, end = int(start), int(end)
+        if unit != 'bytes' or (total != '*' and int(total) != total_size):
+            raise ValueError
+    except (AttributeError, ValueError):
+        raise UploadError('Nieprawidłowy nagłówek Content-Range')
+    return start, end
+
+
+def write_chunk(session, content_range, stream, chunk_sha256=None):
+    """
+    Zapisuje kawałek strumieniowo w pliku sesji. Kawałek musi zaczynać się
+    na granicy chunk_size i mieć pełną długość (ostatni - do końca pliku).
+    """
+    from court.models import UploadChunk, UploadSession
+
+    conf = get_chunked_upload_settings()
+    get_active_session(session)
+    start, end = parse_content_range(content_range, session.total_size)
+    expected = min(session.chunk_size, session.total_size - start)
+    if start % session.chunk_size or start >= session.total_size or end - start + 1 != expected:
+        raise UploadError(
+            f'Kawałek musi zaczynać się od wielokrotności {session.chunk_size} i mieć {session.chunk_size} bajtów',
+            416,
+        )
+
+    digest = hashlib.sha256()
+    received = 0
+    with open(part_path(session), 'r+b') as part:
+        part.seek(start)
+        while received < expected:
+            data = stream.read(min(conf['READ_SIZE'], expected - received))
+            if not data:
+                break
+            part.write(data)
+            digest.update(data)
+            received += len(data)
+
+    if received != expected or stream.read(1):
+        raise UploadError(f'Kawałek niekompletny: {received} z {expected} bajtów - wyślij go ponownie')
+    if chunk_sha256 and digest.hexdigest() != chunk_sha256.lower():
+        raise UploadError('Suma kontrolna kawałka się nie zgadza - wyślij go ponownie', 422)
+
+    UploadChunk.objects.update_or_create(session=session, offset=start, defaults={'size': received})
+    # Aktywna sesja nie wygasa w trakcie długiego przesyłania
+    UploadSession.objects.filter(pk=session.pk).update(
+        expires_at=timezone.now() + timedelta(seconds=conf['SESSION_TTL'])
+    )
+    return start, received
+
+
+def session_status(session):
+    received = sorted(session.chunks.values_list('offset', flat=True))
+    received_set = set(received)
+    missing = [
+        offset for offset in range(0, session.total_size, session.chunk_size)
+        if offset not in received_set
+    ]
+    conf = get_chunked_upload_settings()
+    return {
+        'id': str(session.id),
+        'filename': session.filename,
+        'purpose': session.purpose,
+        'status': session.status,
+        'total_size': session.total_size,
+        'chunk_size': session.chunk_size,
+        'chunk_count': session.chunk_count,
+        'max_concurrency': conf['MAX_CONCURRENCY'],
+        'received_offsets': received,
+        'missing_offsets': missing,
+        'bytes_received': sum(min(session.chunk_size, session.total_size - o) for o in received),
+        'result_id': session.result_id,
+        'expires_at': session.expires_at,
+    }
+
+
+def file_checksum(path, read_size):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as part:
+        for data in iter(lambda: part.read(read_size), b''):
+            digest.update(data)
+    return digest.hexdigest()
+
+
+def finalize_session(session, checksum, materialize):
+    """
+    Sprawdza komplet kawałków i sumę pliku, przenosi plik do magazynu blobów
+    i w jednej transakcji wywołuje materialize(blob_name, sha256) tworzące
+    rekord. Zwraca wynik materialize.
+    """
+    from court.models import UploadSession
+
+    conf = get_chunked_upload_settings()
+    get_active_session(session)
+    checksum = (checksum or session.checksum or '').lower()
+    if not is_sha256(checksum):
+        raise UploadError('Podaj sumę SHA-256 całego pliku (checksum)')
+    if session.chunks.count() != session.chunk_count:
+        raise UploadError('Nie przesłano wszystkich kawałków', 409)
+
+    # Tylko jedno zatwierdzenie sesji naraz
+    if not UploadSession.objects.filter(pk=session.pk, status='active').update(status='finalizing'):
+        raise UploadError('Sesja jest już zatwierdzana', 409)
+
+    path = part_path(session)
+    actual = file_checksum(path, conf['READ_SIZE'])
+    if actual != checksum:
+        UploadSession.objects.filter(pk=session.pk).update(status='active')
+        raise UploadError('Suma kontrolna pliku się nie zgadza', 422)
+
+    blob_name = blob_storage.adopt(path, actual, os.path.splitext(session.filename)[1])
+    try:
+        with transaction.atomic():
+            result = materialize(blob_name, actual)
+            UploadSession.objects.filter(pk=session.pk).update(status='completed', result_id=result.pk)
+            session.chunks.all().delete()
+    except BaseException:
+        # Rekord nie powstał - plik zostaje, jeśli używa go ktoś inny (albo do collect_unused_blobs).
+        # Pliku tymczasowego już nie ma, więc sesji nie da się wznowić.
+        collect_blob(blob_name)
+        session.delete()
+        raise
+    return result
+
+
+def discard_session(session):
+    try:
+        os.remove(part_path(session))
+    except FileNotFoundError:
+        pass
+    session.delete()
+
+
+def cleanup_expired_sessions(now=None):
+    """Usuwa wygasłe i zakończone sesje razem z plikami tymczasowymi. Zwraca liczbę sesji."""
+    from court.models import UploadSession
+
+    now = now or timezone.now()
+    count = 0
+    for session in UploadSession.objects.filter(expires_at__lte=now).exclude(status='finalizing'):
+        discard_session(session)
+        count += 1
+    return count
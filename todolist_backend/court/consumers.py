@@ -1,13 +1,23 @@
+import asyncio
 import json
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
-from court.models import Message
-from court.serializers import MessageSerializer
+from channels.layers import get_channel_layer
+from court.chat_writer import chat_writer
+from court.conversations import get_direct_room_id, mark_conversation_read
+from court.presence import (
+    get_presence_interests,
+    get_presence_settings,
+    get_presence_snapshot,
+    presence_group_name,
+    presence_registry,
+)
+from court.unread_counters import unread_counters
 from django.contrib.auth import get_user_model
 
 User = get_user_model()
 
-# --- CONSUMER CZATU (bez zmian) ---
+# --- CONSUMER CZATU ---
 class ChatConsumer(AsyncWebsocketConsumer):
     async def connect(self):
         self.user = self.scope["user"]
@@ -21,6 +31,8 @@ class ChatConsumer(AsyncWebsocketConsumer):
             sorted_ids = sorted(map(int, ids))
             self.room_id = f"{sorted_ids[0]}_{sorted_ids[1]}"
             self.room_group_name = f"chat_{self.room_id}"
+            # Rozmówca - potrzebny przy przesuwaniu znacznika przeczytania
+            self.partner_id = sorted_ids[1] if sorted_ids[0] == self.user.id else sorted_ids[0]
         except ValueError:
             await self.close()
             return
@@ -37,19 +49,33 @@ class ChatConsumer(AsyncWebsocketConsumer):
         message_type = data.get('type')
 
         if message_type == 'chat_message':
-            recipient_id = data.get('recipient_id')
-            content = data.get('content')
-            temp_id = data.get('temp_id')
-
-            message = await self.save_message(recipient_id, content)
+            # Zapis i rozgłoszenie (z temp_id) wykonuje wsadowo chat_writer
+            chat_writer.submit(
+                self.user,
+                data.get('recipient_id'),
+                data.get('content'),
+                self.room_group_name,
+                data.get('temp_id'),
+                self.channel_name,
+            )
 
-            if message:
+        elif message_type == 'mark_read':
+            # Przesunięcie znacznika przeczytania rozmowy (opcjonalnie do message_id)
+            if self.user.id not in map(int, self.room_id.split("_")):
+                return
+            try:
+                message_id = data.get('message_id')
+                message_id = int(message_id) if message_id is not None else None
+            except (TypeError, ValueError):
+                return
+            last_read = await self.mark_read(message_id)
+            if last_read is not None:
                 await self.channel_layer.group_send(
                     self.room_group_name,
                     {
-                        'type': 'chat_message_event',
-                        'message': message,
-                        'temp_id': temp_id
+                        'type': 'messages_read_event',
+                        'reader_id': self.user.id,
+                        'last_read_message_id': last_read,
                     }
                 )
 
@@ -62,24 +88,57 @@ class ChatConsumer(AsyncWebsocketConsumer):
             response["temp_id"] = event["temp_id"]
         await self.send(text_data=json.dumps(response))
 
+    async def chat_message_error(self, event):
+        # Wiadomość nadawcy nie została zapisana (court/chat_writer.py)
+        response = {
+            "type": "chat_message_error",
+            "error": event["error"],
+        }
+        if "temp_id" in event:
+            response["temp_id"] = event["temp_id"]
+        await self.send(text_data=json.dumps(response))
+
+    async def messages_read_event(self, event):
+        await self.send(text_data=json.dumps({
+            "type": "messages_read",
+            "reader_id": event["reader_id"],
+            "last_read_message_id": event["last_read_message_id"],
+        }))
+
     @database_sync_to_async
-    def save_message(self, recipient_id, content):
-        try:
-            recipient = User.objects.get(id=int(recipient_id))
-            message = Message.objects.create(
-                sender=self.user,
-                recipient=recipient,
-                content=content,
-            )
-            serializer = MessageSerializer(message)
-            return serializer.data
-        except Exception as e:
-            print(f"❌ save_message error: {e}")
+    def mark_read(self, message_id):
+        """Zwraca nowy znacznik albo None, jeśli się nie przesunął"""
+        room_id = get_direct_room_id(self.user.id, self.partner_id, create=False)
+        if room_id is None:
             return None
+        state, advanced = mark_conversation_read(self.user.id, room_id, message_id)
+        return state.last_read_message_id if advanced else None
 
 
 # --- CONSUMER POWIADOMIEŃ I STATUSÓW ---
+async def broadcast_presence(user_id, is_online):
+    """Słuchacz rejestru obecności - rozgłasza zmianę do obserwatorów użytkownika"""
+    await get_channel_layer().group_send(
+        presence_group_name(user_id),
+        {
+            'type': 'presence_update',
+            'user_id': user_id,
+            'status': 'online' if is_online else 'offline'
+        }
+    )
+
+
+presence_registry.add_listener(broadcast_presence)
+
+
 class NotificationConsumer(AsyncWebsocketConsumer):
+    """
+    Powiadomienia użytkownika + statusy obecności osób, które go interesują.
+    Statusy przychodzą jako:
+      - presence_snapshot: lista obserwowanych użytkowników online (po połączeniu),
+      - presence_batch: zmiany zebrane w oknie BATCH_INTERVAL (jedna ramka).
+    Liczniki nieprzeczytanych (plakietki) przychodzą jako unread_counts.
+    """
     async def connect(self):
         self.user = self.scope["user"]
         
@@ -92,20 +151,31 @@ class NotificationConsumer(AsyncWebsocketConsumer):
         self.group_name = f"notifications_{self.user.id}"
         await self.channel_layer.group_add(self.group_name, self.channel_name)
 
-        # 2. Dołączamy do globalnej grupy statusów
-        self.presence_group = "online_users"
-        await self.channel_layer.group_add(self.presence_group, self.channel_name)
+        # 2. Subskrybujemy statusy tylko tych osób, które użytkownika interesują
+        presence_conf = get_presence_settings()
+        self.presence_batch_interval = presence_conf['BATCH_INTERVAL']
+        self.presence_max_interests = presence_conf['MAX_INTERESTS']
+        self.presence_watched = set()
+        self.presence_known = {}     # user_id -> ostatnio wysłany status
+        self.presence_buffer = {}    # user_id -> status czekający na wysłanie
+        self.presence_flush_task = None
+
+        interests = await database_sync_to_async(get_presence_interests)(self.user.id)
 
-        # 3. Zapisz w bazie, że użytkownik jest podłączony (is_online = True)
-        await self.set_user_online(self.user, True)
+        # 3. Rejestrujemy połączenie (zapis is_online do bazy odbywa się zbiorczo w tle)
+        became_online = presence_registry.connect(self.user.id, self.channel_name)
 
         await self.accept()
+        await self.watch_presence(interests)
+
+        # Aktualne liczniki plakietek - kolejne zmiany przychodzą ramkami unread_counts
+        counts = await database_sync_to_async(unread_counters.get_all)(self.user.id)
+        await self.unread_counts({'counts': counts})
 
-        # 4. Jeśli użytkownik jest widoczny, rozgłoś "jestem online"
-        is_visible = await self.get_user_visibility(self.user)
-        if is_visible:
+        # 4. Rozgłaszamy "jestem online" tylko przy pierwszym połączeniu widocznego użytkownika
+        if became_online and self.user.is_visible:
             await self.channel_layer.group_send(
-                self.presence_group,
+                presence_group_name(self.user.id),
                 {
                     'type': 'presence_update',
                     'user_id': self.user.id,
@@ -114,20 +184,13 @@ class NotificationConsumer(AsyncWebsocketConsumer):
             )
 
     async def disconnect(self, close_code):
-        # 1. Zapisz w bazie, że użytkownik rozłączony (is_online = False)
-        await self.set_user_online(self.user, False)
-
-        # 2. Rozgłoś "jestem offline" (chyba że był już ukryty, ale dla uproszczenia wysyłamy)
-        if hasattr(self, 'presence_group'):
-            await self.channel_layer.group_send(
-                self.presence_group,
-                {
-                    'type': 'presence_update',
-                    'user_id': self.user.id,
-                    'status': 'offline'
-                }
-            )
-            await self.channel_layer.group_discard(self.presence_group, self.channel_name)
+        # Status offline rozgłasza rejestr, gdy zamknięte zostanie ostatnie połączenie
+        if hasattr(self, 'presence_watched'):
+            presence_registry.disconnect(self.user.id, self.channel_name)
+            if self.presence_flush_task:
+                self.presence_flush_task.cancel()
+            for user_id in self.presence_watched:
+                await self.channel_layer.group_discard(presence_group_name(user_id), self.channel_name)
 
         if hasattr(self, 'group_name'):
             await self.channel_layer.group_discard(self.group_name, self.channel_name)
@@ -136,11 +199,14 @@ class NotificationConsumer(AsyncWebsocketConsumer):
         data = json.loads(text_data)
         message_type = data.get('type')
 
+        # Każda ramka od klienta potwierdza, że połączenie żyje
+        presence_registry.heartbeat(self.user.id, self.channel_name)
+
         # Obsługa ręcznej zmiany widoczności z frontendu
         if message_type == 'visibility_change':
             new_status = data.get('status') # 'online' lub 'offline' (ukryty)
             await self.channel_layer.group_send(
-                self.presence_group,
+                presence_group_name(self.user.id),
                 {
                     'type': 'presence_update',
                     'user_id': self.user.id,
@@ -148,6 +214,34 @@ class NotificationConsumer(AsyncWebsocketConsumer):
                 }
             )
 
+        # Dodatkowe osoby do obserwowania (np. rozmówca otwarty w czacie)
+        elif message_type == 'presence_subscribe':
+            try:
+                user_ids = {int(user_id) for user_id in data.get('user_ids', [])}
+            except (TypeError, ValueError):
+                return
+            user_ids.discard(self.user.id)
+            await self.watch_presence(user_ids)
+
+    async def watch_presence(self, user_ids):
+        """Dołącza do grup obecności i wysyła snapshot dla nowo obserwowanych osób"""
+        room = self.presence_max_interests - len(self.presence_watched)
+        new_ids = [user_id for user_id in user_ids if user_id not in self.presence_watched][:max(room, 0)]
+        if not new_ids:
+            return
+
+        for user_id in new_ids:
+            await self.channel_layer.group_add(presence_group_name(user_id), self.channel_name)
+        self.presence_watched.update(new_ids)
+
+        online = await database_sync_to_async(get_presence_snapshot)(new_ids)
+        for user_id in new_ids:
+            self.presence_known[user_id] = 'online' if user_id in online else 'offline'
+        await self.send(text_data=json.dumps({
+            "type": "presence_snapshot",
+            "online": online
+        }))
+
     # --- OBSŁUGA ZDARZEŃ ---
 
     async def send_notification(self, event):
@@ -155,19 +249,45 @@ class NotificationConsumer(AsyncWebsocketConsumer):
             "type": "notification",
             "data": event["notification"]
         }))
+        # Liczniki po zmianie (z outboxu) - klient ich nie dolicza sam
+        if "counts" in event:
+            await self.unread_counts(event)
 
-    async def presence_update(self, event):
+    async def send_notifications(self, event):
+        # Kilka powiadomień z jednej partii outboxu - klient dostaje osobne ramki
+        for notification in event["notifications"]:
+            await self.send_notification({"notification": notification})
+        if "counts" in event:
+            await self.unread_counts(event)
+
+    async def unread_counts(self, event):
         await self.send(text_data=json.dumps({
-            "type": "presence_update",
-            "user_id": event["user_id"],
-            "status": event["status"]
+            "type": "unread_counts",
+            **event["counts"],
         }))
 
-    @database_sync_to_async
-    def get_user_visibility(self, user):
-        return user.is_visible
+    async def presence_update(self, event):
+        # Zbieramy zmiany i wysyłamy je jedną ramką co BATCH_INTERVAL
+        self.presence_buffer[event["user_id"]] = event["status"]
+        if self.presence_flush_task is None:
+            self.presence_flush_task = asyncio.ensure_future(self.flush_presence())
 
-    @database_sync_to_async
-    def set_user_online(self, user, status):
-        # Używamy update, aby uniknąć problemów z race condition i nadpisywaniem całego obiektu
-        User.objects.filter(id=user.id).update(is_online=status)
\ No newline at end of file
+    async def flush_presence(self):
+        await asyncio.sleep(self.presence_batch_interval)
+        buffer, self.presence_buffer = self.presence_buffer, {}
+        self.presence_flush_task = None
+
+        # Pomijamy zmiany, które się zniosły (np. offline -> online w jednym oknie)
+        changes = [
+            {"user_id": user_id, "status": status}
+            for user_id, status in buffer.items()
+            if self.presence_known.get(user_id) != status
+        ]
+        if not changes:
+            return
+        for change in changes:
+            self.presence_known[change["user_id"]] = change["status"]
+        await self.send(text_data=json.dumps({
+            "type": "presence_batch",
+            "changes": changes
+        }))
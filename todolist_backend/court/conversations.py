@@ -0,0 +1,221 @@
+"""
+Kanoniczne rozmowy prywatne (DM).
+
+Każda wiadomość prywatna należy do pokoju ChatRoom z is_direct=True
+i parą użytkowników w porządku user_a < user_b. Dzięki temu historia,
+liczniki i "ostatnia wiadomość" to zakres jednego indeksu (room, created_at)
+zamiast zapytania z OR po (sender, recipient) w obu kierunkach.
+
+Pokój powstaje przy pierwszej wiadomości (get_direct_room_id). Wiadomości
+sprzed wprowadzenia rozmów przypisuje backfill_direct_rooms - uruchamiany
+w migracji i komendą `backfill_direct_rooms`.
+
+Przeczytanie rozmowy to znacznik ConversationReadState (ostatnie przeczytane
+id wiadomości) przesuwany jednym zapisem - nieprzeczytane to wiadomości
+od rozmówcy z id powyżej znacznika (annotate_unread_counts).
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from court.auth_cache import LRUCache
+
+# (user_a_id, user_b_id) -> id pokoju; unieważniane przy usunięciu pokoju (signals.py)
+direct_room_cache = LRUCache(10000, ttl=3600)
+
+
+def canonical_pair(user1_id, user2_id):
+    return (user1_id, user2_id) if user1_id < user2_id else (user2_id, user1_id)
+
+
+def chat_group_name(user1_id, user2_id):
+    """Grupa channel layer ChatConsumer dla rozmowy DM"""
+    return "chat_{}_{}".format(*canonical_pair(user1_id, user2_id))
+
+
+def get_direct_room_id(user1_id, user2_id, create=True):
+    """
+    Id pokoju DM dla pary użytkowników. Gdy pokój nie istnieje, tworzy go
+    (create=True) albo zwraca None.
+    """
+    from court.models import ChatRoom
+
+    pair = canonical_pair(user1_id, user2_id)
+    room_id = direct_room_cache.get(pair)
+    if room_id is not None:
+        return room_id
+
+    room_id = (
+        ChatRoom.objects.filter(is_direct=True, user_a_id=pair[0], user_b_id=pair[1])
+        .values_list('id', flat=True).first()
+    )
+    if room_id is None and create:
+        try:
+            with transaction.atomic():
+                room = ChatRoom.objects.create(is_direct=True, user_a_id=pair[0], user_b_id=pair[1])
+                room.participants.add(*pair)
+            room_id = room.id
+        except IntegrityError:
+            # Równoległe utworzenie tej samej rozmowy - bierzemy istniejący pokój
+            room_id = ChatRoom.objects.get(is_direct=True, user_a_id=pair[0], user_b_id=pair[1]).id
+
+    if room_id is not None:
+        direct_room_cache.set(pair, room_id)
+    return room_id
+
+
+def invalidate_direct_room(room):
+    if room.is_direct and room.user_a_id and room.user_b_id:
+        direct_room_cache.invalidate(canonical_pair(room.user_a_id, room.user_b_id))
+
+
+def backfill_direct_rooms(Message=None, ChatRoom=None):
+    """
+    Przypisuje wiadomości prywatne bez pokoju do ich rozmów DM, tworząc
+    brakujące pokoje i scalając zduplikowane. Przyjmuje klasy modeli, żeby
+    dało się ją wywołać z migracji (modele historyczne nie mają save() z
+    porządkowaniem pary - pary układamy tutaj).
+    Zwraca (liczba_utworzonych_pokoi, liczba_przypisanych_wiadomości).
+    """
+    if Message is None or ChatRoom is None:
+        from court.models import ChatRoom, Message
+
+    rooms = {}
+    for room_id, user_a_id, user_b_id in (
+        ChatRoom.objects.filter(is_direct=True, user_a__isnull=False, user_b__isnull=False)
+        .order_by('id').values_list('id', 'user_a_id', 'user_b_id')
+    ):
+        pair = canonical_pair(user_a_id, user_b_id)
+        if pair in rooms:
+            # Duplikat rozmowy - wiadomości przenosimy do najstarszego pokoju
+            Message.objects.filter(room_id=room_id).update(room_id=rooms[pair])
+            ChatRoom.objects.filter(id=room_id).delete()
+        else:
+            rooms[pair] = room_id
+
+    orphans = Message.objects.filter(room__isnull=True, recipient__isnull=False)
+    pairs = {
+        canonical_pair(sender_id, recipient_id)
+        for sender_id, recipient_id in orphans.order_by().values_list('sender_id', 'recipient_id').distinct()
+        if sender_id != recipient_id
+    }
+
+    missing = sorted(pair for pair in pairs if pair not in rooms)
+    for room in ChatRoom.objects.bulk_create(
+        [ChatRoom(is_direct=True, user_a_id=a, user_b_id=b) for a, b in missing],
+        batch_size=500,
+    ):
+        rooms[(room.user_a_id, room.user_b_id)] = room.id
+    # Obaj rozmówcy są uczestnikami pokoju (także w pokojach utworzonych wcześniej)
+    ChatRoom.participants.through.objects.bulk_create(
+        [
+            ChatRoom.participants.through(chatroom_id=room_id, user_id=user_id)
+            for pair, room_id in rooms.items() for user_id in pair
+        ],
+        batch_size=1000,
+        ignore_conflicts=True,
+    )
+
+    assigned = 0
+    for (a, b) in sorted(pairs):
+        # Dwa UPDATE na parę - oba korzystają z indeksu (sender, recipient, created_at)
+        assigned += orphans.filter(sender_id=a, recipient_id=b).update(room_id=rooms[(a, b)])
+        assigned += orphans.filter(sender_id=b, recipient_id=a).update(room_id=rooms[(a, b)])
+    return len(missing), assigned
+
+
+def mark_conversation_read(user_id, room_id, up_to_message_id=None):
+    """
+    Przesuwa znacznik przeczytania użytkownika w pokoju do wiadomości
+    up_to_message_id (domyślnie do najnowszej). Znacznik nigdy się nie cofa.
+    Zwraca (ConversationReadState, czy_znacznik_się_przesunął).
+    """
+    from court.models import ConversationReadState, Message
+
+    messages = Message.objects.filter(room_id=room_id)
+    if up_to_message_id is not None:
+        messages = messages.filter(id__lte=up_to_message_id)
+    target = messages.order_by('-id').values_list('id', 'created_at').first()
+
+    with transaction.atomic():
+        state, _ = ConversationReadState.objects.select_for_update().get_or_create(
+            user_id=user_id, room_id=room_id
+        )
+        if target is None or target[0] <= state.last_read_message_id:
+            return state, False
+
+        state.last_read_message_id, state.last_read_at = target
+        state.save(update_fields=['last_read_message_id', 'last_read_at', 'updated_at'])
+        # is_read zostaje spójne dla MessageSerializer - jeden UPDATE zamiast save() na wiersz
+        Message.objects.filter(
+            room_id=room_id, recipient_id=user_id, is_read=False, id__lte=state.last_read_message_id
+        ).update(is_read=True)
+
+    from court.unread_counters import unread_counters
+    unread_counters.invalidate(user_id, 'messages')
+    return state, True
+
+
+def read_watermark(user, room_ref='pk'):
+    """Wyrażenie: id ostatniej przeczytanej wiadomości w pokoju (0, gdy brak znacznika)"""
+    from court.models import ConversationReadState
+
+    return Coalesce(
+        Subquery(
+            ConversationReadState.objects.filter(user=user, room=OuterRef(room_ref))
+            .values('last_read_message_id')[:1]
+        ),
+        Value(0),
+    )
+
+
+def annotate_unread_counts(rooms, user):
+    """Dodaje do pokoi unread_count: cudze wiadomości powyżej znacznika użytkownika"""
+    return rooms.annotate(read_watermark=read_watermark(user)).annotate(
+        unread_count=Count(
+            'messages',
+            filter=Q(messages__id__gt=F('read_watermark')) & ~Q(messages__sender=user),
+        )
+    )
+
+
+def annotate_room_summaries(rooms, user):
+    """
+    Dane do listy pokoi bez zagnieżdżania wiadomości: liczba uczestników,
+    ostatnia wiadomość (podzapytania po indeksie (room, created_at))
+    i liczba nieprzeczytanych - wszystko w jednym zapytaniu.
+    """
+    from court.models import ChatRoom, Message
+
+    last = Message.objects.filter(room=OuterRef('pk')).order_by('-created_at', '-id')
+    participants = (
+        ChatRoom.participants.through.objects.filter(chatroom=OuterRef('pk'))
+        .order_by().values('chatroom').annotate(total=Count('*')).values('total')
+    )
+    return annotate_unread_counts(rooms, user).annotate(
+        participant_count=Coalesce(Subquery(participants), Value(0)),
+        last_message_id=Subquery(last.values('id')[:1]),
+        last_message_content=Subquery(last.values('content')[:1]),
+        last_message_attachment=Subquery(last.values('attachment')[:1]),
+        last_message_sender_id=Subquery(last.values('sender_id')[:1]),
+        last_message_at=Subquery(last.values('created_at')[:1]),
+    )
+
+
+def last_message_summary(room):
+    """Ostatnia wiadomość z adnotacji annotate_room_summaries (None dla pustego pokoju)"""
+    if getattr(room, 'last_message_id', None) is None:
+        return None
+    return {
+        'id': room.last_message_id,
+        'sender_id': room.last_message_sender_id,
+        'content': room.last_message_content[:100],
+        'has_attachment': bool(room.last_message_attachment),
+        'created_at': room.last_message_at,
+    }
+
+
+def direct_rooms_for(user):
+    from court.models import ChatRoom
+
+    return ChatRoom.objects.filter(Q(user_a=user) | Q(user_b=user), is_direct=True)
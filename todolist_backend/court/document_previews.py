@@ -0,0 +1,197 @@
+"""
+Podglądy dokumentów generowane w tle (miniatura + tekst) - pula procesów.
+
+Po zatwierdzeniu transakcji z nowym plikiem (sygnał w court/signals.py)
+zadanie trafia do ProcessPoolExecutor - żądanie uploadu nie czeka na
+generowanie ani na start procesów. Proces roboczy ma własny Django (ORM),
+tworzy pochodne (court/preview_generators.py) i zapisuje wynik od razu we
+wszystkich dokumentach o tej samej sumie treści.
+
+Pochodne leżą w MEDIA_ROOT/<LOCATION>/<ab>/<sha256>.jpg|.txt - kolejny
+dokument z tym samym plikiem korzysta z gotowych plików. Usuwane są razem
+z ostatnim dokumentem o danej sumie.
+
+Zaległe dokumenty (sprzed wprowadzenia podglądów, po awarii puli)
+przetwarza komenda `generate_document_previews`.
+"""
+import multiprocessing
+import os
+import threading
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+
+DEFAULTS = {
+    'ENABLED': True,
+    'WORKERS': 2,
+    'START_METHOD': 'spawn',         # procesy bez kopii wątków/pętli asyncio serwera
+    'LOCATION': 'previews',          # katalog w MEDIA_ROOT
+    'THUMBNAIL_SIZE': 320,           # px - dłuższy bok miniatury
+    'THUMBNAIL_QUALITY': 80,
+    'MAX_SOURCE_SIZE': 200 * 1024 * 1024,
+    'MAX_TEXT_CHARS': 100_000,
+    'MAX_TEXT_PAGES': 20,
+    'EXCERPT_CHARS': 500,
+    'TIMEOUT': 60,                   # sekundy na jedno narzędzie zewnętrzne
+    'PDFTOPPM': 'pdftoppm',
+    'PDFTOTEXT': 'pdftotext',
+}
+
+
+def get_document_preview_settings():
+    conf = dict(DEFAULTS)
+    conf.update(getattr(settings, 'DOCUMENT_PREVIEWS', {}))
+    return conf
+
+
+def preview_names(content_hash, conf=None):
+    """Nazwy (względem MEDIA_ROOT) miniatury i pliku tekstowego dla sumy treści"""
+    from court.preview_generators import TEXT_SUFFIX, THUMBNAIL_SUFFIX
+
+    conf = conf or get_document_preview_settings()
+    base = f"{conf['LOCATION'].strip('/')}/{content_hash[:2]}/{content_hash}"
+    return base + THUMBNAIL_SUFFIX, base + TEXT_SUFFIX
+
+
+def init_worker():
+    """Start procesu roboczego - własna konfiguracja Django i własne połączenia z bazą"""
+    import django
+    from django.apps import apps
+    from django.db import connections
+
+    if not apps.ready:
+        django.setup()
+    # Przy 'fork' proces dziedziczy gniazda połączeń rodzica - nie wolno ich używać
+    connections.close_all()
+
+
+def process_document_previews(content_hash, source_path, extension):
+    """Zadanie puli: generuje pochodne i zapisuje wynik w dokumentach. Zwraca status."""
+    from django.core.files.storage import default_storage
+    from django.db import close_old_connections
+    from court.models import Document
+    from court.preview_generators import generate_previews
+    from court.search import index_objects
+
+    conf = get_document_preview_settings()
+    thumbnail, text = preview_names(content_hash, conf)
+    try:
+        result = generate_previews(
+            source_path, extension, default_storage.path(thumbnail), default_storage.path(text), conf
+        )
+        for error in result['errors']:
+            print(f"❌ Podglądy dokumentu {content_hash[:12]} - {error}")
+        updates = {
+            'preview_status': result['status'],
+            'thumbnail': thumbnail if result['thumbnail'] else '',
+            'text_preview': text if result['text'] else '',
+            'text_excerpt': result['excerpt'],
+        }
+    except Exception as e:
+        print(f"❌ Podglądy dokumentu {content_hash[:12]}: {e}")
+        updates = {'preview_status': 'failed', 'thumbnail': '', 'text_preview': '', 'text_excerpt': ''}
+
+    close_old_connections()
+    documents = Document.objects.filter(content_hash=content_hash)
+    documents.update(**updates)
+    if updates['text_preview']:
+        # update() pomija sygnały - tekst trafia do indeksu wyszukiwania tutaj
+        index_objects(documents)
+    return updates['preview_status']
+
+
+class DocumentPreviewPool:
+    """Leniwie tworzona pula procesów generujących podglądy"""
+
+    def __init__(self):
+        self._executor = None
+        self._lock = threading.Lock()
+        self.stats = Counter()
+
+    def get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                conf = get_document_preview_settings()
+                self._executor = ProcessPoolExecutor(
+                    max_workers=conf['WORKERS'],
+                    mp_context=multiprocessing.get_context(conf['START_METHOD']),
+                    initializer=init_worker,
+                )
+                print(f"🚀 Pula podglądów dokumentów: {conf['WORKERS']} procesów")
+            return self._executor
+
+    def submit(self, content_hash, source_path, extension=None):
+        """Zleca wygenerowanie podglądów; nie czeka na wynik. Zwraca Future albo None."""
+        if not content_hash or not get_document_preview_settings()['ENABLED']:
+            return None
+        if extension is None:
+            extension = os.path.splitext(source_path)[1]
+        try:
+            future = self.get_executor().submit(process_document_previews, content_hash, source_path, extension)
+        except (BrokenProcessPool, RuntimeError) as e:
+            print(f"❌ Pula podglądów niedostępna: {e}")
+            self.reset()
+            return None
+        self.stats['submitted'] += 1
+        future.add_done_callback(self._finished)
+        return future
+
+    def _finished(self, future):
+        if future.cancelled():
+            # Anulowane przy reset() - dokumenty zostają 'pending' do ponownego zlecenia
+            self.stats['cancelled'] += 1
+            return
+        error = future.exception()
+        if error is None:
+            self.stats[future.result()] += 1
+            return
+        # Awaria procesu (np. brak pamięci) - dokumenty zostają 'pending' do ponownego zlecenia
+        self.stats['crashed'] += 1
+        print(f"❌ Zadanie podglądu przerwane: {error}")
+        if isinstance(error, BrokenProcessPool):
+            self.reset()
+
+    def reset(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
+
+    def get_stats(self):
+        return dict(self.stats)
+
+
+document_previews = DocumentPreviewPool()
+
+
+def submit_document(document):
+    """Zleca podglądy dla dokumentu z plikiem w lokalnym magazynie"""
+    if not document.file or not document.content_hash:
+        return None
+    try:
+        source_path = document.file.path
+    except NotImplementedError:
+        return None
+    return document_previews.submit(document.content_hash, source_path, os.path.splitext(document.download_name)[1])
+
+
+def remove_unused_previews(content_hash):
+    """Usuwa pochodne, gdy żaden dokument nie ma już tej treści"""
+    from django.core.files.storage import default_storage
+    from court.models import Document
+
+    if not content_hash or Document.objects.filter(content_hash=content_hash).exists():
+        return
+    for name in preview_names(content_hash):
+        try:
+            default_storage.delete(name)
+        except OSError as e:
+            print(f"❌ Nie udało się usunąć podglądu {name}: {e}")
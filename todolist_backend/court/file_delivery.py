@@ -0,0 +1,252 @@
+"""
+Wydawanie plików dokumentów (document_download).
+
+- ETag (silny) z sumy SHA-256 treści zapisanej w Document.content_hash,
+  Last-Modified z daty dodania - If-None-Match / If-Modified-Since kończą
+  się odpowiedzią 304 bez czytania pliku (get_conditional_response).
+- Range: pojedynczy zakres -> 206 z Content-Range, kilka zakresów ->
+  206 multipart/byteranges. Zakresy nakładające się są scalane; przy
+  ich nadmiarze (MAX_RANGES) wysyłamy cały plik. If-Range z innym ETagiem
+  lub z datą różną od Last-Modified (albo datą, która nie jest silnym
+  walidatorem) również oznacza cały plik.
+- SENDFILE_MODE: 'x-sendfile' (Apache/lighttpd) albo 'x-accel-redirect'
+  (nginx, lokalizacja `internal` pod ACCEL_REDIRECT_PREFIX) - worker
+  Pythona zwraca tylko nagłówki, bajty (także zakresy) wysyła serwer WWW.
+"""
+import hashlib
+import mimetypes
+import time
+import uuid
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import content_disposition_header, http_date, parse_http_date_safe, quote_etag
+
+DEFAULTS = {
+    'SENDFILE_MODE': None,                    # None, 'x-sendfile' lub 'x-accel-redirect'
+    'ACCEL_REDIRECT_PREFIX': '/protected-media/',
+    'CHUNK_SIZE': 64 * 1024,
+    'MAX_RANGES': 16,
+}
+
+
+def get_file_delivery_settings():
+    conf = dict(DEFAULTS)
+    conf.update(getattr(settings, 'DOCUMENT_DOWNLOAD', {}))
+    return conf
+
+
+def file_sha256(file, chunk_size=64 * 1024):
+    """Suma SHA-256 pliku (File/UploadedFile/FieldFile), czytana kawałkami"""
+    digest = hashlib.sha256()
+    file.seek(0)
+    for chunk in file.chunks(chunk_size):
+        digest.update(chunk)
+    file.seek(0)
+    return digest.hexdigest()
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def parse_range_header(header, size, max_ranges):
+    """
+    Zakresy z nagłówka Range jako lista (start, koniec_włącznie), posortowana
+    i scalona. None = nagłówek do zignorowania (wysyłamy cały plik).
+    Rzuca RangeNotSatisfiable, gdy żaden zakres nie mieści się w pliku.
+    """
+    if not header or not header.startswith('bytes='):
+        return None
+
+    ranges = []
+    for spec in header[len('bytes='):].split(','):
+        start, sep, end = spec.strip().partition('-')
+        if not sep:
+            return None
+        try:
+            if start:
+                start = int(start)
+                end = int(end) if end else size - 1
+            else:
+                # bytes=-N: ostatnie N bajtów
+                length = int(end)
+                if length == 0:
+                    continue
+                start, end = max(size - length, 0), size - 1
+        except ValueError:
+            return None
+        if start >= size:
+            # Zakres za końcem pliku - pomijamy (same takie zakresy = 416)
+            continue
+        if end < start:
+            return None
+        ranges.append((start, min(end, size - 1)))
+
+    if not ranges:
+        raise RangeNotSatisfiable()
+
+    ranges.sort()
+    merged = [ranges[0]]
+    for start, end in ranges[1:]:
+        last_start, last_end = merged[-1]
+        if start <= last_end + 1:
+            merged[-1] = (last_start, max(last_end, end))
+        else:
+            merged.append((start, end))
+    if len(merged) > max_ranges:
+        return None
+    return merged
+
+
+def if_range_matches(request, etag, last_modified):
+    """Czy If-Range pozwala odpowiedzieć zakresem (brak nagłówka = tak)"""
+    value = request.META.get('HTTP_IF_RANGE')
+    if not value:
+        return True
+    if value.startswith('"') or value.startswith('W/'):
+        # Tylko silne porównanie ETagów
+        return value == etag
+    # Data jest silnym walidatorem tylko wtedy, gdy plik zmienił się co najmniej
+    # sekundę przed wysłaniem odpowiedzi (RFC 9110, 8.8.2.2) - i musi być równa
+    if last_modified is None or last_modified > time.time() - 1:
+        return False
+    return parse_http_date_safe(value) == last_modified
+
+
+def read_range(file, start, end, chunk_size):
+    """Generator bajtów [start, end] z otwartego pliku; zamyka plik na końcu"""
+    try:
+        file.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = file.read(min(chunk_size, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+    finally:
+        file.close()
+
+
+def multipart_ranges(open_file, ranges, size, content_type, boundary, chunk_size):
+    """Części multipart/byteranges - zwraca (generator, długość_treści)"""
+    headers = [
+        (
+            f'--{boundary}\r\n'
+            f'Content-Type: {content_type}\r\n'
+            f'Content-Range: bytes {start}-{end}/{size}\r\n\r\n'
+        ).encode('ascii')
+        for start, end in ranges
+    ]
+    closing = f'\r\n--{boundary}--\r\n'.encode('ascii')
+    length = sum(len(h) for h in headers) + sum(end - start + 1 for start, end in ranges)
+    # Każda część poza pierwszą zaczyna się od CRLF kończącego poprzednią
+    length += 2 * (len(ranges) - 1) + len(closing)
+
+    def body():
+        file = open_file()
+        try:
+            for index, ((start, end), header) in enumerate(zip(ranges, headers)):
+                if index:
+                    yield b'\r\n'
+                yield header
+                file.seek(start)
+                remaining = end - start + 1
+                while remaining > 0:
+                    chunk = file.read(min(chunk_size, remaining))
+                    if not chunk:
+                        break
+                    remaining -= len(chunk)
+                    yield chunk
+            yield closing
+        finally:
+            file.close()
+
+    return body(), length
+
+
+def sendfile_response(field_file, conf):
+    """Odpowiedź z nagłówkiem dla serwera WWW albo None, gdy tryb wyłączony lub niedostępny"""
+    mode = conf['SENDFILE_MODE']
+    if not mode:
+        return None
+    response = HttpResponse()
+    if mode == 'x-accel-redirect':
+        response['X-Accel-Redirect'] = conf['ACCEL_REDIRECT_PREFIX'].rstrip('/') + '/' + field_file.name
+    elif mode == 'x-sendfile':
+        try:
+            response['X-Sendfile'] = field_file.path
+        except NotImplementedError:
+            # Magazyn bez ścieżek lokalnych - wysyła Python
+            return None
+    else:
+        return None
+    # Typ ustawia serwer WWW na podstawie pliku
+    del response['Content-Type']
+    return response
+
+
+def serve_file(request, field_file, filename, etag_value=None, last_modified=None, size=None):
+    """
+    Odpowiedź pobrania pliku z obsługą żądań warunkowych i zakresów.
+    etag_value: suma treści (bez cudzysłowów), last_modified: datetime.
+    """
+    conf = get_file_delivery_settings()
+    etag = quote_etag(etag_value) if etag_value else None
+    modified = int(last_modified.timestamp()) if last_modified else None
+    content_type = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+
+    def finish(response):
+        if etag:
+            response['ETag'] = etag
+        if modified is not None:
+            response['Last-Modified'] = http_date(modified)
+        response['Accept-Ranges'] = 'bytes'
+        response['Content-Disposition'] = content_disposition_header(True, filename)
+        return response
+
+    placeholder = finish(HttpResponse())
+    conditional = get_conditional_response(request, etag=etag, last_modified=modified, response=placeholder)
+    if conditional is not placeholder:
+        return conditional
+
+    offloaded = sendfile_response(field_file, conf)
+    if offloaded is not None:
+        return finish(offloaded)
+
+    if size is None:
+        size = field_file.size
+    ranges = None
+    if request.META.get('HTTP_RANGE') and if_range_matches(request, etag, modified):
+        try:
+            ranges = parse_range_header(request.META['HTTP_RANGE'], size, conf['MAX_RANGES'])
+        except RangeNotSatisfiable:
+            response = finish(HttpResponse(status=416))
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+
+    if not ranges:
+        response = FileResponse(field_file.open('rb'), content_type=content_type)
+        return finish(response)
+
+    if len(ranges) == 1:
+        start, end = ranges[0]
+        response = StreamingHttpResponse(
+            read_range(field_file.open('rb'), start, end, conf['CHUNK_SIZE']),
+            status=206, content_type=content_type,
+        )
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response['Content-Length'] = str(end - start + 1)
+        return finish(response)
+
+    boundary = uuid.uuid4().hex
+    body, length = multipart_ranges(
+        lambda: field_file.open('rb'), ranges, size, content_type, boundary, conf['CHUNK_SIZE']
+    )
+    response = StreamingHttpResponse(
+        body, status=206, content_type=f'multipart/byteranges; boundary={boundary}'
+    )
+    response['Content-Length'] = str(length)
+    return finish(response)
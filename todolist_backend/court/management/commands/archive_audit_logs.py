@@ -0,0 +1,26 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from court.audit_archive import archive_logs, get_archive_settings
+
+
+class Command(BaseCommand):
+    help = 'Przenosi stare wpisy audytu do skompresowanych archiwów miesięcznych'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int,
+            help='Archiwizuj wpisy starsze niż podana liczba dni (domyślnie AUDIT_LOG_ARCHIVE["RETENTION_DAYS"])'
+        )
+
+    def handle(self, *args, **options):
+        conf = get_archive_settings()
+        days = options['days'] if options['days'] is not None else conf['RETENTION_DAYS']
+        before = timezone.now() - timedelta(days=days)
+
+        self.stdout.write(f"📦 Archiwizacja wpisów sprzed {before:%Y-%m-%d %H:%M} do {conf['PATH']}")
+        summary = archive_logs(before)
+        for month, count in summary.items():
+            self.stdout.write(f"   - {month}: {count} wpisów")
+
+        self.stdout.write(self.style.SUCCESS(f'✅ Zarchiwizowano {sum(summary.values())} wpisów'))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from court.conversations import backfill_direct_rooms
+
+
+class Command(BaseCommand):
+    help = 'Przypisuje wiadomości prywatne bez pokoju do kanonicznych rozmów DM (ChatRoom is_direct)'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            created, assigned = backfill_direct_rooms()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ Utworzono {created} rozmów DM i przypisano {assigned} wiadomości'
+        ))
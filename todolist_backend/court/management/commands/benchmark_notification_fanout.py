@@ -0,0 +1,87 @@
+import asyncio
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from court.models import Notification, NotificationOutbox, User
+from court.notification_fanout import fan_out_notification
+from court.notification_outbox import notification_outbox
+from court.unread_counters import unread_counters
+
+
+class Command(BaseCommand):
+    help = 'Pomiar masowych powiadomień: create w pętli vs fan_out_notification (na tymczasowych użytkownikach)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipients', type=int, nargs='+', default=[10, 100, 10000],
+                            help='Liczby odbiorców do zmierzenia')
+        parser.add_argument('--loop-limit', type=int, default=1000,
+                            help='Powyżej tej liczby odbiorców pomijamy wariant z pętlą')
+
+    def handle(self, *args, **options):
+        self.stdout.write('🚀 Odbiorcy | wariant | zapis | zapytania | wysyłka | group_send')
+        for count in options['recipients']:
+            if count <= options['loop_limit']:
+                self.measure(count, 'pętla create', self.create_in_loop)
+            self.measure(count, 'fan-out', self.fan_out)
+        self.stdout.write(self.style.SUCCESS('✅ Pomiar zakończony, dane testowe usunięte'))
+
+    def measure(self, count, label, create):
+        run_id = uuid.uuid4().hex[:8]
+        users = User.objects.bulk_create([
+            User(username=f'fanout_bench_{run_id}_{i}', password='!') for i in range(count)
+        ])
+        user_ids = [user.id for user in users]
+        try:
+            started = time.perf_counter()
+            with CaptureQueriesContext(connection) as queries:
+                create(user_ids)
+            write_time = time.perf_counter() - started
+
+            started = time.perf_counter()
+            calls = asyncio.run(self.drain(user_ids))
+            dispatch_time = time.perf_counter() - started
+            created = Notification.objects.filter(user_id__in=user_ids).count()
+        finally:
+            # Użytkownicy testowi znikają razem z powiadomieniami i wpisami outboxu
+            User.objects.filter(id__in=user_ids).delete()
+            for user_id in user_ids:
+                unread_counters.invalidate(user_id, 'notifications', push=False)
+
+        self.stdout.write(
+            f'   {count:>7} | {label:<12} | {write_time * 1000:9.1f} ms | {len(queries):6} | '
+            f'{dispatch_time * 1000:9.1f} ms | {calls:6}  ({created} powiadomień)'
+        )
+
+    def create_in_loop(self, user_ids):
+        # Dotychczasowy wzorzec z sygnałów: INSERT powiadomienia i wpisu outboxu na odbiorcę
+        for user_id in user_ids:
+            notif = Notification.objects.create(
+                user_id=user_id, title='Komunikat', message='Pomiar', notification_type='announcement'
+            )
+            NotificationOutbox.objects.create(notification=notif, user_id=user_id)
+
+    def fan_out(self, user_ids):
+        fan_out_notification(user_ids, 'Komunikat', 'Pomiar')
+
+    async def drain(self, user_ids):
+        """Wysyła tylko wpisy użytkowników testowych - kolejka prawdziwych zostaje nietknięta"""
+        from channels.layers import get_channel_layer
+
+        layer = get_channel_layer()
+        original, calls = layer.group_send, [0]
+
+        async def counting_group_send(group, message):
+            calls[0] += 1
+            return await original(group, message)
+
+        layer.group_send = counting_group_send
+        try:
+            while await notification_outbox.dispatch_batch(user_ids):
+                pass
+        finally:
+            layer.group_send = original
+        return calls[0]
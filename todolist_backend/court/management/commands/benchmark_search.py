@@ -0,0 +1,256 @@
+import random
+import statistics
+import time
+import unicodedata
+from itertools import accumulate
+from types import SimpleNamespace
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from court.search import SQLiteFTSBackend, SearchEntry
+
+TABLE = 'court_search_benchmark'
+PLAIN_TABLE = 'court_search_benchmark_plain'
+
+SYLLABLES = [
+    'sąd', 'wy', 'rok', 'praw', 'ka', 'no', 'wa', 'umo', 'wie', 'dzo', 'zna', 'ste',
+    'po', 'wód', 'kar', 'cy', 'wil', 'ny', 'ape', 'la', 'cja', 'rze', 'czo', 'spa',
+    'dek', 'ma', 'jąt', 'ko', 'ali', 'men', 'ty', 'roz', 'na', 'kaz',
+]
+# Słowa testowe z polskimi znakami - w korpusie występują tylko tam, gdzie je wstawimy
+NEEDLE_SYLLABLES = ['żół', 'gęś', 'łąk', 'źdź', 'ćmą', 'ńsk', 'óść', 'ęły']
+# Korpus zdominowany przez wiadomości - jak w działającej aplikacji
+KINDS = [('message', 0.75), ('document', 0.1), ('party', 0.1), ('case', 0.05)]
+USERS = 200  # autorzy/adresaci wiadomości; pk=1 to administrator z benchmarku
+
+
+def strip_diacritics(text):
+    text = text.replace('ł', 'l').replace('Ł', 'L')
+    return ''.join(c for c in unicodedata.normalize('NFD', text) if not unicodedata.combining(c))
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark wyszukiwania pełnotekstowego na syntetycznym korpusie: czas indeksowania, '
+        'opóźnienia zapytań (p50/p95/p99) względem skanu LIKE, trafność rankingu bm25 '
+        'i wpływ limitu MAX_CANDIDATES na wyniki'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1_000_000, help='Liczba wpisów korpusu')
+        parser.add_argument('--queries', type=int, default=200, help='Liczba zapytań na rodzaj')
+        parser.add_argument('--topics', type=int, default=50, help='Liczba tematów do oceny trafności')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--keep', action='store_true', help='Nie usuwaj tabel benchmarku')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            self.stderr.write('❌ Benchmark wymaga SQLite z FTS5')
+            return
+
+        self.rng = random.Random(options['seed'])
+        self.vocabulary = self.build_vocabulary(20_000)
+        self.weights = list(accumulate(1 / rank for rank in range(1, len(self.vocabulary) + 1)))
+        self.backend = SQLiteFTSBackend(table=TABLE)
+        topics = self.build_topics(options['topics'])
+
+        self.backend.drop_schema()
+        self.backend.create_schema()
+        with connection.cursor() as cursor:
+            cursor.execute(f'DROP TABLE IF EXISTS {PLAIN_TABLE}')
+            cursor.execute(f'CREATE TABLE {PLAIN_TABLE} (id INTEGER PRIMARY KEY, title TEXT, body TEXT)')
+
+        try:
+            self.fill(options['rows'], options['batch_size'], topics)
+            self.measure_latency(options['queries'], topics)
+            self.measure_relevance(topics)
+            self.measure_candidate_cap(min(options['queries'], 20))
+        finally:
+            if not options['keep']:
+                self.backend.drop_schema()
+                with connection.cursor() as cursor:
+                    cursor.execute(f'DROP TABLE IF EXISTS {PLAIN_TABLE}')
+
+    # --- KORPUS ---
+
+    def build_vocabulary(self, size):
+        words = set()
+        while len(words) < size:
+            words.add(''.join(self.rng.choice(SYLLABLES) for _ in range(self.rng.randint(2, 4))))
+        # Stała kolejność = stały rozkład Zipfa dla danego ziarna
+        return sorted(words, key=lambda word: (len(word), word))
+
+    def build_topics(self, count):
+        topics = []
+        used = set()
+        while len(topics) < count:
+            pair = tuple(
+                ''.join(self.rng.choice(NEEDLE_SYLLABLES) for _ in range(3)) for _ in range(2)
+            )
+            if pair[0] != pair[1] and not used & set(pair):
+                used.update(pair)
+                topics.append(pair)
+        return topics
+
+    def words(self, count):
+        return ' '.join(self.rng.choices(self.vocabulary, cum_weights=self.weights, k=count))
+
+    def fill(self, rows, batch_size, topics):
+        # Dla każdego tematu: 5 trafień w tytule, 20 w treści, 50 wpisów z jednym słowem (nie pasują)
+        planted = {}
+        for index, (first, second) in enumerate(topics):
+            for n in range(5):
+                planted[len(planted)] = (index, 'title', f'{first} {second} {self.words(4)}', self.words(30))
+            for n in range(20):
+                planted[len(planted)] = (index, 'body', self.words(6), f'{self.words(60)} {first} {self.words(40)} {second} {self.words(60)}')
+            for n in range(50):
+                planted[len(planted)] = (index, 'noise', self.words(6), f'{self.words(40)} {self.rng.choice((first, second))} {self.words(40)}')
+        slots = self.rng.sample(range(rows), min(len(planted), rows))
+        planted_at = dict(zip(slots, planted.values()))
+        self.relevant = {index: {'title': set(), 'body': set()} for index in range(len(topics))}
+
+        kinds, kind_weights = zip(*KINDS)
+        self.stdout.write(f'🚀 Indeksowanie {rows} wpisów (partie po {batch_size})...')
+        start = time.perf_counter()
+        for batch_start in range(0, rows, batch_size):
+            entries, plain = [], []
+            for object_id in range(batch_start, min(rows, batch_start + batch_size)):
+                kind = self.rng.choices(kinds, weights=kind_weights)[0]
+                if object_id in planted_at:
+                    index, relevance, title, body = planted_at[object_id]
+                    if relevance != 'noise':
+                        self.relevant[index][relevance].add((kind, object_id))
+                elif kind == 'message':
+                    title, body = '', self.words(self.rng.randint(5, 40))
+                elif kind == 'document':
+                    title, body = self.words(6), self.words(self.rng.randint(100, 300))
+                elif kind == 'party':
+                    title, body = self.words(3), self.words(1)
+                else:
+                    title, body = self.words(8), self.words(self.rng.randint(20, 80))
+                users = self.rng.sample(range(1, USERS + 1), 2) if kind == 'message' else (None, None)
+                entries.append(SearchEntry(
+                    kind, object_id, title, body, case_id=object_id % 1000, user_a=users[0], user_b=users[1]
+                ))
+                plain.append((object_id, title, body))
+            with transaction.atomic():
+                self.backend.index(entries)
+                with connection.cursor() as cursor:
+                    cursor.executemany(f'INSERT INTO {PLAIN_TABLE} (id, title, body) VALUES (%s, %s, %s)', plain)
+        elapsed = time.perf_counter() - start
+        self.backend.optimize()
+        self.stdout.write(
+            f'   {elapsed:.1f} s ({rows / elapsed:,.0f} wpisów/s), optimize: {time.perf_counter() - start - elapsed:.1f} s'
+        )
+
+    # --- POMIARY ---
+
+    def time_queries(self, label, queries, backend=None, **kwargs):
+        backend = backend or self.backend
+        timings, hits = [], 0
+        for query in queries:
+            start = time.perf_counter()
+            results, next_cursor = backend.search(query, limit=20, **kwargs)
+            if next_cursor:
+                backend.search(query, limit=20, cursor=next_cursor, **kwargs)
+            timings.append((time.perf_counter() - start) * 1000)
+            hits += len(results)
+        self.stdout.write(
+            f'   {label:<28} p50 {statistics.median(timings):7.2f} ms   p95 {percentile(timings, 0.95):7.2f} ms   '
+            f'p99 {percentile(timings, 0.99):7.2f} ms   śr. wyników {hits / len(queries):.1f}'
+        )
+
+    def measure_latency(self, count, topics):
+        common = self.vocabulary[:50]
+        queries = {
+            'częste słowo': [self.rng.choice(common) for _ in range(count)],
+            'dwa częste słowa': [' '.join(self.rng.sample(common, 2)) for _ in range(count)],
+            'rzadkie słowa (tematy)': [' '.join(self.rng.choice(topics)) for _ in range(count)],
+            'prefiks (3 znaki)': [self.rng.choice(common)[:3] for _ in range(count)],
+            'bez polskich znaków': [strip_diacritics(' '.join(self.rng.choice(topics))) for _ in range(count)],
+        }
+        self.stdout.write('⏱  Opóźnienia (strona 1 + strona 2 przez kursor, 20 wyników):')
+        for label, batch in queries.items():
+            self.time_queries(label, batch)
+        staff = SimpleNamespace(pk=1, is_staff=True)
+        self.time_queries('administracja', queries['częste słowo'], user=staff)
+        self.time_queries('administracja, type=case', queries['częste słowo'], user=staff, kinds=['case'])
+        # Zwykły użytkownik: ~1% wiadomości to jego rozmowy - filtr tokenami access i zapasowy przez odczyt kolumn
+        user = SimpleNamespace(pk=1, is_staff=False)
+        self.time_queries('użytkownik (tokeny access)', queries['częste słowo'], user=user)
+        column_backend = SQLiteFTSBackend(table=TABLE)
+        column_backend.conf = dict(column_backend.conf, MAX_ACCESS_TOKENS=-1)
+        self.time_queries(
+            'użytkownik (odczyt kolumn)', queries['częste słowo'][:max(1, count // 4)], user=user, backend=column_backend
+        )
+
+        timings = []
+        with connection.cursor() as cursor:
+            for first, second in topics[:10]:
+                start = time.perf_counter()
+                cursor.execute(
+                    f'SELECT id FROM {PLAIN_TABLE} WHERE (title LIKE %s OR body LIKE %s) '
+                    f'AND (title LIKE %s OR body LIKE %s) LIMIT 20',
+                    [f'%{first}%', f'%{first}%', f'%{second}%', f'%{second}%'],
+                )
+                cursor.fetchall()
+                timings.append((time.perf_counter() - start) * 1000)
+        self.stdout.write(f"   {'LIKE (skan, dla porównania)':<28} p50 {statistics.median(timings):7.2f} ms")
+
+    def measure_relevance(self, topics):
+        precision, reciprocal_ranks, recall, folded_recall = [], [], [], []
+        for index, (first, second) in enumerate(topics):
+            in_title = self.relevant[index]['title']
+            matching = in_title | self.relevant[index]['body']
+            results, _ = self.backend.search(f'{first} {second}', limit=25)
+            found = [(r['type'], r['id']) for r in results]
+            precision.append(sum(1 for key in found[:5] if key in in_title) / max(1, min(5, len(in_title))))
+            rank = next((position for position, key in enumerate(found, 1) if key in in_title), None)
+            reciprocal_ranks.append(1 / rank if rank else 0)
+            recall.append(len(set(found) & matching) / max(1, len(matching)))
+            folded, _ = self.backend.search(strip_diacritics(f'{first} {second}'), limit=25)
+            folded_recall.append(len({(r['type'], r['id']) for r in folded} & matching) / max(1, len(matching)))
+
+        self.stdout.write('🎯 Trafność (tematy: 5 trafień w tytule, 20 w treści, 50 z jednym słowem):')
+        self.stdout.write(f'   precision@5 (tytuł nad treścią): {statistics.mean(precision):.3f}')
+        self.stdout.write(f'   MRR:                             {statistics.mean(reciprocal_ranks):.3f}')
+        self.stdout.write(f'   recall@25:                       {statistics.mean(recall):.3f}')
+        self.stdout.write(f'   recall@25 bez polskich znaków:   {statistics.mean(folded_recall):.3f}')
+
+    def measure_candidate_cap(self, count):
+        """Częste słowa: wyniki z limitem MAX_CANDIDATES względem pełnego rankingu"""
+        full = SQLiteFTSBackend(table=TABLE)
+        full.conf = dict(full.conf, MAX_CANDIDATES=0)
+        staff = SimpleNamespace(pk=1, is_staff=True)
+        scenarios = {
+            'wszystkie typy': {},
+            'type=case': {'kinds': ['case']},
+            'administracja': {'user': staff},
+            'administracja, type=case': {'user': staff, 'kinds': ['case']},
+            'administracja, type=message': {'user': staff, 'kinds': ['message']},
+            'użytkownik': {'user': SimpleNamespace(pk=1, is_staff=False)},
+        }
+        queries = [self.rng.choice(self.vocabulary[:50]) for _ in range(count)]
+
+        self.stdout.write(
+            f"📏 Limit MAX_CANDIDATES={self.backend.conf['MAX_CANDIDATES']} (częste słowa, top 20 względem pełnego rankingu):"
+        )
+        for label, kwargs in scenarios.items():
+            overlap, emptied, types_lost = [], 0, 0
+            for query in queries:
+                expected, _ = full.search(query, limit=20, **kwargs)
+                found, _ = self.backend.search(query, limit=20, **kwargs)
+                expected_keys = {(r['type'], r['id']) for r in expected}
+                overlap.append(len(expected_keys & {(r['type'], r['id']) for r in found}) / max(1, len(expected_keys)))
+                emptied += bool(expected) and not found
+                types_lost += len({r['type'] for r in expected} - {r['type'] for r in found})
+            self.stdout.write(
+                f'   {label:<28} zgodność {statistics.mean(overlap):.3f}   '
+                f'puste zamiast wyników: {emptied}   utracone typy: {types_lost}'
+            )
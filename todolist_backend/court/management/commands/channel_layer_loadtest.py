@@ -0,0 +1,132 @@
+import asyncio
+import multiprocessing
+import statistics
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.module_loading import import_string
+
+CHAT_GROUP = 'chat_loadtest'
+
+
+def build_layer(capacity):
+    config = settings.CHANNEL_LAYERS['default']
+    layer_class = import_string(config['BACKEND'])
+    return layer_class(**{**config.get('CONFIG', {}), 'capacity': capacity})
+
+
+async def run_worker(worker_id, workers, messages, barrier):
+    layer = build_layer(capacity=workers * messages * 2)
+    channel = await layer.new_channel()
+    await layer.group_add(CHAT_GROUP, channel)
+    await layer.group_add(f'notifications_{worker_id}', channel)
+
+    # Wszystkie workery muszą być w grupach, zanim ktokolwiek zacznie wysyłać
+    await asyncio.get_running_loop().run_in_executor(None, barrier.wait)
+
+    # Każdy worker dostaje czat od wszystkich (także od siebie)
+    # i powiadomienia od poprzedniego workera w pierścieniu
+    expected = {'chat_message_event': workers * messages, 'send_notification': messages}
+    received = {'chat_message_event': 0, 'send_notification': 0}
+    latencies = []
+
+    async def send_all():
+        for i in range(messages):
+            await layer.group_send(CHAT_GROUP, {
+                'type': 'chat_message_event',
+                'message': {'id': i, 'sender_id': worker_id, 'content': f'msg {i}'},
+                'temp_id': f'{worker_id}-{i}',
+                'sent_at': time.time(),
+            })
+            await layer.group_send(f'notifications_{(worker_id + 1) % workers}', {
+                'type': 'send_notification',
+                'notification': {'id': i, 'title': 'Powiadomienie', 'sender': worker_id},
+                'sent_at': time.time(),
+            })
+
+    async def receive_all():
+        while received != expected:
+            event = await layer.receive(channel)
+            received[event['type']] += 1
+            latencies.append(time.time() - event['sent_at'])
+
+    try:
+        await asyncio.wait_for(asyncio.gather(send_all(), receive_all()), timeout=120)
+    except asyncio.TimeoutError:
+        pass
+    finally:
+        await layer.group_discard(CHAT_GROUP, channel)
+        await layer.group_discard(f'notifications_{worker_id}', channel)
+    return {'worker': worker_id, 'expected': expected, 'received': received, 'latencies': latencies}
+
+
+def worker_main(worker_id, workers, messages, barrier, results):
+    import django
+    django.setup()
+    results.put(asyncio.run(run_worker(worker_id, workers, messages, barrier)))
+
+
+class Command(BaseCommand):
+    help = 'Test obciążeniowy channel layer: dostarczanie chat_message_event i send_notification między procesami'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4, help='Liczba procesów')
+        parser.add_argument('--messages', type=int, default=200, help='Wiadomości czatu i powiadomień na proces')
+
+    def handle(self, *args, **options):
+        backend = settings.CHANNEL_LAYERS['default']['BACKEND']
+        if backend.endswith('InMemoryChannelLayer'):
+            raise CommandError(
+                'InMemoryChannelLayer nie działa między procesami - ustaw CHANNEL_LAYER_BACKEND=sqlite lub redis'
+            )
+
+        workers, messages = options['workers'], options['messages']
+        self.stdout.write(f'🚀 {backend}: {workers} procesów × {messages} wiadomości')
+
+        async def flush():
+            layer = build_layer(capacity=1)
+            await layer.flush()
+            await layer.close()
+        asyncio.run(flush())
+
+        ctx = multiprocessing.get_context('spawn')
+        barrier = ctx.Barrier(workers)
+        results = ctx.Queue()
+        processes = [
+            ctx.Process(target=worker_main, args=(i, workers, messages, barrier, results))
+            for i in range(workers)
+        ]
+        started = time.monotonic()
+        for process in processes:
+            process.start()
+        reports = [results.get() for _ in processes]
+        for process in processes:
+            process.join()
+        elapsed = time.monotonic() - started
+
+        failed = False
+        latencies = []
+        for report in sorted(reports, key=lambda r: r['worker']):
+            latencies += report['latencies']
+            ok = report['received'] == report['expected']
+            failed = failed or not ok
+            self.stdout.write(
+                f"   - worker {report['worker']}: "
+                f"czat {report['received']['chat_message_event']}/{report['expected']['chat_message_event']}, "
+                f"powiadomienia {report['received']['send_notification']}/{report['expected']['send_notification']}"
+                f"{'' if ok else '  ❌'}"
+            )
+
+        if latencies:
+            latencies.sort()
+            self.stdout.write(
+                f'   Opóźnienie: p50 {statistics.median(latencies) * 1000:.1f} ms, '
+                f'p95 {latencies[int(len(latencies) * 0.95) - 1] * 1000:.1f} ms, '
+                f'max {latencies[-1] * 1000:.1f} ms'
+            )
+        self.stdout.write(f'   Dostarczono {len(latencies)} wiadomości w {elapsed:.1f} s')
+
+        if failed:
+            raise CommandError('Nie wszystkie wiadomości zostały dostarczone')
+        self.stdout.write(self.style.SUCCESS('✅ Wszystkie wiadomości dostarczone'))
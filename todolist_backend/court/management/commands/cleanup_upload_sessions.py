@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from court.chunked_uploads import cleanup_expired_sessions
+
+
+class Command(BaseCommand):
+    help = 'Usuwa wygasłe sesje przesyłania w kawałkach razem z plikami tymczasowymi'
+
+    def handle(self, *args, **options):
+        count = cleanup_expired_sessions()
+        self.stdout.write(self.style.SUCCESS(f'✅ Usunięto {count} wygasłych sesji przesyłania'))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from court.blob_store import collect_unused_blobs, get_blob_store_settings
+
+
+class Command(BaseCommand):
+    help = (
+        'Usuwa pliki magazynu adresowanego treścią, do których nie odwołuje się żaden rekord '
+        '(starsze niż BLOB_STORAGE["COLLECT_GRACE"])'
+    )
+
+    def handle(self, *args, **options):
+        count = collect_unused_blobs()
+        grace = get_blob_store_settings()['COLLECT_GRACE']
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ Usunięto {count} nieużywanych plików (pominięto młodsze niż {grace} s)'
+        ))
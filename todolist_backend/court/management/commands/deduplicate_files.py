@@ -0,0 +1,109 @@
+import os
+from collections import Counter
+
+from django.core.files.storage import FileSystemStorage
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+from court.blob_store import blob_storage, collect_blob
+from court.models import Document, FileBlob, Message
+
+
+class Command(BaseCommand):
+    help = (
+        'Przenosi pliki dokumentów i załączników czatu do magazynu adresowanego treścią '
+        '(duplikaty zostają zapisane raz) i przelicza liczniki odwołań'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Tylko policz, nic nie zmieniaj')
+        parser.add_argument('--keep-originals', action='store_true',
+                            help='Nie usuwaj starych plików po przeniesieniu')
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        # Stare pliki leżą pod MEDIA_ROOT w zwykłych katalogach upload_to
+        legacy_storage = FileSystemStorage()
+        stats = Counter()
+        moved = {}  # stara nazwa -> nazwa bloba (ten sam plik w wielu rekordach)
+
+        for model, field, name_field in (
+            (Document, 'file', 'original_name'),
+            (Message, 'attachment', 'attachment_name'),
+        ):
+            rows = (
+                model.objects.exclude(**{field: ''}).exclude(**{f'{field}__isnull': True})
+                .exclude(**{f'{field}__startswith': blob_storage.location_prefix + '/'})
+                .values_list('pk', field, name_field)
+            )
+            for pk, old_name, original_name in rows.iterator():
+                stats['records'] += 1
+                if not legacy_storage.exists(old_name):
+                    stats['missing'] += 1
+                    self.stdout.write(self.style.WARNING(f'   brak pliku: {old_name} ({model.__name__} {pk})'))
+                    continue
+                if dry_run:
+                    continue
+
+                if old_name not in moved:
+                    with legacy_storage.open(old_name, 'rb') as content:
+                        blob_name = blob_storage.save(old_name, content)
+                    stats['bytes'] += legacy_storage.size(old_name)
+                    moved[old_name] = blob_name
+
+                updates = {field: moved[old_name]}
+                if not original_name:
+                    updates[name_field] = os.path.basename(old_name)[:255]
+                if model is Document:
+                    updates['content_hash'] = blob_storage.hash_from_name(moved[old_name])
+                # update() zamiast save() - liczniki przeliczamy niżej jednym przebiegiem
+                model.objects.filter(pk=pk).update(**updates)
+                stats['moved'] += 1
+
+        if dry_run:
+            self.stdout.write(
+                f"🔍 Do przeniesienia: {stats['records']} rekordów, brakujących plików: {stats['missing']}"
+            )
+            return
+
+        counts = self.recount()
+        blobs_bytes = sum(FileBlob.objects.filter(name__in=set(moved.values())).values_list('size', flat=True))
+
+        if not options['keep_originals']:
+            for old_name in moved:
+                legacy_storage.delete(old_name)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Przeniesiono {stats['moved']} rekordów ({len(moved)} plików, {len(set(moved.values()))} unikalnych), "
+            f"oszczędność {(stats['bytes'] - blobs_bytes) / 1024 / 1024:.1f} MB"
+        ))
+        self.stdout.write(
+            f"   Bloby: {counts['blobs']}, usunięte nieużywane: {counts['orphans']}, "
+            f"brakujące pliki: {stats['missing']}"
+        )
+
+    def recount(self):
+        """Liczniki odwołań od nowa z Document.file i Message.attachment"""
+        references = Counter()
+        for model, field in ((Document, 'file'), (Message, 'attachment')):
+            for row in (
+                model.objects.filter(**{f'{field}__startswith': blob_storage.location_prefix + '/'})
+                .values(field).annotate(total=Count('pk'))
+            ):
+                references[row[field]] += row['total']
+
+        existing = dict(FileBlob.objects.values_list('name', 'ref_count'))
+        for name, total in references.items():
+            if name in existing:
+                if existing[name] != total:
+                    FileBlob.objects.filter(name=name).update(ref_count=total)
+            else:
+                FileBlob.objects.create(
+                    name=name, sha256=blob_storage.hash_from_name(name),
+                    size=blob_storage.size(name), ref_count=total,
+                )
+
+        orphans = [name for name in existing if name not in references]
+        FileBlob.objects.filter(name__in=orphans).delete()
+        for name in orphans:
+            collect_blob(name)
+        return {'blobs': len(references), 'orphans': len(orphans)}
@@ -0,0 +1,32 @@
+import asyncio
+
+from django.core.management.base import BaseCommand
+from court.notification_outbox import notification_outbox
+
+
+class Command(BaseCommand):
+    help = 'Wysyła powiadomienia z outboxu przez channel layer (proces poza serwerem ASGI)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Opróżnij kolejkę i zakończ')
+
+    def handle(self, *args, **options):
+        if options['once']:
+            total = asyncio.run(self.drain())
+            self.stdout.write(self.style.SUCCESS(f'✅ Przetworzono {total} wpisów outboxu'))
+            self.stdout.write(str(notification_outbox.get_stats()))
+            return
+
+        self.stdout.write(f'🚀 Dispatcher outboxu (co {notification_outbox.poll_interval} s), Ctrl+C kończy')
+        try:
+            asyncio.run(notification_outbox.run_forever())
+        except KeyboardInterrupt:
+            pass
+
+    async def drain(self):
+        total = 0
+        while True:
+            count = await notification_outbox.dispatch_batch()
+            total += count
+            if count < notification_outbox.batch_size:
+                return total
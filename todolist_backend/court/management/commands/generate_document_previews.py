@@ -0,0 +1,45 @@
+from concurrent.futures import wait
+
+from django.core.management.base import BaseCommand
+from court.document_previews import document_previews, submit_document
+from court.file_delivery import file_sha256
+from court.models import Document
+
+
+class Command(BaseCommand):
+    help = 'Generuje zaległe podglądy dokumentów (miniatury i tekst) w puli procesów'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Wygeneruj ponownie podglądy wszystkich dokumentów')
+        parser.add_argument('--failed', action='store_true', help='Ponów także dokumenty z błędem')
+
+    def handle(self, *args, **options):
+        documents = Document.objects.exclude(file='')
+        if not options['all']:
+            statuses = ['pending', 'failed'] if options['failed'] else ['pending']
+            documents = documents.filter(preview_status__in=statuses)
+
+        futures = []
+        seen = set()
+        for document in documents.iterator():
+            if not document.content_hash:
+                # Dokumenty sprzed wprowadzenia sum - liczymy raz i zapisujemy
+                document.content_hash = file_sha256(document.file.open('rb'))
+                document.file.close()
+                Document.objects.filter(pk=document.pk).update(content_hash=document.content_hash)
+            # Jedno zadanie na treść - wynik trafia do wszystkich dokumentów z tą sumą
+            if document.content_hash in seen:
+                continue
+            seen.add(document.content_hash)
+            future = submit_document(document)
+            if future is not None:
+                futures.append(future)
+
+        self.stdout.write(f'🚀 Zlecono {len(futures)} zadań podglądu')
+        wait(futures)
+        document_previews.shutdown()
+        stats = document_previews.get_stats()
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Gotowe: {stats.get('ready', 0)}, nieobsługiwane: {stats.get('unsupported', 0)}, "
+            f"błędy: {stats.get('failed', 0) + stats.get('crashed', 0)}"
+        ))
@@ -0,0 +1,66 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from court.audit_archive import archive_horizon
+from court.models import AuditLog, AuditLogDailyStat
+
+
+class Command(BaseCommand):
+    help = (
+        'Odbudowuje dzienne liczniki audytu (AuditLogDailyStat) z tabeli AuditLog. '
+        'Dni objęte archiwum (court/audit_archive.py) są pomijane - ich wpisów nie ma już w tabeli.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date-from', help='Pierwszy dzień do przeliczenia (RRRR-MM-DD)')
+        parser.add_argument('--date-to', help='Ostatni dzień do przeliczenia (RRRR-MM-DD)')
+
+    def handle(self, *args, **options):
+        logs = AuditLog.objects.order_by()
+        stats = AuditLogDailyStat.objects.all()
+
+        for option, lookup in (('date_from', 'gte'), ('date_to', 'lte')):
+            if not options[option]:
+                continue
+            value = parse_date(options[option])
+            if value is None:
+                raise CommandError(f'Nieprawidłowa data: {options[option]}')
+            logs = logs.filter(**{f'timestamp__date__{lookup}': value})
+            stats = stats.filter(**{f'date__{lookup}': value})
+
+        horizon = archive_horizon()
+        if horizon is not None:
+            # Liczniki dni zarchiwizowanych (także częściowo) zostają bez zmian
+            last_archived_day = timezone.localdate(horizon)
+            logs = logs.filter(timestamp__date__gt=last_archived_day)
+            stats = stats.filter(date__gt=last_archived_day)
+            self.stdout.write(f'Pomijam dni do {last_archived_day} włącznie (archiwum audytu)')
+
+        rows = (
+            logs.annotate(day=TruncDate('timestamp'))
+            .values('day', 'action', 'object_type', 'user_id')
+            .annotate(total=Count('id'))
+        )
+
+        with transaction.atomic():
+            deleted, _ = stats.delete()
+            created = AuditLogDailyStat.objects.bulk_create(
+                [
+                    AuditLogDailyStat(
+                        date=row['day'],
+                        action=row['action'],
+                        object_type=row['object_type'],
+                        user_id=row['user_id'],
+                        count=row['total'],
+                    )
+                    for row in rows.iterator()
+                ],
+                batch_size=1000,
+            )
+
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ Usunięto {deleted} i utworzono {len(created)} liczników dziennych'
+        ))
@@ -0,0 +1,22 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from court.search import rebuild_index
+
+
+class Command(BaseCommand):
+    help = 'Przebudowuje indeks wyszukiwania pełnotekstowego (sprawy, strony, dokumenty, wiadomości)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None, help='Liczba obiektów w jednej partii')
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        self.stdout.write('🚀 Przebudowa indeksu wyszukiwania...')
+        # Jedna transakcja - wyszukiwanie w trakcie widzi stary indeks, nie pusty
+        with transaction.atomic():
+            counts = rebuild_index(options['batch_size'], stdout=self.stdout)
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ Zindeksowano {sum(counts.values())} wpisów w {time.perf_counter() - start:.1f} s'
+        ))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from court.audit import get_audit_writer
+
+
+class Command(BaseCommand):
+    help = 'Zapisuje do bazy wpisy audytu odłożone w pliku spool'
+
+    def handle(self, *args, **kwargs):
+        writer = get_audit_writer()
+        count = writer.replay_spool()
+        if count:
+            self.stdout.write(self.style.SUCCESS(f'✅ Odtworzono {count} wpisów z {writer.spool_path}'))
+        else:
+            self.stdout.write('Brak wpisów do odtworzenia.')
@@ -1,5 +1,7 @@
 from django.utils import timezone
+import copy
 import json
+import time
 from channels.db import database_sync_to_async
 from django.contrib.auth import get_user_model
 from django.contrib.auth.models import AnonymousUser
@@ -8,6 +10,7 @@ from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
 from jwt import decode as jwt_decode
 from django.conf import settings
 from urllib.parse import parse_qs
+from court.auth_cache import handshake_metrics, token_cache, user_cache
 
 # Importujemy model wewnątrz metod lub po sprawdzeniu gotowości aplikacji, 
 # ale w middleware zazwyczaj jest to bezpieczne, jeśli django.setup() był wywołany.
@@ -26,16 +29,25 @@ def get_client_ip(request):
     return ip
 
 @database_sync_to_async
-def get_user(validated_token):
+def load_user(user_id):
+    return User.objects.get(id=user_id)
+
+
+async def get_user(validated_token):
     try:
         user_id = validated_token.get("user_id")
         if not user_id:
             print("⚠️ Token nie zawiera pola 'user_id'")
             return AnonymousUser()
-            
-        user = User.objects.get(id=user_id)
-        # print(f"✅ Znaleziono użytkownika: {user.username}")
-        return user
+
+        # Najpierw cache - bez przejścia przez pulę wątków i zapytania do bazy.
+        # Klucz jako str: simplejwt zapisuje user_id w tokenie jako tekst
+        user = user_cache.get(str(user_id))
+        if user is None:
+            user = await load_user(user_id)
+            user_cache.set(str(user_id), user)
+        # Kopia, żeby połączenia nie współdzieliły jednej instancji modelu
+        return copy.copy(user)
     except User.DoesNotExist:
         print(f"❌ Użytkownik o ID {validated_token.get('user_id')} nie istnieje.")
         return AnonymousUser()
@@ -44,6 +56,21 @@ def get_user(validated_token):
         return AnonymousUser()
 
 
+def decode_token(token):
+    """
+    Dekoduje i weryfikuje JWT. Zweryfikowany payload zapamiętujemy do
+    czasu wygaśnięcia tokena (claim `exp`).
+    """
+    payload = token_cache.get(token)
+    if payload is not None:
+        return payload
+
+    payload = jwt_decode(token, settings.SECRET_KEY, algorithms=["HS256"])
+    if payload.get("exp"):
+        token_cache.set(token, payload, expires_at=payload["exp"])
+    return payload
+
+
 # --- MIDDLEWARE 1: LOGOWANIE AUDYTOWE (HTTP) ---
 
 class AuditLogMiddleware:
@@ -79,8 +106,8 @@ class AuditLogMiddleware:
             return response
         
         try:
-            # Importujemy model tutaj, gdy aplikacja jest już gotowa
-            from court.models import AuditLog
+            # Wpis trafia do kolejki - zapis do bazy odbywa się w tle (court/audit.py)
+            from court.audit import get_audit_writer
 
             action_map = {
                 'POST': 'CREATE',
@@ -95,8 +122,8 @@ class AuditLogMiddleware:
             object_type = self._extract_object_type(path_parts)
             object_id = self._extract_object_id(path_parts)
             
-            AuditLog.objects.create(
-                user=request.user,
+            get_audit_writer().enqueue(
+                user_id=request.user.id,
                 action=action,
                 object_type=object_type,
                 object_id=object_id,
@@ -142,6 +169,7 @@ class JwtAuthMiddleware:
         self.inner = inner
 
     async def __call__(self, scope, receive, send):
+        started = time.perf_counter()
         query_string = scope.get("query_string", b"").decode("utf-8")
         query_params = parse_qs(query_string)
         token = query_params.get("token", [None])[0]
@@ -150,7 +178,7 @@ class JwtAuthMiddleware:
             try:
                 # Dekodowanie tokena
                 # settings.SECRET_KEY musi być identyczne jak przy podpisywaniu
-                decoded_data = jwt_decode(token, settings.SECRET_KEY, algorithms=["HS256"])
+                decoded_data = decode_token(token)
                 
                 # Pobranie użytkownika (asynchronicznie)
                 scope["user"] = await get_user(decoded_data)
@@ -165,4 +193,5 @@ class JwtAuthMiddleware:
             print("⚠️ Brak tokena w URL WebSocket")
             scope["user"] = AnonymousUser()
 
+        handshake_metrics.record(time.perf_counter() - started)
         return await self.inner(scope, receive, send)
\ No newline at end of file
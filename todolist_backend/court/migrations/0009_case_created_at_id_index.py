@@ -0,0 +1,17 @@
+# Generated by Django 5.2.7 on 2026-10-18 13:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('court', '0008_user_is_online'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='case',
+            index=models.Index(fields=['created_at', 'id'], name='court_case_created_93c945_idx'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.7 on 2026-10-18 13:29
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('court', '0010_auditlog_timestamp_default'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuditLogDailyStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('action', models.CharField(choices=[('CREATE', 'Utworzenie'), ('UPDATE', 'Aktualizacja'), ('DELETE', 'Usunięcie'), ('VIEW', 'Przeglądanie'), ('DOWNLOAD', 'Pobranie'), ('LOGIN', 'Logowanie'), ('LOGOUT', 'Wylogowanie')], max_length=50)),
+                ('object_type', models.CharField(choices=[('Case', 'Sprawa'), ('Hearing', 'Rozprawa'), ('Document', 'Dokument'), ('User', 'Użytkownik'), ('Role', 'Rola'), ('CaseParticipant', 'Uczestnik sprawy'), ('Notification', 'Powiadomienie')], max_length=100)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='audit_daily_stats', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Dzienna statystyka audytu',
+                'verbose_name_plural': 'Dzienne statystyki audytu',
+                'indexes': [models.Index(fields=['date'], name='court_audit_date_b77ee9_idx')],
+                'unique_together': {('date', 'action', 'object_type', 'user')},
+            },
+        ),
+    ]
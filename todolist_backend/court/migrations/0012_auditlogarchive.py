@@ -0,0 +1,32 @@
+# Generated by Django 5.2.7 on 2026-10-18 13:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('court', '0011_auditlogdailystat'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuditLogArchive',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField(help_text='Pierwszy dzień miesiąca')),
+                ('object_type', models.CharField(max_length=100)),
+                ('file_path', models.CharField(help_text='Ścieżka względem katalogu archiwum', max_length=500)),
+                ('row_count', models.PositiveIntegerField(default=0)),
+                ('first_timestamp', models.DateTimeField()),
+                ('last_timestamp', models.DateTimeField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Archiwum audytu',
+                'verbose_name_plural': 'Archiwa audytu',
+                'ordering': ['month', 'object_type'],
+                'unique_together': {('month', 'object_type')},
+            },
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.7 on 2026-10-18 13:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('court', '0012_auditlogarchive'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['sender', 'recipient', 'created_at'], name='court_messa_sender__d7ed31_idx'),
+        ),
+    ]
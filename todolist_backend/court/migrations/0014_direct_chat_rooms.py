@@ -0,0 +1,29 @@
+# Generated by Django 5.2.7 on 2026-10-18 13:41
+
+from django.db import migrations, models
+
+
+def assign_direct_rooms(apps, schema_editor):
+    from court.conversations import backfill_direct_rooms
+
+    backfill_direct_rooms(apps.get_model('court', 'Message'), apps.get_model('court', 'ChatRoom'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('court', '0013_message_dm_history_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['room', 'created_at'], name='court_messa_room_id_0c4e45_idx'),
+        ),
+        # Przed ograniczeniem unikalności - backfill scala zduplikowane rozmowy
+        migrations.RunPython(assign_direct_rooms, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='chatroom',
+            constraint=models.UniqueConstraint(condition=models.Q(('is_direct', True)), fields=('user_a', 'user_b'), name='unique_direct_chat_room'),
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 5.2.7 on 2026-10-18 13:43
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Max, Min, Q
+
+
+def create_read_states(apps, schema_editor):
+    """
+    Znacznik z dotychczasowych is_read: wszystko przed pierwszą
+    nieprzeczytaną wiadomością uznajemy za przeczytane.
+    """
+    Message = apps.get_model('court', 'Message')
+    ConversationReadState = apps.get_model('court', 'ConversationReadState')
+
+    rows = (
+        Message.objects.filter(room__isnull=False, recipient__isnull=False)
+        .order_by()
+        .values('recipient_id', 'room_id')
+        .annotate(first_unread=Min('id', filter=Q(is_read=False)), last=Max('id'))
+    )
+    states = []
+    for row in rows:
+        last_read = row['first_unread'] - 1 if row['first_unread'] else row['last']
+        if last_read > 0:
+            states.append(ConversationReadState(
+                user_id=row['recipient_id'], room_id=row['room_id'], last_read_message_id=last_read
+            ))
+    ConversationReadState.objects.bulk_create(states, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('court', '0014_direct_chat_rooms'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ConversationReadState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_read_message_id', models.BigIntegerField(default=0)),
+                ('last_read_at', models.DateTimeField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('room', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='read_states', to='court.chatroom')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='read_states', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Stan przeczytania rozmowy',
+                'verbose_name_plural': 'Stany przeczytania rozmów',
+                'unique_together': {('user', 'room')},
+            },
+        ),
+        migrations.RunPython(create_read_states, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.7 on 2026-10-18 13:47
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('court', '0015_conversation_read_state'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationOutbox',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('available_at', models.DateTimeField(default=django.utils.timezone.now, help_text='Najwcześniejszy czas (ponownej) próby wysyłki')),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('claim_token', models.CharField(blank=True, default='', max_length=32)),
+                ('claimed_until', models.DateTimeField(blank=True, null=True)),
+                ('last_error', models.TextField(blank=True, default='')),
+                ('notification', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='outbox_entries', to='court.notification')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='notification_outbox', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Kolejka powiadomień WebSocket',
+                'verbose_name_plural': 'Kolejka powiadomień WebSocket',
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['available_at', 'id'], name='court_notif_availab_e1e78d_idx'), models.Index(fields=['user', 'id'], name='court_notif_user_id_9b928c_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-18 13:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('court', '0016_notification_outbox'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='notification',
+            name='notification_type',
+            field=models.CharField(choices=[('hearing_reminder', 'Przypomnienie o rozprawie'), ('document_added', 'Dodano dokument'), ('status_changed', 'Zmieniono status sprawy'), ('case_updated', 'Zaktualizowano sprawę'), ('new_participant', 'Nowy uczestnik sprawy'), ('message', 'Wiadomość'), ('announcement', 'Komunikat')], default='message', max_length=50),
+        ),
+    ]
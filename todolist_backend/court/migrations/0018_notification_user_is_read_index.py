@@ -0,0 +1,17 @@
+# Generated by Django 5.2.7 on 2026-10-18 13:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('court', '0017_notification_announcement_type'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['user', 'is_read', 'sent_at'], name='court_notif_user_id_89b07b_idx'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.7 on 2026-10-18 14:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('court', '0021_upload_sessions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='document',
+            name='preview_status',
+            field=models.CharField(choices=[('pending', 'W kolejce'), ('ready', 'Gotowy'), ('unsupported', 'Nieobsługiwany typ'), ('failed', 'Błąd')], default='pending', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='document',
+            name='text_excerpt',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.AddField(
+            model_name='document',
+            name='text_preview',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+        migrations.AddField(
+            model_name='document',
+            name='thumbnail',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+    ]
@@ -0,0 +1,56 @@
+from django.db import migrations
+
+TABLE = 'court_search_index'
+
+
+def create_search_index(apps, schema_editor):
+    """
+    Tabela FTS5 (court/search.py) i wpisy z istniejących danych jednym
+    INSERT ... SELECT na typ. Tekst wyciągnięty z plików dokumentów dodaje
+    `python manage.py rebuild_search_index`.
+    """
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    tables = {name: apps.get_model('court', name)._meta.db_table for name in ('Case', 'CaseParty', 'Document', 'Message')}
+    statements = [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {TABLE} USING fts5("
+        "title, body, title_folded, body_folded, kind UNINDEXED, object_id UNINDEXED, case_id UNINDEXED, "
+        "room_id UNINDEXED, user_a UNINDEXED, user_b UNINDEXED, "
+        "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')",
+        # rowid = id * 4 + kod typu (case 0, party 1, document 2, message 3)
+        f"INSERT INTO {TABLE} (rowid, title, body, kind, object_id, case_id) "
+        f"SELECT id * 4, case_number || ' ' || title, COALESCE(description, ''), 'case', id, id FROM {tables['Case']}",
+        f"INSERT INTO {TABLE} (rowid, title, body, kind, object_id, case_id) "
+        f"SELECT id * 4 + 1, name, role, 'party', id, case_id FROM {tables['CaseParty']}",
+        f"INSERT INTO {TABLE} (rowid, title, body, kind, object_id, case_id) "
+        f"SELECT id * 4 + 2, title, COALESCE(description, '') || char(10) || original_name, 'document', id, case_id "
+        f"FROM {tables['Document']}",
+        f"INSERT INTO {TABLE} (rowid, title, body, kind, object_id, room_id, user_a, user_b) "
+        f"SELECT id * 4 + 3, '', content || char(10) || attachment_name, 'message', id, room_id, sender_id, recipient_id "
+        f"FROM {tables['Message']}",
+        # Wersje z "l" zamiast "ł" - tu całe teksty, przebudowa zostawia w nich tylko słowa z "ł"
+        f"UPDATE {TABLE} SET "
+        f"title_folded = CASE WHEN title GLOB '*[łŁ]*' THEN replace(replace(title, 'ł', 'l'), 'Ł', 'L') ELSE '' END, "
+        f"body_folded = CASE WHEN body GLOB '*[łŁ]*' THEN replace(replace(body, 'ł', 'l'), 'Ł', 'L') ELSE '' END",
+    ]
+    with schema_editor.connection.cursor() as cursor:
+        for sql in statements:
+            cursor.execute(sql)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(f'DROP TABLE IF EXISTS {TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('court', '0022_document_previews'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,52 @@
+from django.db import migrations
+
+TABLE = 'court_search_index'
+COLUMNS = (
+    'kind UNINDEXED, object_id UNINDEXED, case_id UNINDEXED, room_id UNINDEXED, '
+    'user_a UNINDEXED, user_b UNINDEXED, '
+    "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'"
+)
+COPIED = 'rowid, title, body, title_folded, body_folded, kind, object_id, case_id, room_id, user_a, user_b'
+
+
+def rebuild_table(schema_editor, text_columns, insert_columns, select_columns):
+    """FTS5 nie ma ALTER TABLE ADD COLUMN - nowa tabela, kopia wpisów, podmiana"""
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(f'CREATE VIRTUAL TABLE {TABLE}_new USING fts5({text_columns}, {COLUMNS})')
+        cursor.execute(f'INSERT INTO {TABLE}_new ({insert_columns}) SELECT {select_columns} FROM {TABLE}')
+        cursor.execute(f'DROP TABLE {TABLE}')
+        cursor.execute(f'ALTER TABLE {TABLE}_new RENAME TO {TABLE}')
+
+
+def add_access_column(apps, schema_editor):
+    """
+    Kolumna access z tokenami uprawnień (court/search.py: access_tokens) -
+    wyliczana z nieindeksowanych kolumn istniejących wpisów.
+    """
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    access = (
+        "'k' || kind || COALESCE(' c' || case_id, '') || COALESCE(' u' || user_a, '') "
+        "|| COALESCE(' u' || user_b, '') || COALESCE(' r' || room_id, '')"
+    )
+    rebuild_table(
+        schema_editor, 'title, body, title_folded, body_folded, access',
+        f'{COPIED}, access', f'{COPIED}, {access}',
+    )
+
+
+def remove_access_column(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    rebuild_table(schema_editor, 'title, body, title_folded, body_folded', COPIED, COPIED)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('court', '0023_search_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(add_access_column, remove_access_column),
+    ]
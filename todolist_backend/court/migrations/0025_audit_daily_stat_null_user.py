@@ -0,0 +1,43 @@
+# Generated by Django 5.2.7 on 2026-10-18 14:58
+
+from django.db import migrations, models
+from django.db.models import Min, Sum
+
+
+def merge_anonymous_duplicates(apps, schema_editor):
+    """Scala zduplikowane wiersze bez użytkownika (powstałe po SET_NULL) w jeden"""
+    AuditLogDailyStat = apps.get_model('court', 'AuditLogDailyStat')
+    duplicates = (
+        AuditLogDailyStat.objects.filter(user__isnull=True)
+        .values('date', 'action', 'object_type')
+        .annotate(keep_id=Min('id'), total=Sum('count'), rows=models.Count('id'))
+        .filter(rows__gt=1)
+    )
+    for group in list(duplicates):
+        AuditLogDailyStat.objects.filter(pk=group['keep_id']).update(count=group['total'])
+        AuditLogDailyStat.objects.filter(
+            user__isnull=True, date=group['date'], action=group['action'], object_type=group['object_type'],
+        ).exclude(pk=group['keep_id']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('court', '0024_search_index_access'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_anonymous_duplicates, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='auditlogdailystat',
+            unique_together=set(),
+        ),
+        migrations.AddConstraint(
+            model_name='auditlogdailystat',
+            constraint=models.UniqueConstraint(condition=models.Q(('user__isnull', False)), fields=('date', 'action', 'object_type', 'user'), name='audit_daily_stat_user_unique'),
+        ),
+        migrations.AddConstraint(
+            model_name='auditlogdailystat',
+            constraint=models.UniqueConstraint(condition=models.Q(('user__isnull', True)), fields=('date', 'action', 'object_type'), name='audit_daily_stat_anonymous_unique'),
+        ),
+    ]
@@ -1,9 +1,78 @@
+import os
+import uuid
+
 from django.db import models
+from django.db.models.fields.files import FieldFile
 from django.contrib.auth.models import AbstractUser
 from django.utils import timezone
 from django.conf import settings
 from django.core.exceptions import ValidationError
 
+from court.blob_store import get_blob_storage
+
+
+class TrackedFieldsMixin:
+    """
+    Śledzenie zmian pól bez dodatkowych zapytań. Przy wczytaniu z bazy
+    zapamiętujemy wartości pól (from_db i tak je dostaje), więc sygnały
+    i audyt porównują stan bieżący z zapamiętanym zamiast pobierać
+    starą wersję rekordu.
+
+    Pola odroczone (.only()/.defer()) nie mają wartości wyjściowej - uznajemy
+    je za zmienione tylko wtedy, gdy zostały jawnie przypisane.
+    Po save() bieżące wartości stają się nowym punktem odniesienia.
+    """
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = instance._current_values()
+        return instance
+
+    def _current_values(self, fields=None):
+        names = (
+            [self._meta.get_field(name).attname for name in fields] if fields is not None
+            else [field.attname for field in self._meta.concrete_fields]
+        )
+        values = {name: self.__dict__[name] for name in names if name in self.__dict__}
+        for name, value in values.items():
+            # FieldFile zmienia nazwę w miejscu (FieldFile.save) - zapamiętujemy samą nazwę
+            if isinstance(value, FieldFile):
+                values[name] = value.name
+        return values
+
+    def has_changed(self, field_name):
+        """Czy pole różni się od wartości z bazy (nowy obiekt: zawsze True)"""
+        if self._state.adding:
+            return True
+        attname = self._meta.get_field(field_name).attname
+        loaded = getattr(self, '_loaded_values', {})
+        if attname not in loaded:
+            return attname in self.__dict__
+        return self.__dict__.get(attname) != loaded[attname]
+
+    def get_changes(self):
+        """{pole: (stara_wartość, nowa_wartość)} - np. dla old_value/new_value w AuditLog"""
+        loaded = getattr(self, '_loaded_values', {})
+        return {
+            name: (loaded.get(name), value)
+            for name, value in self._current_values().items()
+            if self._state.adding or name not in loaded or loaded[name] != value
+        }
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        # Sygnały post_save widzą jeszcze zmiany - punkt odniesienia przesuwamy po nich
+        if not hasattr(self, '_loaded_values'):
+            self._loaded_values = {}
+        self._loaded_values.update(self._current_values(kwargs.get('update_fields')))
+
+    def refresh_from_db(self, *args, **kwargs):
+        super().refresh_from_db(*args, **kwargs)
+        if not hasattr(self, '_loaded_values'):
+            self._loaded_values = {}
+        self._loaded_values.update(self._current_values(kwargs.get('fields')))
+
 
 class Role(models.Model):
     name = models.CharField(max_length=100, unique=True)
@@ -26,7 +95,7 @@ class User(AbstractUser):
             return f'{self.first_name} {self.last_name}'.strip()
         return self.username
 
-class Case(models.Model):
+class Case(TrackedFieldsMixin, models.Model):
     case_number = models.CharField(max_length=100, unique=True)
     title = models.CharField(max_length=200)
     description = models.TextField(blank=True, null=True)
@@ -38,6 +107,13 @@ class Case(models.Model):
     filing_date = models.DateField(null=True, blank=True)
     category = models.CharField(max_length=100, default='Cywilna')
     value_amount = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Paginacja kursorowa listy spraw
+            models.Index(fields=['created_at', 'id']),
+        ]
+
     def __str__(self):
         return self.title
 
@@ -69,23 +145,60 @@ class Hearing(models.Model):
         return f"{self.case.case_number} - {self.get_status_display()}"
 
 
-class Document(models.Model):
+class FileBlob(models.Model):
+    """Plik w magazynie adresowanym treścią (court/blob_store.py) i liczba odwołań do niego"""
+    name = models.CharField(max_length=255, unique=True)
+    sha256 = models.CharField(max_length=64, db_index=True)
+    size = models.BigIntegerField()
+    ref_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.name} ({self.ref_count})"
+
+
+class Document(TrackedFieldsMixin, models.Model):
+    PREVIEW_STATUS_CHOICES = [
+        ('pending', 'W kolejce'),
+        ('ready', 'Gotowy'),
+        ('unsupported', 'Nieobsługiwany typ'),
+        ('failed', 'Błąd'),
+    ]
+
     title = models.CharField(max_length=200)
     description = models.TextField(blank=True, null=True)
-    file = models.FileField(upload_to='documents/%Y/%m/%d/')
+    # Plik w magazynie adresowanym treścią - nazwa w magazynie to suma SHA-256
+    file = models.FileField(upload_to='documents/%Y/%m/%d/', storage=get_blob_storage)
+    original_name = models.CharField(max_length=255, blank=True, default='')
     case = models.ForeignKey(Case, on_delete=models.CASCADE, related_name='documents')
     uploaded_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True)
     uploaded_at = models.DateTimeField(auto_now_add=True)
     file_size = models.IntegerField(blank=True, null=True)
+    # SHA-256 treści pliku - silny ETag przy pobieraniu (court/file_delivery.py)
+    content_hash = models.CharField(max_length=64, blank=True, default='')
+    # Podglądy generowane w tle (court/document_previews.py) - nazwy względem MEDIA_ROOT
+    preview_status = models.CharField(max_length=20, choices=PREVIEW_STATUS_CHOICES, default='pending')
+    thumbnail = models.CharField(max_length=255, blank=True, default='')
+    text_preview = models.CharField(max_length=255, blank=True, default='')
+    text_excerpt = models.TextField(blank=True, default='')
     
     def __str__(self):
         return self.title
     
     def save(self, *args, **kwargs):
-        if self.file:
+        # Tylko nowy plik: rozmiar z przesłanych danych, suma liczona przy zapisie do magazynu
+        if self.file and not self.file._committed:
+            self.original_name = os.path.basename(self.file.name)[:255]
             self.file_size = self.file.size
+            self.file.save(self.file.name, self.file.file, save=False)
+            self.content_hash = self.file.storage.hash_from_name(self.file.name) or ''
+            self.preview_status, self.thumbnail, self.text_preview, self.text_excerpt = 'pending', '', '', ''
         super().save(*args, **kwargs)
 
+    @property
+    def download_name(self):
+        return self.original_name or os.path.basename(self.file.name)
+
 class Notification(models.Model):
     NOTIFICATION_TYPE_CHOICES = [
         ('hearing_reminder', 'Przypomnienie o rozprawie'),
@@ -94,6 +207,7 @@ class Notification(models.Model):
         ('case_updated', 'Zaktualizowano sprawę'),
         ('new_participant', 'Nowy uczestnik sprawy'),
         ('message', 'Wiadomość'),
+        ('announcement', 'Komunikat'),
     ]
     
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='notifications')
@@ -112,6 +226,8 @@ class Notification(models.Model):
         indexes = [
             models.Index(fields=['user', '-sent_at']),
             models.Index(fields=['is_read']),
+            # Lista nieprzeczytanych (?is_read=false) i licznik plakietki - jeden zakres indeksu
+            models.Index(fields=['user', 'is_read', 'sent_at']),
         ]
     
     def __str__(self):
@@ -124,6 +240,34 @@ class Notification(models.Model):
         self.read_at = timezone.now()
         self.save()
 
+class NotificationOutbox(models.Model):
+    """
+    Kolejka wysyłki powiadomień przez WebSocket (court/notification_outbox.py).
+    Wpis powstaje w tej samej transakcji co Notification - po wycofaniu
+    transakcji nic nie zostanie wysłane.
+    """
+    notification = models.ForeignKey(Notification, on_delete=models.CASCADE, related_name='outbox_entries')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='notification_outbox')
+    created_at = models.DateTimeField(default=timezone.now)
+    available_at = models.DateTimeField(default=timezone.now, help_text="Najwcześniejszy czas (ponownej) próby wysyłki")
+    attempts = models.PositiveSmallIntegerField(default=0)
+    claim_token = models.CharField(max_length=32, blank=True, default='')
+    claimed_until = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True, default='')
+
+    class Meta:
+        ordering = ['id']
+        verbose_name = 'Kolejka powiadomień WebSocket'
+        verbose_name_plural = 'Kolejka powiadomień WebSocket'
+        indexes = [
+            models.Index(fields=['available_at', 'id']),
+            models.Index(fields=['user', 'id']),
+        ]
+
+    def __str__(self):
+        return f"outbox {self.notification_id} -> {self.user_id} (próby: {self.attempts})"
+
+
 class CaseParticipant(models.Model):
     PARTICIPANT_TYPE_CHOICES = [
         ('plaintiff', 'Powód'),
@@ -188,7 +332,8 @@ class AuditLog(models.Model):
     new_value = models.TextField(blank=True, null=True)
     ip_address = models.GenericIPAddressField(blank=True, null=True)
     user_agent = models.TextField(blank=True, null=True)
-    timestamp = models.DateTimeField(auto_now_add=True, db_index=True)
+    # default zamiast auto_now_add: wpisy zapisywane partiami (court/audit.py) zachowują czas zdarzenia
+    timestamp = models.DateTimeField(default=timezone.now, editable=False, db_index=True)
     
     class Meta:
         ordering = ['-timestamp']
@@ -203,6 +348,67 @@ class AuditLog(models.Model):
     
     def __str__(self):
         return f"{self.get_action_display()} - {self.get_object_type_display()} #{self.object_id} - {self.user.username if self.user else 'Anonymous'}"
+
+
+class AuditLogDailyStat(models.Model):
+    """
+    Dzienne liczniki wpisów audytu (dzień × akcja × typ obiektu × użytkownik).
+    Aktualizowane przyrostowo przy zapisie AuditLog (court/audit.py),
+    odbudowywane komendą `rebuild_audit_stats`. Statystyki czytają tylko
+    tę tabelę, więc ich koszt zależy od liczby dni, a nie liczby wpisów.
+    """
+    date = models.DateField()
+    action = models.CharField(max_length=50, choices=AuditLog.ACTION_CHOICES)
+    object_type = models.CharField(max_length=100, choices=AuditLog.OBJECT_TYPE_CHOICES)
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='audit_daily_stats')
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name = 'Dzienna statystyka audytu'
+        verbose_name_plural = 'Dzienne statystyki audytu'
+        # W SQL NULL != NULL - wiersze bez użytkownika potrzebują osobnego warunku,
+        # inaczej każdy zapis mógłby utworzyć kolejny duplikat
+        constraints = [
+            models.UniqueConstraint(
+                fields=['date', 'action', 'object_type', 'user'],
+                condition=models.Q(user__isnull=False),
+                name='audit_daily_stat_user_unique',
+            ),
+            models.UniqueConstraint(
+                fields=['date', 'action', 'object_type'],
+                condition=models.Q(user__isnull=True),
+                name='audit_daily_stat_anonymous_unique',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['date']),
+        ]
+
+    def __str__(self):
+        return f"{self.date} {self.action} {self.object_type} ({self.user_id}): {self.count}"
+
+
+class AuditLogArchive(models.Model):
+    """
+    Indeks plików archiwum audytu (court/audit_archive.py).
+    Jeden wiersz = jeden plik gzip NDJSON z wpisami danego typu obiektu z danego miesiąca.
+    """
+    month = models.DateField(help_text="Pierwszy dzień miesiąca")
+    object_type = models.CharField(max_length=100)
+    file_path = models.CharField(max_length=500, help_text="Ścieżka względem katalogu archiwum")
+    row_count = models.PositiveIntegerField(default=0)
+    first_timestamp = models.DateTimeField()
+    last_timestamp = models.DateTimeField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['month', 'object_type']
+        verbose_name = 'Archiwum audytu'
+        verbose_name_plural = 'Archiwa audytu'
+        unique_together = ('month', 'object_type')
+
+    def __str__(self):
+        return f"{self.month:%Y-%m} {self.object_type} ({self.row_count})"
     
     
     
@@ -242,6 +448,13 @@ class ChatRoom(models.Model):
         indexes = [
             models.Index(fields=['is_direct', 'user_a', 'user_b']),
         ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user_a', 'user_b'],
+                condition=models.Q(is_direct=True),
+                name='unique_direct_chat_room',
+            ),
+        ]
 
     def clean(self):
         """
@@ -268,7 +481,7 @@ class ChatRoom(models.Model):
         return self.name or f"Room {self.pk}"
 
 
-class Message(models.Model):
+class Message(TrackedFieldsMixin, models.Model):
     sender = models.ForeignKey(User, on_delete=models.CASCADE, related_name='sent_messages')
     recipient = models.ForeignKey(
         User, 
@@ -285,18 +498,109 @@ class Message(models.Model):
         blank=True
     )
     content = models.TextField(blank=True, default="") # Zmieniono na blank=True, aby można było wysłać sam plik
-    attachment = models.FileField(upload_to='chat_attachments/%Y/%m/%d/', null=True, blank=True) # Nowe pole dla załączników
+    attachment = models.FileField(upload_to='chat_attachments/%Y/%m/%d/', storage=get_blob_storage, null=True, blank=True) # Nowe pole dla załączników
+    attachment_name = models.CharField(max_length=255, blank=True, default='')
     is_read = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ['created_at']
+        indexes = [
+            # Historia rozmowy prywatnej - po jednym zakresie indeksu na kierunek
+            models.Index(fields=['sender', 'recipient', 'created_at']),
+            # Historia pokoju / rozmowy DM - jeden zakres indeksu
+            models.Index(fields=['room', 'created_at']),
+        ]
+
+    def save(self, *args, **kwargs):
+        # Wiadomość prywatna zawsze trafia do kanonicznej rozmowy DM (court/conversations.py)
+        if self.room_id is None and self.recipient_id and self.recipient_id != self.sender_id:
+            from court.conversations import get_direct_room_id
+            self.room_id = get_direct_room_id(self.sender_id, self.recipient_id)
+        if self.attachment and not self.attachment._committed:
+            self.attachment_name = os.path.basename(self.attachment.name)[:255]
+        super().save(*args, **kwargs)
 
     def __str__(self):
-        if self.room:
-            return f"{self.sender} -> {self.room}: {self.content[:50]}"
-        return f"{self.sender} -> {self.recipient}: {self.content[:50]}"
+        if self.recipient_id:
+            return f"{self.sender} -> {self.recipient}: {self.content[:50]}"
+        return f"{self.sender} -> {self.room}: {self.content[:50]}"
+
+
+class ConversationReadState(models.Model):
+    """
+    Znacznik przeczytania rozmowy (court/conversations.py): wszystkie
+    wiadomości pokoju o id <= last_read_message_id są dla użytkownika
+    przeczytane. Nieprzeczytane liczymy od znacznika, bez skanowania is_read.
+    """
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='read_states'
+    )
+    room = models.ForeignKey(ChatRoom, on_delete=models.CASCADE, related_name='read_states')
+    last_read_message_id = models.BigIntegerField(default=0)
+    last_read_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'Stan przeczytania rozmowy'
+        verbose_name_plural = 'Stany przeczytania rozmów'
+        unique_together = [('user', 'room')]
+
+    def __str__(self):
+        return f"{self.user_id}@{self.room_id}: {self.last_read_message_id}"
+
+
+class UploadSession(models.Model):
+    """
+    Wznawialne przesyłanie pliku w kawałkach (court/chunked_uploads.py).
+    Kawałki trafiają prosto do pliku tymczasowego na dysku; po komplecie
+    i zgodnej sumie SHA-256 powstaje Document albo wiadomość z załącznikiem.
+    """
+    PURPOSE_CHOICES = [
+        ('document', 'Dokument'),
+        ('attachment', 'Załącznik czatu'),
+    ]
+    STATUS_CHOICES = [
+        ('active', 'W trakcie'),
+        ('finalizing', 'Zatwierdzanie'),
+        ('completed', 'Zakończone'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='upload_sessions')
+    purpose = models.CharField(max_length=20, choices=PURPOSE_CHOICES)
+    filename = models.CharField(max_length=255)
+    total_size = models.BigIntegerField()
+    chunk_size = models.PositiveIntegerField()
+    checksum = models.CharField(max_length=64, blank=True, default='', help_text="Oczekiwana suma SHA-256 całego pliku")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='active')
+    result_id = models.BigIntegerField(null=True, blank=True, help_text="Id utworzonego dokumentu lub wiadomości")
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['expires_at']),
+        ]
+
+    @property
+    def chunk_count(self):
+        return max(1, -(-self.total_size // self.chunk_size))
+
+    def __str__(self):
+        return f"{self.filename} ({self.user_id}, {self.status})"
+
+
+class UploadChunk(models.Model):
+    """Odebrany kawałek sesji przesyłania (offset jest wielokrotnością chunk_size)"""
+    session = models.ForeignKey(UploadSession, on_delete=models.CASCADE, related_name='chunks')
+    offset = models.BigIntegerField()
+    size = models.PositiveIntegerField()
+    received_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = [('session', 'offset')]
 
 
 class FavoriteContact(models.Model):
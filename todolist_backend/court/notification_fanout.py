@@ -0,0 +1,88 @@
+"""
+Masowe powiadomienia (komunikaty do uczestników sprawy, do roli).
+
+Zamiast Notification.objects.create w pętli (INSERT + sygnały + osobna
+wysyłka na odbiorcę) fan_out_notification:
+- bierze identyfikatory odbiorców jednym zapytaniem (case_recipients,
+  role_recipients albo dowolna lista id),
+- zapisuje powiadomienia i wpisy outboxu partiami bulk_create w jednej
+  transakcji,
+- zmienia liczniki nieprzeczytanych bez osobnych ramek - klient zwiększa
+  plakietkę po ramce `notification`,
+- wysyłkę zostawia dispatcherowi outboxu (court/notification_outbox.py),
+  który łączy powiadomienia jednego użytkownika w jedno wywołanie
+  channel layer.
+
+Pomiar: komenda `benchmark_notification_fanout`.
+"""
+from django.conf import settings
+from django.db import transaction
+
+DEFAULTS = {
+    'BATCH_SIZE': 1000,
+}
+
+
+def get_fanout_settings():
+    conf = dict(DEFAULTS)
+    conf.update(getattr(settings, 'NOTIFICATION_FANOUT', {}))
+    return conf
+
+
+def case_recipients(case, roles=None):
+    """Id aktywnych uczestników sprawy (opcjonalnie tylko podane role w sprawie)"""
+    from court.models import CaseParticipant
+
+    participants = CaseParticipant.objects.filter(case=case, is_active=True, user__is_active=True)
+    if roles:
+        participants = participants.filter(role_in_case__in=roles)
+    return participants.values_list('user_id', flat=True)
+
+
+def role_recipients(role):
+    """Id aktywnych użytkowników z daną rolą"""
+    from court.models import User
+
+    return User.objects.filter(role=role, is_active=True).values_list('id', flat=True)
+
+
+def fan_out_notification(recipients, title, message, notification_type='announcement',
+                         case=None, hearing=None, document=None, sender=None, exclude=None,
+                         batch_size=None):
+    """
+    Tworzy to samo powiadomienie dla wszystkich odbiorców (id użytkowników
+    lub queryset values_list). Każdy odbiorca dostaje je raz.
+    Zwraca liczbę utworzonych powiadomień.
+    """
+    from court.models import Notification
+    from court.notification_outbox import enqueue_notifications
+    from court.unread_counters import unread_counters
+
+    batch_size = batch_size or get_fanout_settings()['BATCH_SIZE']
+    excluded = set(exclude or ())
+    user_ids = sorted({user_id for user_id in recipients if user_id not in excluded})
+    if not user_ids:
+        return 0
+
+    with transaction.atomic():
+        for start in range(0, len(user_ids), batch_size):
+            notifications = Notification.objects.bulk_create([
+                Notification(
+                    user_id=user_id,
+                    title=title,
+                    message=message,
+                    notification_type=notification_type,
+                    case=case,
+                    hearing=hearing,
+                    document=document,
+                    sender=sender,
+                )
+                for user_id in user_ids[start:start + batch_size]
+            ])
+            # bulk_create nie wywołuje post_save - liczniki zmieniamy tutaj, przed
+            # wpisem do outboxu: ramka z outboxu niesie już zmienione liczniki
+            for notification in notifications:
+                unread_counters.adjust(notification.user_id, 'notifications', 1, push=False)
+            enqueue_notifications(notifications)
+
+    return len(user_ids)
@@ -0,0 +1,341 @@
+"""
+Outbox powiadomień WebSocket.
+
+Sygnały (court/signals.py) nie wysyłają już powiadomień w trakcie save() -
+enqueue_notifications zapisuje wpis NotificationOutbox w tej samej
+transakcji co Notification, a po zatwierdzeniu transakcji budzi dispatcher.
+Wycofana transakcja = brak wpisu = brak wysyłki.
+
+Dispatcher to zadanie asyncio na pętli serwera (jak PresenceRegistry
+i ChatMessageWriter - tylko wtedy InMemoryChannelLayer budzi odbiorców).
+Uruchamia go OutboxDispatcherMiddleware (todolist_backend/asgi.py) przy
+starcie serwera (lifespan) albo przy pierwszym żądaniu HTTP/WebSocket -
+niezależnie od tego, czy ktoś ma otwarte połączenie. Z RUN_IN_SERVER=False
+dispatcher działa tylko jako osobny proces: komenda
+`dispatch_notification_outbox` (wymaga współdzielonego channel layer,
+np. Redis). Co POLL_INTERVAL sekund (lub po
+przebudzeniu) rezerwuje partię wpisów (claim_token + lease LEASE sekund,
+więc kilka procesów nie wyśle tego samego), serializuje je i wysyła -
+jedno group_send na użytkownika (send_notifications, gdy wpisów jest kilka).
+Zdarzenie niesie też aktualne liczniki nieprzeczytanych (court/unread_counters.py),
+które consumer wysyła jako ramkę unread_counts.
+
+- Kolejność per użytkownik: wpisy idą po id, a użytkownik z wpisem
+  czekającym na ponowienie albo zarezerwowanym przez inny proces jest
+  pomijany, dopóki ten wpis nie wyjdzie. Gdy dwa procesy zarezerwują
+  równocześnie wpisy tego samego użytkownika, zostaje rezerwacja
+  z najniższym id - druga jest zwalniana.
+- Ponowienia: attempts + odstęp RETRY_BACKOFF ** attempts, po MAX_ATTEMPTS
+  wpis jest porzucany (powiadomienie i tak jest w bazie i w REST API).
+- Wpisy starsze niż MAX_AGE są usuwane bez wysyłki.
+- get_stats: liczniki, głębokość kolejki i opóźnienie zapis -> wysyłka.
+"""
+import asyncio
+import threading
+import uuid
+from datetime import timedelta
+
+from channels.db import database_sync_to_async
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Min, Q
+from django.utils import timezone
+
+from court.auth_cache import LatencyMetrics
+
+DEFAULTS = {
+    'BATCH_SIZE': 100,
+    'POLL_INTERVAL': 1.0,
+    'LEASE': 30,
+    'MAX_ATTEMPTS': 5,
+    'RETRY_BACKOFF': 2.0,
+    'MAX_AGE': 3600,
+    'RUN_IN_SERVER': True,
+}
+
+
+def get_outbox_settings():
+    conf = dict(DEFAULTS)
+    conf.update(getattr(settings, 'NOTIFICATION_OUTBOX', {}))
+    return conf
+
+
+def enqueue_notifications(notifications):
+    """
+    Dodaje powiadomienia do outboxu (jednym bulk_create). Wywoływać
+    w transakcji, w której powstały powiadomienia.
+    """
+    from court.models import NotificationOutbox
+
+    entries = [
+        NotificationOutbox(notification_id=notif.id, user_id=notif.user_id)
+        for notif in notifications
+    ]
+    if not entries:
+        return
+    NotificationOutbox.objects.bulk_create(entries)
+    transaction.on_commit(notification_outbox.wake)
+
+
+class NotificationOutboxDispatcher:
+    """Wysyła zatwierdzone wpisy outboxu partiami do grup notifications_<id>"""
+
+    def __init__(self, batch_size=100, poll_interval=1.0, lease=30, max_attempts=5,
+                 retry_backoff=2.0, max_age=3600):
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.lease = lease
+        self.max_attempts = max_attempts
+        self.retry_backoff = retry_backoff
+        self.max_age = max_age
+
+        self.latency = LatencyMetrics()
+        self._loop = None
+        self._task = None
+        self._wakeup = None
+        self._lock = threading.Lock()
+        self._counters = {
+            'dispatched': 0,
+            'failed': 0,
+            'dropped': 0,
+            'expired': 0,
+        }
+
+    @classmethod
+    def from_settings(cls):
+        conf = get_outbox_settings()
+        return cls(
+            batch_size=conf['BATCH_SIZE'],
+            poll_interval=conf['POLL_INTERVAL'],
+            lease=conf['LEASE'],
+            max_attempts=conf['MAX_ATTEMPTS'],
+            retry_backoff=conf['RETRY_BACKOFF'],
+            max_age=conf['MAX_AGE'],
+        )
+
+    # --- URUCHAMIANIE ---
+
+    def ensure_started(self):
+        """Uruchamia dispatcher na bieżącej pętli zdarzeń (wywoływane z OutboxDispatcherMiddleware)"""
+        loop = asyncio.get_running_loop()
+        if self._task is not None and not self._task.done() and self._loop is loop:
+            return
+        self._loop = loop
+        self._wakeup = asyncio.Event()
+        self._task = loop.create_task(self.run_forever())
+
+    def wake(self):
+        """Budzi dispatcher po zatwierdzeniu transakcji (wywoływane z wątku synchronicznego)"""
+        loop, wakeup = self._loop, self._wakeup
+        if loop is None or wakeup is None or loop.is_closed():
+            return
+        try:
+            loop.call_soon_threadsafe(wakeup.set)
+        except RuntimeError:
+            pass
+
+    async def run_forever(self):
+        if self._wakeup is None:
+            self._loop = asyncio.get_running_loop()
+            self._wakeup = asyncio.Event()
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                # Pełna partia = prawdopodobnie czekają kolejne wpisy
+                while await self.dispatch_batch() >= self.batch_size:
+                    pass
+            except Exception as e:
+                print(f"❌ NotificationOutbox: błąd wysyłki: {e}")
+
+    # --- WYSYŁKA ---
+
+    async def dispatch_batch(self, user_ids=None):
+        """
+        Rezerwuje i wysyła jedną partię (opcjonalnie tylko wpisy user_ids).
+        Zwraca liczbę zarezerwowanych wpisów.
+        """
+        entries, counts = await database_sync_to_async(self.claim_batch)(user_ids)
+        if not entries:
+            return 0
+
+        # Jedno wywołanie channel layer na użytkownika - kolejne powiadomienia
+        # tego samego odbiorcy w partii (np. masowe komunikaty) idą razem
+        by_user = {}
+        for entry in entries:
+            by_user.setdefault(entry[1], []).append(entry)
+
+        channel_layer = get_channel_layer()
+        sent, failed = [], []
+        for user_id, user_entries in by_user.items():
+            payloads = [payload for _, _, _, payload in user_entries]
+            if len(payloads) == 1:
+                event = {"type": "send_notification", "notification": payloads[0]}
+            else:
+                event = {"type": "send_notifications", "notifications": payloads}
+            event["counts"] = counts[user_id]
+            try:
+                await channel_layer.group_send(f"notifications_{user_id}", event)
+            except Exception as e:
+                # Cała grupa czeka na ponowienie - kolejność per użytkownik zostaje
+                failed += [(entry_id, str(e)) for entry_id, _, _, _ in user_entries]
+                continue
+            now = timezone.now()
+            for entry_id, _, created_at, _ in user_entries:
+                sent.append(entry_id)
+                self.latency.record((now - created_at).total_seconds())
+
+        await database_sync_to_async(self.complete_batch)(sent, failed)
+        return len(entries)
+
+    def claim_batch(self, user_ids=None):
+        """
+        Rezerwuje partię wpisów gotowych do wysyłki (user_ids zawęża ją do
+        wskazanych odbiorców). Zwraca (wpisy z danymi z serializera,
+        {user_id: liczniki nieprzeczytanych}).
+        """
+        from court.models import NotificationOutbox
+        from court.serializers import NotificationSerializer
+        from court.unread_counters import unread_counters
+
+        close_old_connections()
+        now = timezone.now()
+
+        outbox = NotificationOutbox.objects.all()
+        if user_ids is not None:
+            outbox = outbox.filter(user_id__in=user_ids)
+
+        expired, _ = outbox.filter(created_at__lt=now - timedelta(seconds=self.max_age)).delete()
+        self._count('expired', expired)
+
+        # Użytkownicy z wpisem czekającym na ponowienie albo wysyłanym przez inny
+        # proces - ich kolejne wpisy muszą poczekać
+        waiting = NotificationOutbox.objects.filter(available_at__gt=now).values('user_id')
+        busy = NotificationOutbox.objects.filter(claimed_until__gte=now).values('user_id')
+        free = Q(claimed_until__isnull=True) | Q(claimed_until__lt=now)
+        due_ids = list(
+            outbox.filter(free, available_at__lte=now)
+            .exclude(user_id__in=waiting)
+            .exclude(user_id__in=busy)
+            .order_by('id').values_list('id', flat=True)[:self.batch_size]
+        )
+        if not due_ids:
+            return [], {}
+
+        token = uuid.uuid4().hex
+        NotificationOutbox.objects.filter(free, id__in=due_ids).update(
+            claim_token=token, claimed_until=now + timedelta(seconds=self.lease)
+        )
+        self._release_contested(token, now)
+        entries = list(
+            NotificationOutbox.objects.filter(claim_token=token)
+            .select_related('notification__user', 'notification__sender', 'notification__case')
+            .order_by('id')
+        )
+        data = NotificationSerializer([entry.notification for entry in entries], many=True).data
+        counts = {user_id: unread_counters.get_all(user_id) for user_id in {entry.user_id for entry in entries}}
+        return [
+            (entry.id, entry.user_id, entry.created_at, payload)
+            for entry, payload in zip(entries, data)
+        ], counts
+
+    def _release_contested(self, token, now):
+        """
+        Równoległy proces mógł między SELECT a UPDATE zarezerwować wpisy tych
+        samych użytkowników. Wysyła ten, kto ma wpis o niższym id - u siebie
+        zwalniamy użytkowników, których wcześniejszy wpis trzyma ktoś inny.
+        """
+        from court.models import NotificationOutbox
+
+        first_claimed = {}
+        for user_id, entry_id in (
+            NotificationOutbox.objects.filter(claim_token=token).order_by('id').values_list('user_id', 'id')
+        ):
+            first_claimed.setdefault(user_id, entry_id)
+        others = (
+            NotificationOutbox.objects.filter(user_id__in=list(first_claimed), claimed_until__gte=now)
+            .exclude(claim_token=token).values_list('user_id', 'id')
+        )
+        contested = {user_id for user_id, entry_id in others if entry_id < first_claimed[user_id]}
+        if contested:
+            NotificationOutbox.objects.filter(claim_token=token, user_id__in=contested).update(
+                claim_token='', claimed_until=None
+            )
+
+    def complete_batch(self, sent, failed):
+        from court.models import NotificationOutbox
+
+        if sent:
+            NotificationOutbox.objects.filter(id__in=sent).delete()
+            self._count('dispatched', len(sent))
+
+        now = timezone.now()
+        for entry_id, error in failed:
+            entry = NotificationOutbox.objects.filter(id=entry_id).first()
+            if entry is None:
+                continue
+            entry.attempts += 1
+            if entry.attempts >= self.max_attempts:
+                print(f"❌ NotificationOutbox: porzucono powiadomienie {entry.notification_id}: {error}")
+                entry.delete()
+                self._count('dropped', 1)
+                continue
+            entry.available_at = now + timedelta(seconds=self.retry_backoff ** entry.attempts)
+            entry.claim_token, entry.claimed_until = '', None
+            entry.last_error = error
+            entry.save(update_fields=['attempts', 'available_at', 'claim_token', 'claimed_until', 'last_error'])
+            self._count('failed', 1)
+
+    # --- STATYSTYKI ---
+
+    def _count(self, name, value):
+        with self._lock:
+            self._counters[name] += value
+
+    def get_stats(self):
+        """Liczniki tego procesu + stan kolejki w bazie"""
+        from court.models import NotificationOutbox
+
+        with self._lock:
+            stats = dict(self._counters)
+        pending = NotificationOutbox.objects.aggregate(oldest=Min('created_at'))['oldest']
+        stats['queue_depth'] = NotificationOutbox.objects.count()
+        stats['retrying'] = NotificationOutbox.objects.filter(attempts__gt=0).count()
+        stats['oldest_pending_seconds'] = (
+            round((timezone.now() - pending).total_seconds(), 3) if pending else None
+        )
+        stats['latency'] = self.latency.get_stats()
+        stats['running'] = self._task is not None and not self._task.done()
+        return stats
+
+
+notification_outbox = NotificationOutboxDispatcher.from_settings()
+
+
+class OutboxDispatcherMiddleware:
+    """
+    Middleware ASGI uruchamiający dispatcher na pętli serwera - przy starcie
+    (lifespan, np. uvicorn) albo przy pierwszym żądaniu (serwery bez lifespan,
+    np. daphne). Kolejne wywołania tylko sprawdzają, czy zadanie działa.
+    """
+    def __init__(self, inner):
+        self.inner = inner
+        self.enabled = get_outbox_settings()['RUN_IN_SERVER']
+
+    async def __call__(self, scope, receive, send):
+        if self.enabled:
+            notification_outbox.ensure_started()
+        if scope['type'] == 'lifespan':
+            # ProtocolTypeRouter nie obsługuje lifespan - odpowiadamy sami
+            while True:
+                message = await receive()
+                if message['type'] == 'lifespan.startup':
+                    await send({'type': 'lifespan.startup.complete'})
+                elif message['type'] == 'lifespan.shutdown':
+                    await send({'type': 'lifespan.shutdown.complete'})
+                    return
+        return await self.inner(scope, receive, send)
@@ -0,0 +1,118 @@
+"""
+Paginacja kursorowa (keyset) dla widoków listujących.
+
+Zamiast OFFSET (który wymusza przeskanowanie wszystkich pominiętych wierszy)
+kolejna strona zaczyna się bezpośrednio za ostatnim rekordem poprzedniej,
+wg pary (pole_czasu, id). Przy indeksie złożonym na tej parze koszt pobrania
+strony nie zależy od jej położenia w tabeli.
+"""
+import base64
+import json
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+class InvalidCursor(ValueError):
+    """Kursor nie dał się zdekodować (uszkodzony lub spreparowany)."""
+
+
+def encode_cursor(value, pk):
+    raw = json.dumps([value.isoformat(), pk])
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Zwraca krotkę (datetime, pk) zapisaną w kursorze."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        value, pk = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        value = parse_datetime(value)
+        pk = int(pk)
+    except (ValueError, TypeError, UnicodeError):
+        raise InvalidCursor(cursor)
+    if value is None:
+        raise InvalidCursor(cursor)
+    return value, pk
+
+
+def get_page_size(request, default=DEFAULT_PAGE_SIZE, maximum=MAX_PAGE_SIZE):
+    """Rozmiar strony z ?page_size=, zawsze przycięty do przedziału [1, maximum]."""
+    try:
+        size = int(request.query_params.get('page_size', default))
+    except (TypeError, ValueError):
+        size = default
+    return max(1, min(size, maximum))
+
+
+def keyset_filter(queryset, field, value, pk, descending=False):
+    """Zawęża queryset do rekordów leżących za pozycją (value, pk)."""
+    op = 'lt' if descending else 'gt'
+    return queryset.filter(
+        Q(**{f'{field}__{op}': value}) | Q(**{field: value, f'pk__{op}': pk})
+    )
+
+
+def paginate_keyset(queryset, cursor, page_size, field='created_at', descending=False):
+    """
+    Zwraca (lista_obiektów, następny_kursor). Następny kursor jest None,
+    gdy to ostatnia strona. `field` musi być polem DateTimeField.
+    """
+    if descending:
+        queryset = queryset.order_by(f'-{field}', '-pk')
+    else:
+        queryset = queryset.order_by(field, 'pk')
+
+    if cursor:
+        value, pk = decode_cursor(cursor)
+        queryset = keyset_filter(queryset, field, value, pk, descending)
+
+    # Pobieramy jeden rekord więcej, żeby wiedzieć, czy istnieje kolejna strona
+    rows = list(queryset[:page_size + 1])
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        last = rows[-1]
+        next_cursor = encode_cursor(getattr(last, field), last.pk)
+    return rows, next_cursor
+
+
+def cursor_for(obj, field='created_at'):
+    return encode_cursor(getattr(obj, field), obj.pk)
+
+
+def paginate_window(querysets, page_size, before=None, after=None, field='created_at'):
+    """
+    Okno `page_size` rekordów sąsiadujących z kursorem, scalone z kilku
+    querysetów (np. obu kierunków rozmowy - każdy korzysta z własnego
+    zakresu indeksu zamiast OR-a, który wymusza sortowanie całej historii).
+
+    - bez kursora: najnowsze rekordy,
+    - before: rekordy starsze od kursora,
+    - after: rekordy nowsze od kursora.
+
+    Zwraca (lista_rosnąco, czy_są_dalsze_rekordy_w_tym_kierunku).
+    """
+    descending = after is None
+    cursor = after or before
+    position = decode_cursor(cursor) if cursor else None
+
+    rows = []
+    for queryset in querysets:
+        if descending:
+            queryset = queryset.order_by(f'-{field}', '-pk')
+        else:
+            queryset = queryset.order_by(field, 'pk')
+        if position:
+            queryset = keyset_filter(queryset, field, *position, descending=descending)
+        rows.extend(queryset[:page_size + 1])
+
+    rows.sort(key=lambda row: (getattr(row, field), row.pk), reverse=descending)
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    if descending:
+        rows.reverse()
+    return rows, has_more
@@ -0,0 +1,244 @@
+"""
+Rejestr obecności użytkowników (online/offline) w pamięci procesu.
+
+- Licznik połączeń WebSocket na użytkownika: zamknięcie jednej karty nie
+  oznacza wyjścia, dopóki użytkownik ma inne otwarte połączenia.
+- Połączenie bez heartbeatu dłużej niż HEARTBEAT_TIMEOUT uznajemy za martwe.
+- Po zamknięciu ostatniego połączenia użytkownik jest "w trakcie wychodzenia"
+  przez OFFLINE_GRACE sekund - przeładowanie strony nie generuje przejścia
+  offline -> online.
+- Zmiany is_online trafiają do bazy zbiorczo co PERSIST_INTERVAL sekund
+  (maks. dwa UPDATE na przebieg), zamiast przy każdym connect/disconnect.
+
+Przejścia offline wykrywa zadanie asyncio w tle i przekazuje je do słuchaczy
+(add_listener), np. do rozgłaszania statusu przez channel layer.
+
+Zmiany statusu trafiają tylko do zainteresowanych (get_presence_interests):
+ulubione kontakty, rozmówcy z wiadomości prywatnych i współuczestnicy spraw.
+"""
+import asyncio
+import threading
+import time
+
+from channels.db import database_sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+
+DEFAULTS = {
+    'HEARTBEAT_TIMEOUT': 90,
+    'OFFLINE_GRACE': 5,
+    'PERSIST_INTERVAL': 2.0,
+    'BATCH_INTERVAL': 0.5,
+    'MAX_INTERESTS': 500,
+}
+
+
+def get_presence_settings():
+    conf = dict(DEFAULTS)
+    conf.update(getattr(settings, 'PRESENCE', {}))
+    return conf
+
+
+def presence_group_name(user_id):
+    """Grupa channel layer z obserwatorami statusu danego użytkownika"""
+    return f"presence_{user_id}"
+
+
+def get_presence_interests(user_id, limit=None):
+    """
+    Użytkownicy, których status obchodzi user_id: ulubione kontakty,
+    rozmówcy z wiadomości prywatnych i współuczestnicy aktywnych spraw.
+    """
+    from court.models import CaseParticipant, ChatRoom, FavoriteContact
+
+    limit = limit or get_presence_settings()['MAX_INTERESTS']
+    querysets = [
+        FavoriteContact.objects.filter(owner_id=user_id).values_list('contact_id', flat=True),
+        ChatRoom.objects.filter(is_direct=True, user_a_id=user_id).values_list('user_b_id', flat=True),
+        ChatRoom.objects.filter(is_direct=True, user_b_id=user_id).values_list('user_a_id', flat=True),
+        CaseParticipant.objects.filter(
+            is_active=True,
+            case__participants__user_id=user_id,
+            case__participants__is_active=True,
+        ).values_list('user_id', flat=True).distinct(),
+    ]
+
+    interests = set()
+    for queryset in querysets:
+        interests.update(queryset.order_by()[:limit])
+        if len(interests) >= limit:
+            break
+    interests.discard(user_id)
+    return set(list(interests)[:limit])
+
+
+def get_presence_snapshot(user_ids):
+    """Identyfikatory widocznych użytkowników online spośród user_ids"""
+    from court.models import User
+
+    rows = User.objects.filter(id__in=user_ids).values_list('id', 'is_online', 'is_visible')
+    return sorted(
+        user_id for user_id, is_online, is_visible in rows
+        if is_visible and presence_registry.is_online(user_id, default=is_online)
+    )
+
+
+class PresenceRegistry:
+    """Liczniki połączeń, heartbeaty i opóźniony zapis is_online"""
+
+    def __init__(self, heartbeat_timeout=90, offline_grace=5, persist_interval=2.0):
+        self.heartbeat_timeout = heartbeat_timeout
+        self.offline_grace = offline_grace
+        self.persist_interval = persist_interval
+
+        # user_id -> {channel_name: czas ostatniego heartbeatu}
+        self._connections = {}
+        # user_id -> czas zamknięcia ostatniego połączenia
+        self._leaving = {}
+        # user_id -> stan is_online czekający na zapis do bazy
+        self._pending = {}
+        self._listeners = []
+        self._lock = threading.Lock()
+        self._loop = None
+        self._task = None
+
+    @classmethod
+    def from_settings(cls):
+        conf = get_presence_settings()
+        return cls(
+            heartbeat_timeout=conf['HEARTBEAT_TIMEOUT'],
+            offline_grace=conf['OFFLINE_GRACE'],
+            persist_interval=conf['PERSIST_INTERVAL'],
+        )
+
+    # --- POŁĄCZENIA ---
+
+    def connect(self, user_id, channel_name):
+        """Rejestruje połączenie. Zwraca True, jeśli użytkownik właśnie stał się online."""
+        self._ensure_started()
+        with self._lock:
+            was_present = user_id in self._connections or user_id in self._leaving
+            self._leaving.pop(user_id, None)
+            self._connections.setdefault(user_id, {})[channel_name] = time.monotonic()
+            if not was_present:
+                self._pending[user_id] = True
+            return not was_present
+
+    def disconnect(self, user_id, channel_name):
+        """Wyrejestrowuje połączenie. Przejście offline nastąpi po OFFLINE_GRACE."""
+        with self._lock:
+            self._remove_connection(user_id, channel_name, time.monotonic())
+
+    def heartbeat(self, user_id, channel_name):
+        with self._lock:
+            channels = self._connections.get(user_id)
+            if channels is not None and channel_name in channels:
+                channels[channel_name] = time.monotonic()
+
+    def _remove_connection(self, user_id, channel_name, now):
+        channels = self._connections.get(user_id)
+        if channels is None:
+            return
+        channels.pop(channel_name, None)
+        if not channels:
+            del self._connections[user_id]
+            self._leaving[user_id] = now
+
+    # --- ZAPYTANIA ---
+
+    def is_online(self, user_id, default=False):
+        """
+        Stan obecności bez zapytania do bazy. `default` (zwykle User.is_online)
+        jest używany, gdy ten proces nic nie wie o użytkowniku - np. połączenie
+        obsługuje inny worker.
+        """
+        with self._lock:
+            if user_id in self._connections or user_id in self._leaving:
+                return True
+            return self._pending.get(user_id, default)
+
+    def online_user_ids(self):
+        with self._lock:
+            return set(self._connections) | set(self._leaving)
+
+    def connection_count(self, user_id):
+        with self._lock:
+            return len(self._connections.get(user_id, ()))
+
+    def add_listener(self, callback):
+        """async callback(user_id, is_online) - wywoływany przez zadanie w tle przy przejściu offline"""
+        self._listeners.append(callback)
+
+    # --- WĄTEK W TLE ---
+
+    def expire(self):
+        """
+        Usuwa połączenia bez heartbeatu i kończy okres wychodzenia.
+        Zwraca listę użytkowników, którzy przeszli offline.
+        """
+        now = time.monotonic()
+        went_offline = []
+        with self._lock:
+            for user_id, channels in list(self._connections.items()):
+                for channel_name, last_seen in list(channels.items()):
+                    if now - last_seen > self.heartbeat_timeout:
+                        self._remove_connection(user_id, channel_name, now)
+
+            for user_id, left_at in list(self._leaving.items()):
+                if now - left_at >= self.offline_grace:
+                    del self._leaving[user_id]
+                    self._pending[user_id] = False
+                    went_offline.append(user_id)
+        return went_offline
+
+    def flush(self):
+        """Zapisuje zaległe zmiany is_online dwoma zapytaniami UPDATE"""
+        from court.models import User
+
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return
+
+        online = [user_id for user_id, state in pending.items() if state]
+        offline = [user_id for user_id, state in pending.items() if not state]
+        close_old_connections()
+        try:
+            if online:
+                User.objects.filter(id__in=online).update(is_online=True)
+            if offline:
+                User.objects.filter(id__in=offline).update(is_online=False)
+        except Exception as e:
+            print(f"❌ PresenceRegistry: błąd zapisu statusów: {e}")
+            # Przywracamy niezapisane stany, o ile nie nadpisały ich nowsze zmiany
+            with self._lock:
+                for user_id, state in pending.items():
+                    self._pending.setdefault(user_id, state)
+
+    def _ensure_started(self):
+        """
+        Uruchamia zadanie w tle na pętli zdarzeń serwera (tej samej, na której
+        działają consumery - dzięki temu słuchacze mogą wprost używać channel layer).
+        """
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        if self._task is not None and not self._task.done() and self._loop is loop:
+            return
+        self._loop = loop
+        self._task = loop.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.persist_interval)
+            for user_id in self.expire():
+                for callback in self._listeners:
+                    try:
+                        await callback(user_id, False)
+                    except Exception as e:
+                        print(f"❌ PresenceRegistry: błąd słuchacza: {e}")
+            await database_sync_to_async(self.flush)()
+
+
+presence_registry = PresenceRegistry.from_settings()
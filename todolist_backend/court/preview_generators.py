@@ -0,0 +1,163 @@
+"""
+Generowanie podglądów dokumentów - miniatura pierwszej strony i tekst.
+
+Funkcje uruchamiane w procesach puli (court/document_previews.py), dlatego
+nie używają ORM - dostają ścieżki i ustawienia, zwracają słownik z wynikiem.
+Wyniki leżą na dysku pod sumą treści (<ab>/<sha256>.jpg / .txt), więc ten
+sam plik w kilku sprawach jest przetwarzany raz.
+
+Narzędzia są opcjonalne:
+- Pillow - miniatury obrazów,
+- poppler-utils (pdftoppm, pdftotext) - miniatura i tekst PDF.
+Bez nich dany typ dostaje status 'unsupported'.
+"""
+import os
+import shutil
+import subprocess
+import tempfile
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = None
+
+TEXT_EXTENSIONS = {'.txt', '.csv', '.md', '.json', '.xml', '.html', '.htm', '.log'}
+IMAGE_EXTENSIONS = {'.png', '.jpg', '.jpeg', '.gif', '.bmp', '.webp', '.tif', '.tiff'}
+PDF_EXTENSIONS = {'.pdf'}
+
+THUMBNAIL_SUFFIX = '.jpg'
+TEXT_SUFFIX = '.txt'
+
+
+def replace_atomically(path, write):
+    """Zapisuje przez plik tymczasowy - czytelnik nigdy nie widzi połowy pliku"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    os.close(fd)
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def decode_text(data):
+    for encoding in ('utf-8', 'cp1250'):
+        try:
+            return data.decode(encoding)
+        except UnicodeDecodeError:
+            continue
+    return data.decode('utf-8', errors='replace')
+
+
+def write_text(path, text, max_chars):
+    text = text[:max_chars]
+
+    def write(tmp_path):
+        with open(tmp_path, 'w', encoding='utf-8') as out:
+            out.write(text)
+
+    replace_atomically(path, write)
+    return text
+
+
+def text_from_plain(source_path, text_path, conf):
+    with open(source_path, 'rb') as source:
+        # Zapas na znaki wielobajtowe UTF-8
+        data = source.read(conf['MAX_TEXT_CHARS'] * 4)
+    return write_text(text_path, decode_text(data), conf['MAX_TEXT_CHARS'])
+
+
+def thumbnail_from_image(source_path, thumb_path, conf):
+    if Image is None:
+        return False
+
+    def write(tmp_path):
+        with Image.open(source_path) as image:
+            image = ImageOps.exif_transpose(image)
+            image.thumbnail((conf['THUMBNAIL_SIZE'], conf['THUMBNAIL_SIZE']))
+            image.convert('RGB').save(tmp_path, 'JPEG', quality=conf['THUMBNAIL_QUALITY'])
+
+    replace_atomically(thumb_path, write)
+    return True
+
+
+def thumbnail_from_pdf(source_path, thumb_path, conf):
+    pdftoppm = shutil.which(conf['PDFTOPPM'])
+    if not pdftoppm:
+        return False
+
+    def write(tmp_path):
+        prefix = os.path.splitext(tmp_path)[0]
+        subprocess.run(
+            [pdftoppm, '-f', '1', '-l', '1', '-singlefile', '-jpeg',
+             '-scale-to', str(conf['THUMBNAIL_SIZE']), source_path, prefix],
+            check=True, capture_output=True, timeout=conf['TIMEOUT'],
+        )
+        os.replace(prefix + '.jpg', tmp_path)
+
+    replace_atomically(thumb_path, write)
+    return True
+
+
+def text_from_pdf(source_path, text_path, conf):
+    pdftotext = shutil.which(conf['PDFTOTEXT'])
+    if not pdftotext:
+        return None
+    result = subprocess.run(
+        [pdftotext, '-l', str(conf['MAX_TEXT_PAGES']), '-enc', 'UTF-8', source_path, '-'],
+        check=True, capture_output=True, timeout=conf['TIMEOUT'],
+    )
+    return write_text(text_path, decode_text(result.stdout), conf['MAX_TEXT_CHARS'])
+
+
+def read_cached_text(text_path, max_chars):
+    with open(text_path, encoding='utf-8') as cached:
+        return cached.read(max_chars)
+
+
+def generate_previews(source_path, extension, thumb_path, text_path, conf):
+    """
+    Tworzy brakujące pochodne pliku. Błąd jednej pochodnej nie przekreśla
+    drugiej (np. miniatura PDF zostaje mimo błędu pdftotext). Zwraca
+    {'status': 'ready'|'unsupported'|'failed', 'thumbnail': bool, 'text': bool,
+    'excerpt': str, 'errors': [str]}.
+    """
+    extension = extension.lower()
+    errors = []
+
+    def attempt(label, make, *args):
+        try:
+            return make(*args)
+        except Exception as e:
+            errors.append(f'{label}: {e}')
+            return None
+
+    has_thumbnail = os.path.exists(thumb_path)
+    text = read_cached_text(text_path, conf['EXCERPT_CHARS']) if os.path.exists(text_path) else None
+
+    if os.path.getsize(source_path) <= conf['MAX_SOURCE_SIZE']:
+        if extension in TEXT_EXTENSIONS:
+            if text is None:
+                text = attempt('tekst', text_from_plain, source_path, text_path, conf)
+        elif extension in IMAGE_EXTENSIONS:
+            if not has_thumbnail:
+                has_thumbnail = bool(attempt('miniatura', thumbnail_from_image, source_path, thumb_path, conf))
+        elif extension in PDF_EXTENSIONS:
+            if not has_thumbnail:
+                has_thumbnail = bool(attempt('miniatura', thumbnail_from_pdf, source_path, thumb_path, conf))
+            if text is None:
+                text = attempt('tekst', text_from_pdf, source_path, text_path, conf)
+
+    if has_thumbnail or text is not None:
+        status = 'ready'
+    else:
+        status = 'failed' if errors else 'unsupported'
+    return {
+        'status': status,
+        'thumbnail': has_thumbnail,
+        'text': text is not None,
+        'excerpt': (text or '')[:conf['EXCERPT_CHARS']],
+        'errors': errors,
+    }
@@ -0,0 +1,499 @@
+"""
+Wyszukiwanie pełnotekstowe: sprawy, strony, dokumenty i wiadomości.
+
+Indeks to jedna tabela SQLite FTS5 (SQLiteFTSBackend) z kolumnami title
+i body oraz kolumną access z tokenami uprawnień: typ (kcase, kmessage...),
+sprawa (c<id>), uczestnicy rozmowy (u<id>) i pokój (r<id>). Filtr
+uprawnień jest częścią wyrażenia MATCH, więc FTS5 przecina listy trafień
+bez odczytu wierszy. rowid wyznacza para (typ, id)
+- object_id * 4 + kod typu - więc aktualizacja jednego obiektu to
+DELETE + INSERT po kluczu głównym, bez skanowania indeksu.
+
+Tokenizer unicode61 z remove_diacritics: "zazolc" znajduje "zażółć".
+"ł" nie jest literą ze znakiem diakrytycznym, tylko osobną literą, więc
+słowa z "ł" trafiają dodatkowo - z "l" - do kolumn title_folded /
+body_folded, a w zapytaniu "ł" zawsze zamieniamy na "l".
+Ostatnie słowo zapytania szukane jest jako prefiks (indeks prefix='2 3').
+Wyniki sortuje bm25 (tytuł waży TITLE_WEIGHT razy więcej niż treść),
+strony wyznacza kursor (wynik, rowid) - jak w court/pagination.py.
+Koszt zapytania rośnie z liczbą trafień (bm25 dla każdego), więc ranking
+obejmuje najwyżej MAX_CANDIDATES najnowszych widocznych trafień każdego
+typu - słowo występujące w większości wpisów nie skanuje całego indeksu,
+a tysiące wiadomości nie wypychają z wyników spraw.
+
+Indeks aktualizują sygnały (court/signals.py) w tej samej transakcji co
+zmiana danych; bulk_create wiadomości (court/chat_writer.py) i podglądy
+dokumentów (court/document_previews.py) indeksują jawnie przez
+index_objects(). Pełna przebudowa: komenda `rebuild_search_index`.
+
+Backend wybiera SEARCH['BACKEND'] - klasa z interfejsem SearchBackend
+(bazowa nic nie indeksuje i nic nie znajduje, np. dla baz bez FTS5).
+"""
+import base64
+import json
+import re
+from collections import namedtuple
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+from django.utils.module_loading import import_string
+
+from court.pagination import InvalidCursor
+
+DEFAULTS = {
+    'BACKEND': 'court.search.SQLiteFTSBackend',
+    'TABLE': 'court_search_index',
+    'TITLE_WEIGHT': 10.0,
+    'MAX_TERMS': 8,
+    'PREFIX_MIN_LENGTH': 2,
+    'MAX_DOCUMENT_TEXT': 100_000,     # znaków wyciągniętego tekstu dokumentu w indeksie
+    'SNIPPET_TOKENS': 12,
+    # Bardzo częste słowa: bm25 liczone tylko dla tylu najnowszych widocznych trafień typu (0 = wszystkie)
+    'MAX_CANDIDATES': 5000,
+    # Więcej spraw/pokojów użytkownika - filtr uprawnień przez odczyt kolumn zamiast tokenów
+    'MAX_ACCESS_TOKENS': 500,
+    'BATCH_SIZE': 1000,
+}
+
+KIND_CODES = {'case': 0, 'party': 1, 'document': 2, 'message': 3}
+KINDS = list(KIND_CODES)
+
+TOKEN_RE = re.compile(r'\w+')
+FOLDED_WORD_RE = re.compile(r'\w*[łŁ]\w*')
+FOLD_TABLE = str.maketrans('łŁ', 'lL')
+TEXT_COLUMNS = '{title body title_folded body_folded}'
+
+SearchEntry = namedtuple('SearchEntry', 'kind object_id title body case_id room_id user_a user_b')
+SearchEntry.__new__.__defaults__ = (None, None, None, None)
+
+
+def get_search_settings():
+    conf = dict(DEFAULTS)
+    conf.update(getattr(settings, 'SEARCH', {}))
+    return conf
+
+
+def search_rowid(kind, object_id):
+    return object_id * len(KIND_CODES) + KIND_CODES[kind]
+
+
+def folded_words(text):
+    """Słowa z "ł" zapisane przez "l" (pozostałe litery składa tokenizer)"""
+    return ' '.join(word.translate(FOLD_TABLE) for word in FOLDED_WORD_RE.findall(text or ''))
+
+
+def access_tokens(entry):
+    """Tokeny kolumny access: typ, sprawa, uczestnicy i pokój rozmowy"""
+    tokens = [f'k{entry.kind}']
+    if entry.case_id is not None:
+        tokens.append(f'c{entry.case_id}')
+    tokens.extend(f'u{user_id}' for user_id in (entry.user_a, entry.user_b) if user_id is not None)
+    if entry.room_id is not None:
+        tokens.append(f'r{entry.room_id}')
+    return ' '.join(tokens)
+
+
+def build_match_query(text, max_terms, prefix_min_length):
+    """
+    Bezpieczne zapytanie FTS5 z tekstu użytkownika: słowa w cudzysłowach
+    (bez operatorów i składni FTS), wszystkie wymagane, ostatnie jako prefiks.
+    None, gdy w tekście nie ma słów.
+    """
+    terms = TOKEN_RE.findall((text or '').translate(FOLD_TABLE))[:max_terms]
+    if not terms:
+        return None
+    parts = [f'"{term}"' for term in terms]
+    if len(terms[-1]) >= prefix_min_length:
+        parts[-1] += '*'
+    # Tylko kolumny tekstu - słowo "kcase" z zapytania nie trafia w tokeny access
+    return f"{TEXT_COLUMNS} : ({' '.join(parts)})"
+
+
+def encode_search_cursor(score, rowid, bounds=None):
+    """Kursor niesie też granice kandydatów - kolejne strony ich nie przeliczają"""
+    raw = json.dumps([score, rowid, bounds or {}])
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_search_cursor(cursor):
+    """(wynik, rowid, granice kandydatów wg typu)"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        score, rowid, *rest = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        bounds = {kind: int(bound) for kind, bound in (rest[0] if rest else {}).items() if kind in KIND_CODES}
+        return float(score), int(rowid), bounds
+    except (ValueError, TypeError, AttributeError, UnicodeError):
+        raise InvalidCursor(cursor)
+
+
+# --- WPISY INDEKSU ---
+
+def case_entry(case):
+    return SearchEntry('case', case.pk, f'{case.case_number} {case.title}', case.description or '', case_id=case.pk)
+
+
+def party_entry(party):
+    return SearchEntry('party', party.pk, party.name, party.role, case_id=party.case_id)
+
+
+def document_text(document, max_chars):
+    """Tekst wyciągnięty przez podglądy (court/document_previews.py), jeśli już jest"""
+    from django.core.files.storage import default_storage
+
+    if not document.text_preview:
+        return ''
+    try:
+        with default_storage.open(document.text_preview, 'rb') as text:
+            return text.read(max_chars * 4).decode('utf-8', errors='ignore')[:max_chars]
+    except OSError:
+        return document.text_excerpt
+
+
+def document_entry(document):
+    conf = get_search_settings()
+    body = '\n'.join(filter(None, [
+        document.description, document.original_name, document_text(document, conf['MAX_DOCUMENT_TEXT']),
+    ]))
+    return SearchEntry('document', document.pk, document.title, body, case_id=document.case_id)
+
+
+def message_entry(message):
+    body = '\n'.join(filter(None, [message.content, message.attachment_name]))
+    return SearchEntry(
+        'message', message.pk, '', body,
+        room_id=message.room_id, user_a=message.sender_id, user_b=message.recipient_id,
+    )
+
+
+def entry_builders():
+    from court.models import Case, CaseParty, Document, Message
+
+    return {Case: case_entry, CaseParty: party_entry, Document: document_entry, Message: message_entry}
+
+
+def model_kind(model):
+    from court.models import Case, CaseParty, Document, Message
+
+    return {Case: 'case', CaseParty: 'party', Document: 'document', Message: 'message'}[model]
+
+
+# --- BACKENDY ---
+
+class SearchBackend:
+    """Interfejs backendu wyszukiwania - ta klasa nic nie indeksuje i nic nie znajduje"""
+
+    def create_schema(self):
+        pass
+
+    def drop_schema(self):
+        pass
+
+    def index(self, entries):
+        pass
+
+    def remove(self, keys):
+        """keys: lista par (typ, id)"""
+        pass
+
+    def clear(self):
+        pass
+
+    def search(self, text, user=None, kinds=None, cursor=None, limit=20):
+        """Zwraca (lista słowników wyników, następny kursor). user=None - bez filtra uprawnień."""
+        return [], None
+
+    def matching_ids(self, text, kind, limit=1000):
+        return None
+
+
+class SQLiteFTSBackend(SearchBackend):
+    """Indeks w wirtualnej tabeli FTS5 tej samej bazy SQLite"""
+
+    def __init__(self, table=None):
+        self.conf = get_search_settings()
+        self.table = table or self.conf['TABLE']
+
+    @property
+    def enabled(self):
+        return connection.vendor == 'sqlite'
+
+    def create_schema(self):
+        if not self.enabled:
+            return
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {self.table} USING fts5("
+                "title, body, title_folded, body_folded, access, kind UNINDEXED, object_id UNINDEXED, "
+                "case_id UNINDEXED, room_id UNINDEXED, user_a UNINDEXED, user_b UNINDEXED, "
+                "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+            )
+
+    def drop_schema(self):
+        if not self.enabled:
+            return
+        with connection.cursor() as cursor:
+            cursor.execute(f'DROP TABLE IF EXISTS {self.table}')
+
+    def index(self, entries):
+        entries = list(entries)
+        if not entries or not self.enabled:
+            return
+        rowids = [search_rowid(entry.kind, entry.object_id) for entry in entries]
+        with connection.cursor() as cursor:
+            self.delete_rowids(cursor, rowids)
+            cursor.executemany(
+                f'INSERT INTO {self.table} (rowid, title, body, title_folded, body_folded, access, '
+                'kind, object_id, case_id, room_id, user_a, user_b) '
+                'VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)',
+                [
+                    (rowid, entry.title, entry.body, folded_words(entry.title), folded_words(entry.body),
+                     access_tokens(entry), entry.kind, entry.object_id,
+                     entry.case_id, entry.room_id, entry.user_a, entry.user_b)
+                    for rowid, entry in zip(rowids, entries)
+                ],
+            )
+
+    def remove(self, keys):
+        if not keys or not self.enabled:
+            return
+        with connection.cursor() as cursor:
+            self.delete_rowids(cursor, [search_rowid(kind, pk) for kind, pk in keys])
+
+    def delete_rowids(self, cursor, rowids):
+        batch = self.conf['BATCH_SIZE']
+        for start in range(0, len(rowids), batch):
+            chunk = rowids[start:start + batch]
+            cursor.execute(
+                f"DELETE FROM {self.table} WHERE rowid IN ({', '.join(['%s'] * len(chunk))})", chunk
+            )
+
+    def clear(self):
+        if not self.enabled:
+            return
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table}')
+
+    def optimize(self):
+        """Scala segmenty indeksu (po przebudowie / dużym imporcie)"""
+        if not self.enabled:
+            return
+        with connection.cursor() as cursor:
+            cursor.execute(f"INSERT INTO {self.table} ({self.table}) VALUES ('optimize')")
+
+    def visibility(self, user, kinds):
+        """
+        Ograniczenie wyników do typów `kinds` widocznych dla użytkownika:
+        (tokeny kolumny access - None bez ograniczeń, {typ: (warunek SQL,
+        parametry)}). Warunki SQL czytają kolumny wiersza, więc są tylko
+        zapasem dla użytkowników z więcej niż MAX_ACCESS_TOKENS sprawami/pokojami.
+        """
+        from court.models import Case, CaseParticipant, ChatRoom
+
+        if user is None:
+            return (None if len(kinds) == len(KINDS) else [f'k{kind}' for kind in kinds]), {}
+
+        limit = self.conf['MAX_ACCESS_TOKENS']
+        tokens, clauses = [], {}
+        if 'message' in kinds:
+            # Rozmowy tylko własne - także dla administracji
+            through = ChatRoom.participants.through
+            rooms = list(through.objects.filter(user_id=user.pk).values_list('chatroom_id', flat=True)[:limit + 1])
+            if len(rooms) <= limit:
+                tokens += [f'u{user.pk}'] + [f'r{room_id}' for room_id in rooms]
+            else:
+                tokens.append('kmessage')
+                clauses['message'] = (
+                    f"(user_a = %s OR user_b = %s OR room_id IN "
+                    f"(SELECT chatroom_id FROM {through._meta.db_table} WHERE user_id = %s))",
+                    [user.pk] * 3,
+                )
+
+        case_kinds = [kind for kind in kinds if kind != 'message']
+        if case_kinds and user.is_staff:
+            tokens += [f'k{kind}' for kind in case_kinds]
+        elif case_kinds:
+            case_ids = list(
+                Case.objects.filter(Q(creator_id=user.pk) | Q(assigned_judge_id=user.pk))
+                .order_by().values_list('id', flat=True)
+                .union(
+                    CaseParticipant.objects.filter(user_id=user.pk, is_active=True)
+                    .order_by().values_list('case_id', flat=True)
+                )[:limit + 1]
+            )
+            if len(case_ids) <= limit:
+                tokens += [f'c{case_id}' for case_id in case_ids]
+            else:
+                tokens += [f'k{kind}' for kind in case_kinds]
+                clause = (
+                    f"case_id IN (SELECT id FROM {Case._meta.db_table} WHERE creator_id = %s OR assigned_judge_id = %s "
+                    f"UNION SELECT case_id FROM {CaseParticipant._meta.db_table} WHERE user_id = %s AND is_active)",
+                    [user.pk] * 3,
+                )
+                clauses.update((kind, clause) for kind in case_kinds)
+        return tokens, clauses
+
+    def candidate_clause(self, match, kinds, clauses, bounds=None):
+        """
+        Warunek wyboru kandydatów do rankingu: typ (z rowid, bez odczytu
+        kolumn) i - przy MAX_CANDIDATES - granica rowid N-tego najnowszego
+        widocznego trafienia osobno dla każdego typu. Najniższa z granic
+        trafia też do warunku głównego, żeby FTS5 pominął starsze trafienia
+        bez liczenia bm25. Zwraca (SQL, parametry, granice); granice
+        z kursora (bounds) nie są liczone ponownie.
+        """
+        max_candidates = self.conf['MAX_CANDIDATES']
+        conditions = {}
+        for kind in kinds:
+            sql = f'rowid %% {len(KIND_CODES)} = {KIND_CODES[kind]}'
+            clause, clause_params = clauses.get(kind, (None, []))
+            conditions[kind] = (f'{sql} AND {clause}' if clause else sql, clause_params)
+
+        if bounds is None and max_candidates:
+            # Granice liczone jednym zapytaniem; przy mniejszej liczbie trafień typu - 0
+            columns, params = [], []
+            for sql, clause_params in conditions.values():
+                columns.append(
+                    f"COALESCE((SELECT rowid FROM {self.table} WHERE {self.table} MATCH %s AND {sql} "
+                    f"ORDER BY rowid DESC LIMIT 1 OFFSET %s), 0)"
+                )
+                params.extend([match, *clause_params, max_candidates - 1])
+            with connection.cursor() as db_cursor:
+                db_cursor.execute(f"SELECT {', '.join(columns)}", params)
+                bounds = dict(zip(conditions, db_cursor.fetchone()))
+        bounds = {kind: bound for kind, bound in (bounds or {}).items() if kind in conditions}
+
+        parts, params = [], []
+        for kind, (sql, clause_params) in conditions.items():
+            if bounds.get(kind):
+                # Granica przed warunkiem SQL - starszych wierszy nie czytamy
+                sql = f'rowid >= %s AND {sql}'
+                clause_params = [bounds[kind], *clause_params]
+            parts.append(f'({sql})')
+            params.extend(clause_params)
+        sql = f"({' OR '.join(parts)})"
+        if len(bounds) == len(conditions) and all(bounds.values()):
+            sql = f'rowid >= %s AND {sql}'
+            params.insert(0, min(bounds.values()))
+        return sql, params, bounds
+
+    def search(self, text, user=None, kinds=None, cursor=None, limit=20):
+        match = build_match_query(text, self.conf['MAX_TERMS'], self.conf['PREFIX_MIN_LENGTH'])
+        if match is None or not self.enabled:
+            return [], None
+
+        kinds = [kind for kind in KINDS if not kinds or kind in kinds]
+        tokens, clauses = self.visibility(user, kinds)
+        if tokens == []:
+            # Brak spraw i rozmów - nie ma czego szukać
+            return [], None
+        if tokens:
+            match = f"{match} AND access : ({' OR '.join(tokens)})"
+
+        title_weight = float(self.conf['TITLE_WEIGHT'])
+        score = f"bm25({self.table}, {title_weight}, 1.0, {title_weight}, 1.0, 0.0)"
+        last_score, last_rowid, bounds = decode_search_cursor(cursor) if cursor else (None, None, None)
+        candidates, candidate_params, bounds = self.candidate_clause(match, kinds, clauses, bounds)
+        where = [f'{self.table} MATCH %s', candidates]
+        params = [match, *candidate_params]
+        if cursor:
+            where.append(f'({score} > %s OR ({score} = %s AND rowid > %s))')
+            params.extend([last_score, last_score, last_rowid])
+
+        sql = (
+            f"SELECT rowid, kind, object_id, case_id, room_id, "
+            f"highlight({self.table}, 0, '<mark>', '</mark>'), "
+            f"snippet({self.table}, 1, '<mark>', '</mark>', '…', {int(self.conf['SNIPPET_TOKENS'])}), "
+            f"{score} FROM {self.table} WHERE {' AND '.join(where)} "
+            f"ORDER BY {score}, rowid LIMIT %s"
+        )
+        params.append(limit + 1)
+        with connection.cursor() as db_cursor:
+            db_cursor.execute(sql, params)
+            rows = db_cursor.fetchall()
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_search_cursor(rows[-1][7], rows[-1][0], bounds)
+        results = [
+            {
+                'type': kind,
+                'id': object_id,
+                'case_id': case_id,
+                'room_id': room_id,
+                'title': title,
+                'snippet': snippet,
+                # bm25 w SQLite jest ujemne - większa liczba = lepsze dopasowanie
+                'score': round(-rank, 4),
+            }
+            for _, kind, object_id, case_id, room_id, title, snippet, rank in rows
+        ]
+        return results, next_cursor
+
+    def matching_ids(self, text, kind, limit=1000):
+        """Id obiektów danego typu pasujących do zapytania (bez uprawnień) - np. dla admina"""
+        match = build_match_query(text, self.conf['MAX_TERMS'], self.conf['PREFIX_MIN_LENGTH'])
+        if match is None or not self.enabled:
+            return None
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT object_id FROM {self.table} WHERE {self.table} MATCH %s LIMIT %s',
+                [f'{match} AND access : k{kind}', limit],
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+
+_search_backend = None
+
+
+def get_search_backend():
+    global _search_backend
+    if _search_backend is None:
+        _search_backend = import_string(get_search_settings()['BACKEND'])()
+    return _search_backend
+
+
+# --- AKTUALIZACJA INDEKSU ---
+
+def index_objects(objects):
+    """Indeksuje obiekty jednego modelu (Case, CaseParty, Document, Message)"""
+    objects = list(objects)
+    if not objects:
+        return
+    build = entry_builders()[type(objects[0])]
+    get_search_backend().index([build(obj) for obj in objects])
+
+
+def remove_objects(model, pks):
+    kind = model_kind(model)
+    get_search_backend().remove([(kind, pk) for pk in pks])
+
+
+def rebuild_index(batch_size=None, stdout=None):
+    """Przebudowa całego indeksu w partiach. Zwraca liczbę wpisów wg typu."""
+    from court.models import Case, CaseParty, Document, Message
+
+    backend = get_search_backend()
+    batch_size = batch_size or get_search_settings()['BATCH_SIZE']
+    backend.create_schema()
+    backend.clear()
+    counts = {}
+    for model in (Case, CaseParty, Document, Message):
+        queryset = model.objects.order_by('pk')
+        total = 0
+        batch = []
+        for obj in queryset.iterator(chunk_size=batch_size):
+            batch.append(obj)
+            if len(batch) >= batch_size:
+                index_objects(batch)
+                total += len(batch)
+                batch = []
+        index_objects(batch)
+        total += len(batch)
+        counts[model_kind(model)] = total
+        if stdout:
+            stdout.write(f'   {model.__name__}: {total}')
+    if hasattr(backend, 'optimize'):
+        backend.optimize()
+    return counts
@@ -2,6 +2,9 @@ from rest_framework import serializers
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 from rest_framework.exceptions import AuthenticationFailed
 from django.contrib.auth import authenticate
+from django.core.files.storage import default_storage
+from .conversations import last_message_summary
+from .presence import presence_registry
 from .models import Role, User, Case, Document, Hearing, Notification, CaseParticipant, AuditLog, Message, ChatRoom, CaseParty
 
 # --- 1. LOGOWANIE I TOKENY ---
@@ -75,8 +78,9 @@ class UserSerializer(serializers.ModelSerializer):
         }
     
     def get_is_online(self, obj):
-        # Użytkownik jest online tylko jeśli ma połączenie WS ORAZ chce być widoczny
-        return obj.is_online and obj.is_visible
+        # Użytkownik jest online tylko jeśli ma połączenie WS ORAZ chce być widoczny.
+        # Stan czytamy z rejestru obecności; kolumna is_online to tylko wartość zapasowa.
+        return presence_registry.is_online(obj.id, default=obj.is_online) and obj.is_visible
 
     def create(self, validated_data):
         is_active = validated_data.get('is_active', True)
@@ -134,11 +138,15 @@ class CaseSerializer(serializers.ModelSerializer):
 class DocumentSerializer(serializers.ModelSerializer):
     uploaded_by_username = serializers.CharField(source='uploaded_by.username', read_only=True)
     file_url = serializers.SerializerMethodField()
+    thumbnail_url = serializers.SerializerMethodField()
+    text_preview_url = serializers.SerializerMethodField()
     class Meta:
         model = Document
         fields = ['id', 'title', 'description', 'file', 'file_url', 'case', 
-                  'uploaded_by', 'uploaded_by_username', 'uploaded_at', 'file_size']
-        read_only_fields = ['id', 'uploaded_by', 'uploaded_at', 'file_size']
+                  'uploaded_by', 'uploaded_by_username', 'uploaded_at', 'file_size', 'content_hash',
+                  'original_name', 'preview_status', 'thumbnail_url', 'text_preview_url', 'text_excerpt']
+        read_only_fields = ['id', 'uploaded_by', 'uploaded_at', 'file_size', 'content_hash', 'original_name',
+                            'preview_status', 'text_excerpt']
     
     def get_file_url(self, obj):
         request = self.context.get('request')
@@ -146,6 +154,18 @@ class DocumentSerializer(serializers.ModelSerializer):
             return request.build_absolute_uri(obj.file.url)
         return None
 
+    def get_media_url(self, name):
+        request = self.context.get('request')
+        if name and request:
+            return request.build_absolute_uri(default_storage.url(name))
+        return None
+
+    def get_thumbnail_url(self, obj):
+        return self.get_media_url(obj.thumbnail)
+
+    def get_text_preview_url(self, obj):
+        return self.get_media_url(obj.text_preview)
+
 class HearingSerializer(serializers.ModelSerializer):
     judge_username = serializers.CharField(source='judge.username', read_only=True)
     case_number = serializers.CharField(source='case.case_number', read_only=True)
@@ -220,11 +240,12 @@ class MessageSerializer(serializers.ModelSerializer):
             'content', 
             'attachment',      
             'attachment_url',  
+            'attachment_name',
             'created_at', 
             'is_read',
             'room'
         ]
-        read_only_fields = ['created_at', 'sender', 'sender_id', 'sender_username', 'recipient_username']
+        read_only_fields = ['created_at', 'sender', 'sender_id', 'sender_username', 'recipient_username', 'attachment_name']
 
     def get_attachment_url(self, obj):
         request = self.context.get('request')
@@ -233,7 +254,22 @@ class MessageSerializer(serializers.ModelSerializer):
         return None
     
 class ChatRoomSerializer(serializers.ModelSerializer):
-    messages = MessageSerializer(many=True, read_only=True)
+    # Bez zagnieżdżonych wiadomości - są dostępne stronami w room_messages.
+    # Pola poniżej pochodzą z adnotacji annotate_room_summaries (court/conversations.py)
+    participant_count = serializers.SerializerMethodField()
+    last_message = serializers.SerializerMethodField()
+    unread_count = serializers.SerializerMethodField()
+
     class Meta:
         model = ChatRoom
-        fields = ['id', 'name', 'created_at', 'messages']
\ No newline at end of file
+        fields = ['id', 'name', 'is_direct', 'created_at', 'participant_count', 'last_message', 'unread_count']
+        read_only_fields = ['is_direct']
+
+    def get_participant_count(self, obj):
+        return getattr(obj, 'participant_count', None)
+
+    def get_last_message(self, obj):
+        return last_message_summary(obj)
+
+    def get_unread_count(self, obj):
+        return getattr(obj, 'unread_count', None)
\ No newline at end of file
@@ -1,47 +1,36 @@
-from django.db.models.signals import post_save, pre_save
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
 from django.dispatch import receiver
-from channels.layers import get_channel_layer
-from asgiref.sync import async_to_sync
-from .models import Case, Hearing, Document, Notification, CaseParticipant, Message
-from .serializers import NotificationSerializer
-
-# Funkcja pomocnicza do wysyłania przez WebSocket
-def send_websocket_notification(user_id, notification):
-    channel_layer = get_channel_layer()
-    group_name = f"notifications_{user_id}"
-    
-    try:
-        # ZMIANA: Używamy serializera, aby dane w WebSocket były kompletne (np. nazwa nadawcy)
-        serializer = NotificationSerializer(notification)
-        data = serializer.data
-
-        async_to_sync(channel_layer.group_send)(
-            group_name,
-            {
-                "type": "send_notification", 
-                "notification": data 
-            }
-        )
-    except Exception as e:
-        print(f"❌ Błąd wysyłania do WebSocket: {e}")
+from collections import Counter
+from django.db import transaction
+from .models import Case, CaseParty, Hearing, Document, Notification, CaseParticipant, Message, AuditLog, User, ChatRoom
+from .auth_cache import user_cache
+from .blob_store import acquire_blob, release_blob
+from .document_previews import remove_unused_previews, submit_document
+from .conversations import invalidate_direct_room
+from .unread_counters import unread_counters
+from .audit import increment_daily_stats, release_user_daily_stats
+from .notification_outbox import enqueue_notifications
+from .search import index_objects, remove_objects
+
+# Powiadomienia WebSocket idą przez outbox (court/notification_outbox.py):
+# wpis powstaje w tej samej transakcji co Notification, wysyłka po commit.
 
 # 1. ZMIANA STATUSU SPRAWY
 @receiver(pre_save, sender=Case)
-def notify_case_status_change(sender, instance, **kwargs):
-    if not instance.pk: return
-    try:
-        old_case = Case.objects.get(pk=instance.pk)
-    except Case.DoesNotExist: return
+def notify_case_status_change(sender, instance, update_fields=None, **kwargs):
+    if not instance.pk or instance._state.adding: return
+    if update_fields is not None and 'status' not in update_fields: return
 
-    if old_case.status != instance.status and instance.creator:
+    # Porównanie ze stanem wczytanym z bazy (TrackedFieldsMixin) - bez dodatkowego SELECT
+    if instance.has_changed('status') and instance.creator_id:
         notif = Notification.objects.create(
-            user=instance.creator,
+            user_id=instance.creator_id,
             title="Zmiana statusu sprawy",
             message=f"Status sprawy {instance.case_number} zmieniony na: {instance.status}",
             notification_type='status_changed',
             case=instance
         )
-        send_websocket_notification(instance.creator.id, notif)
+        enqueue_notifications([notif])
 
 @receiver(post_save, sender=Case)
 def notify_case_updated(sender, instance, created, **kwargs):
@@ -62,7 +51,7 @@ def notify_new_hearing(sender, instance, created, **kwargs):
                 hearing=instance,
                 case=instance.case
             )
-            send_websocket_notification(instance.judge.id, notif)
+            enqueue_notifications([notif])
         
         # Do twórcy sprawy
         if instance.case.creator:
@@ -74,7 +63,7 @@ def notify_new_hearing(sender, instance, created, **kwargs):
                 hearing=instance,
                 case=instance.case
             )
-            send_websocket_notification(instance.case.creator.id, notif)
+            enqueue_notifications([notif])
 
 # 3. NOWY DOKUMENT
 @receiver(post_save, sender=Document)
@@ -92,7 +81,7 @@ def notify_new_document(sender, instance, created, **kwargs):
                 case=case,
                 sender=instance.uploaded_by # ZMIANA: Ustawiamy nadawcę
             )
-            send_websocket_notification(case.assigned_judge.id, notif)
+            enqueue_notifications([notif])
 
 # 4. NOWY UCZESTNIK SPRAWY
 @receiver(post_save, sender=CaseParticipant)
@@ -105,18 +94,138 @@ def notify_new_participant(sender, instance, created, **kwargs):
             notification_type='new_participant',
             case=instance.case
         )
-        send_websocket_notification(instance.user.id, notif)
+        enqueue_notifications([notif])
 
 # 5. NOWA WIADOMOŚĆ (Chat)
-@receiver(post_save, sender=Message)
-def notify_new_message(sender, instance, created, **kwargs):
-    if created and instance.recipient:
-        notif = Notification.objects.create(
-            user=instance.recipient,
+def create_message_notifications(messages):
+    """
+    Powiadomienia dla odbiorców wiadomości prywatnych - jednym bulk_create
+    - oraz aktualizacja ich liczników nieprzeczytanych.
+    Używane także przez court/chat_writer.py, gdzie post_save nie jest wywoływany.
+    """
+    messages = [message for message in messages if message.recipient]
+    notifications = Notification.objects.bulk_create([
+        Notification(
+            user=message.recipient,
             # Tutaj używamy __str__ modelu User (poprawionego w models.py)
-            title=f"Wiadomość od {instance.sender}",
-            message=f"{instance.content[:50]}..." if instance.content else "Przesłano załącznik",
+            title=f"Wiadomość od {message.sender}",
+            message=f"{message.content[:50]}..." if message.content else "Przesłano załącznik",
             notification_type='message',
-            sender=instance.sender # ZMIANA: Ustawiamy nadawcę
+            sender=message.sender # ZMIANA: Ustawiamy nadawcę
         )
-        send_websocket_notification(instance.recipient.id, notif)
\ No newline at end of file
+        for message in messages
+    ])
+
+    # bulk_create nie wywołuje post_save - liczniki zmieniamy tutaj, raz na odbiorcę,
+    # przed wpisem do outboxu: ramka z outboxu niesie już zmienione liczniki
+    received = Counter(message.recipient_id for message in messages)
+    for user_id, count in received.items():
+        unread_counters.adjust(user_id, 'notifications', count, push=False)
+        unread_counters.adjust(user_id, 'messages', count, push=False)
+    enqueue_notifications(notifications)
+
+@receiver(post_save, sender=Message)
+def notify_new_message(sender, instance, created, **kwargs):
+    if created and instance.recipient:
+        create_message_notifications([instance])
+
+# 6. STATYSTYKI AUDYTU
+@receiver(post_save, sender=AuditLog)
+def update_audit_daily_stats(sender, instance, created, **kwargs):
+    # Wpisy z AuditLogWriter (bulk_create) są liczone bezpośrednio w court/audit.py
+    if created:
+        increment_daily_stats([instance])
+
+@receiver(pre_delete, sender=User)
+def merge_deleted_user_audit_stats(sender, instance, **kwargs):
+    # Przed SET_NULL - liczniki użytkownika dołączają do wiersza anonimowego
+    release_user_daily_stats(instance.pk)
+
+
+# 7. CACHE UŻYTKOWNIKÓW WEBSOCKET
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_cached_user(sender, instance, **kwargs):
+    user_cache.invalidate(str(instance.pk))
+
+
+# 8. CACHE ROZMÓW DM
+@receiver(post_delete, sender=ChatRoom)
+def invalidate_cached_direct_room(sender, instance, **kwargs):
+    invalidate_direct_room(instance)
+
+
+# 9. LICZNIKI NIEPRZECZYTANYCH (court/unread_counters.py)
+@receiver(post_save, sender=Notification)
+def count_new_notification(sender, instance, created, **kwargs):
+    # Bez push - nowe liczniki przychodzą razem z powiadomieniem z outboxu
+    if created and not instance.is_read:
+        unread_counters.adjust(instance.user_id, 'notifications', 1, push=False)
+
+@receiver(post_delete, sender=Notification)
+def count_deleted_notification(sender, instance, **kwargs):
+    if not instance.is_read:
+        unread_counters.adjust(instance.user_id, 'notifications', -1)
+
+@receiver(post_delete, sender=Message)
+def count_deleted_message(sender, instance, **kwargs):
+    if instance.recipient_id:
+        unread_counters.invalidate(instance.recipient_id, 'messages')
+
+
+# Liczniki odwołań do plików w magazynie adresowanym treścią (court/blob_store.py)
+BLOB_FIELDS = {Document: 'file', Message: 'attachment'}
+
+@receiver(post_save, sender=Document)
+@receiver(post_save, sender=Message)
+def track_blob_references(sender, instance, created, **kwargs):
+    field = BLOB_FIELDS[sender]
+    if not instance.has_changed(field):
+        return
+    new_name = getattr(instance, field).name
+    if new_name:
+        size = instance.file_size if sender is Document else None
+        acquire_blob(new_name, size)
+    if not created:
+        release_blob(getattr(instance, '_loaded_values', {}).get(field))
+
+@receiver(post_delete, sender=Document)
+@receiver(post_delete, sender=Message)
+def release_blob_reference(sender, instance, **kwargs):
+    release_blob(getattr(instance, BLOB_FIELDS[sender]).name)
+
+
+# Podglądy dokumentów (court/document_previews.py) - generowane w tle po commit
+@receiver(post_save, sender=Document)
+def queue_document_previews(sender, instance, created, **kwargs):
+    if instance.has_changed('file') and instance.content_hash:
+        transaction.on_commit(lambda: submit_document(instance))
+
+@receiver(post_delete, sender=Document)
+def drop_document_previews(sender, instance, **kwargs):
+    content_hash = instance.content_hash
+    transaction.on_commit(lambda: remove_unused_previews(content_hash))
+
+
+# Indeks wyszukiwania (court/search.py) - w tej samej transakcji co zmiana danych
+SEARCH_FIELDS = {
+    Case: ('case_number', 'title', 'description'),
+    Document: ('title', 'description', 'file'),
+    Message: ('content',),
+}
+
+@receiver(post_save, sender=Case)
+@receiver(post_save, sender=CaseParty)
+@receiver(post_save, sender=Document)
+@receiver(post_save, sender=Message)
+def update_search_index(sender, instance, created, **kwargs):
+    fields = SEARCH_FIELDS.get(sender)
+    if created or not fields or any(instance.has_changed(field) for field in fields):
+        index_objects([instance])
+
+@receiver(post_delete, sender=Case)
+@receiver(post_delete, sender=CaseParty)
+@receiver(post_delete, sender=Document)
+@receiver(post_delete, sender=Message)
+def remove_from_search_index(sender, instance, **kwargs):
+    remove_objects(sender, [instance.pk])
@@ -0,0 +1,160 @@
+"""
+Liczniki nieprzeczytanych (powiadomienia i wiadomości prywatne) dla plakietek.
+
+Zamiast COUNT(*) przy każdym odświeżeniu nagłówka liczniki są trzymane
+w cache per użytkownik:
+- przy braku wpisu liczymy je z bazy (reconcile) i zapisujemy na
+  RECONCILE_INTERVAL sekund - po tym czasie wartość jest ponownie
+  uzgadniana z bazą, więc ewentualny dryf jest ograniczony w czasie,
+- sygnały (court/signals.py) i endpointy odczytu zmieniają je o delta
+  (adjust) albo unieważniają (invalidate) przez transaction.on_commit -
+  wycofana transakcja nie zmienia licznika. Zmiany rejestrujemy przed
+  enqueue_notifications, więc dispatcher budzony po commit zastaje
+  licznik już zmieniony,
+- aktualne (bezwzględne) wartości trafiają przez WebSocket do grupy
+  notifications_<id> (ramka unread_counts) dopiero po commit: z push()
+  przez transaction.on_commit albo razem z powiadomieniem z outboxu
+  (court/notification_outbox.py). Klient nie liczy sam - przyjmuje
+  tylko wartości z serwera.
+
+BACKEND 'local' to LRU w pamięci procesu; 'cache' używa cache Django
+(CACHE_ALIAS, np. Redis) wspólnego dla wszystkich workerów.
+"""
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+from court.auth_cache import LRUCache
+
+DEFAULTS = {
+    'BACKEND': 'local',
+    'CACHE_ALIAS': 'default',
+    'RECONCILE_INTERVAL': 300,
+    'MAX_USERS': 10000,
+}
+
+KINDS = ('notifications', 'messages')
+
+
+def get_unread_counter_settings():
+    conf = dict(DEFAULTS)
+    conf.update(getattr(settings, 'UNREAD_COUNTERS', {}))
+    return conf
+
+
+def count_unread(user_id, kind):
+    """Dokładna wartość licznika z bazy"""
+    from court.conversations import annotate_unread_counts, direct_rooms_for
+    from court.models import Notification, User
+
+    if kind == 'notifications':
+        # is_read__in - licznik z samego indeksu (user, is_read, sent_at), patrz notification_list
+        return Notification.objects.filter(user_id=user_id, is_read__in=[False]).count()
+    user = User(id=user_id)
+    rooms = annotate_unread_counts(direct_rooms_for(user), user)
+    return sum(rooms.values_list('unread_count', flat=True))
+
+
+class LocalCounterBackend:
+    def __init__(self, max_size, ttl):
+        self.cache = LRUCache(max_size * len(KINDS), ttl=ttl)
+
+    def get(self, key):
+        return self.cache.get(key)
+
+    def set(self, key, value):
+        self.cache.set(key, value)
+
+    def incr(self, key, delta):
+        self.cache.incr(key, delta)
+
+    def delete(self, key):
+        self.cache.invalidate(key)
+
+
+class DjangoCacheCounterBackend:
+    def __init__(self, alias, ttl):
+        self.cache = caches[alias]
+        self.ttl = ttl
+
+    def _key(self, key):
+        return 'unread:{}:{}'.format(*key)
+
+    def get(self, key):
+        return self.cache.get(self._key(key))
+
+    def set(self, key, value):
+        self.cache.set(self._key(key), value, self.ttl)
+
+    def incr(self, key, delta):
+        try:
+            self.cache.incr(self._key(key), delta)
+        except ValueError:
+            # Brak wpisu - zostanie policzony z bazy przy następnym odczycie
+            pass
+
+    def delete(self, key):
+        self.cache.delete(self._key(key))
+
+
+class UnreadCounters:
+    def __init__(self, backend):
+        self.backend = backend
+
+    @classmethod
+    def from_settings(cls):
+        conf = get_unread_counter_settings()
+        if conf['BACKEND'] == 'cache':
+            backend = DjangoCacheCounterBackend(conf['CACHE_ALIAS'], conf['RECONCILE_INTERVAL'])
+        else:
+            backend = LocalCounterBackend(conf['MAX_USERS'], conf['RECONCILE_INTERVAL'])
+        return cls(backend)
+
+    def get(self, user_id, kind):
+        value = self.backend.get((kind, user_id))
+        if value is None:
+            value = count_unread(user_id, kind)
+            self.backend.set((kind, user_id), value)
+        return max(value, 0)
+
+    def get_all(self, user_id):
+        return {kind: self.get(user_id, kind) for kind in KINDS}
+
+    def adjust(self, user_id, kind, delta, push=True):
+        def after_commit():
+            if delta:
+                self.backend.incr((kind, user_id), delta)
+            if push:
+                self.push(user_id)
+
+        # Poza transakcją on_commit wykonuje się od razu
+        transaction.on_commit(after_commit)
+
+    def invalidate(self, user_id, kind, push=True):
+        self.backend.delete((kind, user_id))
+
+        def after_commit():
+            # Odczyt w trakcie transakcji mógł zapisać w cache stan sprzed zmiany
+            self.backend.delete((kind, user_id))
+            if push:
+                self.push(user_id)
+
+        transaction.on_commit(after_commit)
+
+    def push(self, user_id):
+        """
+        Wysyła aktualne liczniki do otwartych połączeń użytkownika.
+        Wywoływać po commit (adjust/invalidate robią to przez on_commit).
+        """
+        try:
+            async_to_sync(get_channel_layer().group_send)(
+                f"notifications_{user_id}",
+                {'type': 'unread_counts', 'counts': self.get_all(user_id)}
+            )
+        except Exception as e:
+            print(f"❌ Błąd wysyłania liczników nieprzeczytanych: {e}")
+
+
+unread_counters = UnreadCounters.from_settings()
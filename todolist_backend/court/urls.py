@@ -1,12 +1,13 @@
 from django.urls import path
 from .views.role_views import role_list_create, role_detail_crud
-from .views import user_views, case_views, document_views, hearing_views, notification_views, CaseParticipant_views, auditLog_views, chatRoom_views
+from .views import user_views, case_views, document_views, hearing_views, notification_views, CaseParticipant_views, auditLog_views, chatRoom_views, upload_views, search_views
 
 urlpatterns = [
   
     # ========== AUTH & PROFILE ==========
     path('auth/me/', chatRoom_views.current_user, name='current-user'),
     path('auth/profile/', user_views.user_profile, name='user-profile'),
+    path('auth/ws-metrics/', user_views.websocket_auth_metrics, name='websocket-auth-metrics'),
     
     # Reset hasła (niezalogowany)
     path('auth/reset-password/', user_views.reset_password, name='reset-password'),
@@ -33,6 +34,14 @@ urlpatterns = [
     path('documents/<int:pk>/', document_views.document_detail, name='document-detail'),
     path('documents/<int:pk>/download/', document_views.document_download, name='document-download'),
     path('documents/<int:pk>/delete/', document_views.document_delete, name='document-delete'),
+    # Wyszukiwanie pełnotekstowe (sprawy, strony, dokumenty, wiadomości)
+    path('search/', search_views.search, name='search'),
+
+    # Wznawialne przesyłanie w kawałkach (dokumenty i załączniki czatu)
+    path('uploads/', upload_views.upload_session_create, name='upload-session-create'),
+    path('uploads/<uuid:pk>/', upload_views.upload_session_detail, name='upload-session-detail'),
+    path('uploads/<uuid:pk>/complete/', upload_views.upload_session_complete, name='upload-session-complete'),
+    path('cases/<int:case_id>/announce/', notification_views.case_announcement, name='case-announcement'),
     path('cases/<int:case_id>/documents/', document_views.case_documents, name='case-documents'),
     
     # Hearing endpoints
@@ -44,6 +53,8 @@ urlpatterns = [
     # Notificaton endpoints
     path('notifications/', notification_views.notification_list, name='notification-list'),
     path('notifications/unread-count/', notification_views.notification_unread_count, name='notification-unread-count'),
+    path('notifications/broadcast/', notification_views.role_announcement, name='notification-broadcast'),
+    path('notifications/outbox-stats/', notification_views.notification_outbox_stats, name='notification-outbox-stats'),
     path('notifications/<int:pk>/read/', notification_views.mark_notification_as_read, name='mark-notification-read'),
     path('notifications/read-all/', notification_views.mark_all_notifications_as_read, name='mark-all-notifications-read'),
     # NOWE: Endpoint usuwania
@@ -59,7 +70,9 @@ urlpatterns = [
     path('audit-logs/', auditLog_views.audit_log_list, name='audit-log-list'),
     path('audit-logs/object/<str:object_type>/<int:object_id>/', auditLog_views.audit_log_by_object, name='audit-log-by-object'),
     path('audit-logs/user/<int:user_id>/', auditLog_views.audit_log_by_user, name='audit-log-by-user'),
+    path('audit-logs/export/<str:export_format>/', auditLog_views.audit_log_export, name='audit-log-export'),
     path('audit-logs/statistics/', auditLog_views.audit_log_statistics, name='audit-log-statistics'),
+    path('audit-logs/writer-stats/', auditLog_views.audit_log_writer_stats, name='audit-log-writer-stats'),
     path('audit-logs/create/', auditLog_views.create_audit_log, name='create-audit-log'),
     
     # Komunikator
@@ -68,4 +81,9 @@ urlpatterns = [
     path('messages/<int:pk>/delete/', chatRoom_views.delete_private_message, name='delete-private-message'),
     path('messages/<int:pk>/read/', chatRoom_views.mark_private_message_as_read, name='mark-private-message-read'),
     path('messages/unread-count/', chatRoom_views.unread_message_count, name='unread-message-count'),
+    path('messages/inbox/', chatRoom_views.conversation_inbox, name='conversation-inbox'),
+    path('messages/read/', chatRoom_views.mark_conversation_as_read, name='mark-conversation-read'),
+    path('chat/rooms/', chatRoom_views.chat_rooms, name='chat-rooms'),
+    path('chat/rooms/<int:pk>/', chatRoom_views.chat_room_detail, name='chat-room-detail'),
+    path('chat/rooms/<int:pk>/messages/', chatRoom_views.room_messages, name='room-messages'),
 ]
\ No newline at end of file
@@ -1,27 +1,24 @@
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 from rest_framework import status
+from django.http import StreamingHttpResponse
 from django.utils import timezone
-from datetime import timedelta
-from court.models import AuditLog
+from django.utils.dateparse import parse_date, parse_datetime
+from datetime import datetime, time, timedelta
+import csv
+import json
+from court.audit import EXPORT_FIELDS, get_audit_writer, iter_audit_log_rows
+from court.audit_archive import get_archive_settings, load_archived_logs
+from court.models import AuditLog, AuditLogDailyStat
 from court.serializers import AuditLogSerializer
 
-@api_view(['GET'])
-def audit_log_list(request):
-    """Lista wszystkich wpisów audytu (tylko admini)"""
-    if not request.user.is_staff:
-        return Response(
-            {'error': 'Brak uprawnień'},
-            status=status.HTTP_403_FORBIDDEN
-        )
-    
-    logs = AuditLog.objects.all()
-    
-    # Filtry opcjonalne
-    user_id = request.query_params.get('user')
-    action = request.query_params.get('action')
-    object_type = request.query_params.get('object_type')
-    days = request.query_params.get('days', 30)  # Ostatnie 30 dni domyślnie
+
+def filter_audit_logs(logs, params):
+    """Filtry wspólne dla listy i eksportu: user, action, object_type, days"""
+    user_id = params.get('user')
+    action = params.get('action')
+    object_type = params.get('object_type')
+    days = params.get('days', 30)  # Ostatnie 30 dni domyślnie
     
     if user_id:
         logs = logs.filter(user_id=user_id)
@@ -37,14 +34,119 @@ def audit_log_list(request):
         logs = logs.filter(timestamp__gte=start_date)
     except ValueError:
         pass
+
+    return logs
+
+
+@api_view(['GET'])
+def audit_log_list(request):
+    """Lista wszystkich wpisów audytu (tylko admini)"""
+    if not request.user.is_staff:
+        return Response(
+            {'error': 'Brak uprawnień'},
+            status=status.HTTP_403_FORBIDDEN
+        )
     
+    logs = filter_audit_logs(AuditLog.objects.all(), request.query_params)
     serializer = AuditLogSerializer(logs, many=True)
     return Response(serializer.data)
 
 
+class _Echo:
+    """Pseudo-bufor dla csv.writer - zwraca zapisany wiersz zamiast go przechowywać"""
+    def write(self, value):
+        return value
+
+
+def _stream_ndjson(logs):
+    for row in iter_audit_log_rows(logs):
+        yield json.dumps(row, ensure_ascii=False) + '\n'
+
+
+def _stream_csv(logs):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(EXPORT_FIELDS)
+    for row in iter_audit_log_rows(logs):
+        yield writer.writerow([row[field] for field in EXPORT_FIELDS])
+
+
+@api_view(['GET'])
+def audit_log_export(request, export_format):
+    """
+    Strumieniowy eksport dziennika audytu (tylko admini).
+    export_format: 'ndjson' lub 'csv'. Filtry jak w audit_log_list.
+    """
+    if not request.user.is_staff:
+        return Response(
+            {'error': 'Brak uprawnień'},
+            status=status.HTTP_403_FORBIDDEN
+        )
+
+    if export_format == 'ndjson':
+        stream, content_type = _stream_ndjson, 'application/x-ndjson'
+    elif export_format == 'csv':
+        stream, content_type = _stream_csv, 'text/csv; charset=utf-8'
+    else:
+        return Response(
+            {'error': 'Nieobsługiwany format eksportu (dostępne: ndjson, csv)'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    logs = filter_audit_logs(AuditLog.objects.all(), request.query_params)
+    response = StreamingHttpResponse(stream(logs), content_type=content_type)
+    filename = f"audit_log_{timezone.now():%Y%m%d_%H%M%S}.{export_format}"
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+def parse_date_range(params):
+    """
+    ?date_from / ?date_to (RRRR-MM-DD) jako datetime; date_to obejmuje cały dzień,
+    więc zwracana granica jest wyłączna. Rzuca ValueError przy błędnym formacie.
+    """
+    bounds = []
+    for param, shift in (('date_from', 0), ('date_to', 1)):
+        value = params.get(param)
+        if not value:
+            bounds.append(None)
+            continue
+        parsed = parse_date(value)
+        if parsed is None:
+            raise ValueError(param)
+        bounds.append(timezone.make_aware(datetime.combine(parsed + timedelta(days=shift), time.min)))
+    return tuple(bounds)
+
+
+def _logs_with_archive(request, logs, **archive_filters):
+    """
+    Wpisy z tabeli AuditLog uzupełnione o pasujące wpisy z archiwum
+    (court/audit_archive.py), od najnowszych. Archiwum czytane jest zawsze,
+    gdy zakres (także otwarty) pokrywa się z plikami z indeksu; obie części
+    mają ten sam limit MAX_READ_ROWS, stosowany też do wyniku po scaleniu.
+    """
+    try:
+        date_from, date_to = parse_date_range(request.query_params)
+    except ValueError:
+        return Response(
+            {'error': 'Nieprawidłowy format daty (oczekiwano RRRR-MM-DD)'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    if date_from:
+        logs = logs.filter(timestamp__gte=date_from)
+    if date_to:
+        logs = logs.filter(timestamp__lt=date_to)
+
+    limit = get_archive_settings()['MAX_READ_ROWS']
+    data = list(AuditLogSerializer(logs.order_by('-timestamp', '-id')[:limit], many=True).data)
+    data += load_archived_logs(date_from=date_from, date_to=date_to, limit=limit, **archive_filters)
+    data.sort(key=lambda row: (parse_datetime(row['timestamp']), row['id']), reverse=True)
+    return Response(data[:limit])
+
+
 @api_view(['GET'])
 def audit_log_by_object(request, object_type, object_id):
-    """Historia zmian konkretnego obiektu"""
+    """Historia zmian konkretnego obiektu (opcjonalnie ?date_from=&date_to=)"""
     if not request.user.is_staff:
         return Response(
             {'error': 'Brak uprawnień'},
@@ -52,13 +154,12 @@ def audit_log_by_object(request, object_type, object_id):
         )
     
     logs = AuditLog.objects.filter(object_type=object_type, object_id=object_id)
-    serializer = AuditLogSerializer(logs, many=True)
-    return Response(serializer.data)
+    return _logs_with_archive(request, logs, object_type=object_type, object_id=object_id)
 
 
 @api_view(['GET'])
 def audit_log_by_user(request, user_id):
-    """Wszystkie akcje danego użytkownika"""
+    """Wszystkie akcje danego użytkownika (opcjonalnie ?date_from=&date_to=)"""
     if not request.user.is_staff and request.user.id != user_id:
         return Response(
             {'error': 'Brak uprawnień'},
@@ -66,31 +167,57 @@ def audit_log_by_user(request, user_id):
         )
     
     logs = AuditLog.objects.filter(user_id=user_id)
-    serializer = AuditLogSerializer(logs, many=True)
-    return Response(serializer.data)
+    return _logs_with_archive(request, logs, user_id=user_id)
 
 
 @api_view(['GET'])
 def audit_log_statistics(request):
-    """Statystyki audytu"""
+    """
+    Statystyki audytu liczone z dziennych liczników (AuditLogDailyStat).
+    Opcjonalny zakres: ?date_from=RRRR-MM-DD&date_to=RRRR-MM-DD
+    """
     if not request.user.is_staff:
         return Response(
             {'error': 'Brak uprawnień'},
             status=status.HTTP_403_FORBIDDEN
         )
     
-    from django.db.models import Count
-    
+    from django.db.models import Sum
+
+    stats_qs = AuditLogDailyStat.objects.all()
+    for param, lookup in (('date_from', 'date__gte'), ('date_to', 'date__lte')):
+        value = request.query_params.get(param)
+        if value:
+            parsed = parse_date(value)
+            if parsed is None:
+                return Response(
+                    {'error': 'Nieprawidłowy format daty (oczekiwano RRRR-MM-DD)'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            stats_qs = stats_qs.filter(**{lookup: parsed})
+
     stats = {
-        'total_logs': AuditLog.objects.count(),
-        'by_action': dict(AuditLog.objects.values('action').annotate(count=Count('id')).values_list('action', 'count')),
-        'by_object_type': dict(AuditLog.objects.values('object_type').annotate(count=Count('id')).values_list('object_type', 'count')),
-        'by_user': dict(AuditLog.objects.filter(user__isnull=False).values('user__username').annotate(count=Count('id')).values_list('user__username', 'count')),
+        'total_logs': stats_qs.aggregate(total=Sum('count'))['total'] or 0,
+        'by_action': dict(stats_qs.values('action').annotate(total=Sum('count')).values_list('action', 'total')),
+        'by_object_type': dict(stats_qs.values('object_type').annotate(total=Sum('count')).values_list('object_type', 'total')),
+        'by_user': dict(stats_qs.filter(user__isnull=False).values('user__username').annotate(total=Sum('count')).values_list('user__username', 'total')),
     }
     
     return Response(stats)
 
 
+@api_view(['GET'])
+def audit_log_writer_stats(request):
+    """Liczniki asynchronicznego zapisu audytu w bieżącym procesie"""
+    if not request.user.is_staff:
+        return Response(
+            {'error': 'Brak uprawnień'},
+            status=status.HTTP_403_FORBIDDEN
+        )
+
+    return Response(get_audit_writer().get_stats())
+
+
 @api_view(['POST'])
 def create_audit_log(request):
     """Ręczne dodanie wpisu audytu (dla testów)"""
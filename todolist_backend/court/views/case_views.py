@@ -2,18 +2,65 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework import status
+from django.utils.dateparse import parse_date
 from court.models import Case
 from court.serializers import CaseSerializer
+from court.pagination import InvalidCursor, get_page_size, paginate_keyset
+
+
+def filter_cases(queryset, params):
+    """
+    Filtry listy spraw: status, category, assigned_judge,
+    filing_date_from / filing_date_to (RRRR-MM-DD).
+    Rzuca ValueError (z nazwą parametru) przy błędnym id sędziego lub formacie daty.
+    """
+    if params.get('status'):
+        queryset = queryset.filter(status=params['status'])
+    if params.get('category'):
+        queryset = queryset.filter(category=params['category'])
+    if params.get('assigned_judge'):
+        if not params['assigned_judge'].isdigit():
+            raise ValueError('assigned_judge')
+        queryset = queryset.filter(assigned_judge_id=params['assigned_judge'])
+
+    for param, lookup in (('filing_date_from', 'filing_date__gte'), ('filing_date_to', 'filing_date__lte')):
+        if params.get(param):
+            value = parse_date(params[param])
+            if value is None:
+                raise ValueError(param)
+            queryset = queryset.filter(**{lookup: value})
+    return queryset
+
 
 @api_view(['GET', 'POST'])
 @permission_classes([IsAuthenticated])
 def case_list_create(request):
     """
-    GET: Pobierz wszystkie sprawy
+    GET: Pobierz sprawy (opcjonalnie filtrowane).
+         Z parametrem ?cursor= lub ?page_size= zwraca stronę
+         {'results': [...], 'next_cursor': ...} uporządkowaną wg (created_at, id).
     POST: Utwórz nową sprawę
     """
     if request.method == 'GET':
-        cases = Case.objects.all()
+        # Relacje używane przez CaseSerializer ładujemy z góry (bez N+1)
+        cases = Case.objects.select_related('creator', 'assigned_judge').prefetch_related('parties')
+        try:
+            cases = filter_cases(cases, request.query_params)
+        except ValueError as e:
+            if str(e) == 'assigned_judge':
+                return Response({'error': 'Nieprawidłowy identyfikator sędziego'}, status=status.HTTP_400_BAD_REQUEST)
+            return Response({'error': 'Nieprawidłowy format daty (oczekiwano RRRR-MM-DD)'}, status=status.HTTP_400_BAD_REQUEST)
+
+        if 'cursor' in request.query_params or 'page_size' in request.query_params:
+            try:
+                page, next_cursor = paginate_keyset(
+                    cases, request.query_params.get('cursor'), get_page_size(request)
+                )
+            except InvalidCursor:
+                return Response({'error': 'Nieprawidłowy kursor'}, status=status.HTTP_400_BAD_REQUEST)
+            serializer = CaseSerializer(page, many=True)
+            return Response({'results': serializer.data, 'next_cursor': next_cursor})
+
         serializer = CaseSerializer(cases, many=True)
         return Response(serializer.data)
 
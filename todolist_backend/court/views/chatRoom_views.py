@@ -7,7 +7,17 @@ from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
 from court.models import Message, ChatRoom
 from court.serializers import MessageSerializer, ChatRoomSerializer
 from court.models import User
-from django.db.models import Q
+from court.conversations import (
+    annotate_room_summaries,
+    chat_group_name,
+    direct_rooms_for,
+    get_direct_room_id,
+    last_message_summary,
+    mark_conversation_read,
+)
+from court.pagination import InvalidCursor, cursor_for, get_page_size, paginate_window
+from court.presence import presence_registry
+from court.unread_counters import unread_counters
 from channels.layers import get_channel_layer
 from asgiref.sync import async_to_sync
 
@@ -25,28 +35,47 @@ def current_user(request):
 @api_view(['GET', 'POST'])
 @permission_classes([IsAuthenticated])
 def chat_rooms(request):
-    """Pobierz wszystkie pokoje lub utwórz nowy"""
+    """Pobierz pokoje użytkownika (bez wiadomości) lub utwórz nowy"""
     if request.method == 'GET':
-        rooms = ChatRoom.objects.all()
+        # Tylko pokoje, w których użytkownik uczestniczy; wiadomości są w room_messages
+        rooms = annotate_room_summaries(
+            ChatRoom.objects.filter(participants=request.user), request.user
+        ).order_by('-created_at')
         serializer = ChatRoomSerializer(rooms, many=True)
         return Response(serializer.data)
     
     elif request.method == 'POST':
         serializer = ChatRoomSerializer(data=request.data)
         if serializer.is_valid():
-            serializer.save()
+            room = serializer.save()
+            room.participants.add(request.user)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+def get_user_room(request, pk, annotate=False):
+    """Pokój, w którym uczestniczy użytkownik (None, jeśli nie istnieje lub brak dostępu)"""
+    rooms = ChatRoom.objects.filter(participants=request.user)
+    if annotate:
+        rooms = annotate_room_summaries(rooms, request.user)
+    return rooms.filter(pk=pk).first()
+
+
 @api_view(['GET', 'PUT', 'DELETE'])
 @permission_classes([IsAuthenticated])
 def chat_room_detail(request, pk):
-    """Szczegóły pokoju, edycja lub usunięcie"""
-    try:
-        room = ChatRoom.objects.get(pk=pk)
-    except ChatRoom.DoesNotExist:
+    """Szczegóły pokoju, edycja lub usunięcie (rozmowy DM tylko do odczytu)"""
+    room = get_user_room(request, pk, annotate=request.method == 'GET')
+    if room is None:
         return Response({'error': 'Pokój nie istnieje'}, status=status.HTTP_404_NOT_FOUND)
+
+    # Pokój DM jest kanoniczną rozmową pary (court/conversations.py) - usunięcie
+    # skasowałoby historię obu stron, a zmiana nazwy dotyczyłaby też rozmówcy
+    if room.is_direct and request.method != 'GET':
+        return Response(
+            {'error': 'Rozmowy prywatnej nie można edytować ani usunąć'},
+            status=status.HTTP_403_FORBIDDEN
+        )
     
     if request.method == 'GET':
         serializer = ChatRoomSerializer(room)
@@ -69,18 +98,44 @@ def chat_room_detail(request, pk):
 # ✅ DODAJEMY OBSŁUGĘ PLIKÓW DLA POKOI TEŻ (na przyszłość)
 @parser_classes([MultiPartParser, FormParser, JSONParser]) 
 def room_messages(request, pk):
-    """Pobierz wiadomości z pokoju lub wyślij nową"""
-    try:
-        room = ChatRoom.objects.get(pk=pk)
-    except ChatRoom.DoesNotExist:
+    """Pobierz wiadomości z pokoju (stronicowane jak messages/) lub wyślij nową"""
+    room = get_user_room(request, pk)
+    if room is None:
         return Response({'error': 'Pokój nie istnieje'}, status=status.HTTP_404_NOT_FOUND)
     
     if request.method == 'GET':
-        messages = room.messages.all()
-        serializer = MessageSerializer(messages, many=True)
-        return Response(serializer.data)
+        before = request.query_params.get('before')
+        after = request.query_params.get('after')
+        if before and after:
+            return Response(
+                {'error': 'Podaj tylko jeden z parametrów: before lub after'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            page, has_more = paginate_window(
+                [room.messages.select_related('sender', 'recipient')],
+                get_page_size(request),
+                before=before,
+                after=after,
+            )
+        except InvalidCursor:
+            return Response({'error': 'Nieprawidłowy kursor'}, status=status.HTTP_400_BAD_REQUEST)
+
+        serializer = MessageSerializer(page, many=True, context={'request': request})
+        return Response({
+            'results': serializer.data,
+            'before': cursor_for(page[0]) if page else before,
+            'after': cursor_for(page[-1]) if page else after,
+            'has_more': has_more,
+        })
     
     elif request.method == 'POST':
+        if room.is_direct:
+            # Wiadomości DM mają odbiorcę - wysyłka przez private_messages / WebSocket
+            return Response(
+                {'error': 'Wiadomości prywatne wysyłaj przez messages/'},
+                status=status.HTTP_403_FORBIDDEN
+            )
         data = request.data.copy()
         data['room'] = pk
         
@@ -123,21 +178,6 @@ def message_detail(request, pk):
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
-@api_view(['POST'])
-@permission_classes([IsAuthenticated])
-def mark_as_read(request, pk):
-    """Oznacz wiadomość jako przeczytaną"""
-    try:
-        message = Message.objects.get(pk=pk)
-    except Message.DoesNotExist:
-        return Response({'error': 'Wiadomość nie istnieje'}, status=status.HTTP_404_NOT_FOUND)
-    
-    message.is_read = True
-    message.save()
-    serializer = MessageSerializer(message)
-    return Response(serializer.data)
-
-
 @api_view(['GET', 'POST'])
 @permission_classes([IsAuthenticated])
 # ✅ KLUCZOWA ZMIANA: Obsługa multipart/form-data
@@ -162,14 +202,36 @@ def private_messages(request):
                 status=status.HTTP_404_NOT_FOUND
             )
         
-        messages = Message.objects.filter(
-            Q(sender=request.user, recipient=recipient) |
-            Q(sender=recipient, recipient=request.user),
-            room__isnull=True 
-        ).order_by('created_at')
-        
-        serializer = MessageSerializer(messages, many=True, context={'request': request})
-        return Response(serializer.data)
+        # Domyślnie najnowsze wiadomości; starsze przez ?before=, nowsze przez ?after=
+        before = request.query_params.get('before')
+        after = request.query_params.get('after')
+        if before and after:
+            return Response(
+                {'error': 'Podaj tylko jeden z parametrów: before lub after'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        # Historia to zakres indeksu (room, created_at) kanonicznej rozmowy DM
+        room_id = get_direct_room_id(request.user.id, recipient.id, create=False)
+        messages = Message.objects.filter(room_id=room_id).select_related('sender', 'recipient')
+        try:
+            page, has_more = paginate_window(
+                [messages] if room_id else [],
+                get_page_size(request),
+                before=before,
+                after=after,
+            )
+        except InvalidCursor:
+            return Response({'error': 'Nieprawidłowy kursor'}, status=status.HTTP_400_BAD_REQUEST)
+
+        serializer = MessageSerializer(page, many=True, context={'request': request})
+        return Response({
+            'results': serializer.data,
+            # Kursory granic strony: before -> starsze, after -> nowsze
+            'before': cursor_for(page[0]) if page else before,
+            'after': cursor_for(page[-1]) if page else after,
+            'has_more': has_more,
+        })
     
     elif request.method == 'POST':
         # Przygotowujemy dane (kopiujemy, bo request.data może być niemutowalne)
@@ -197,7 +259,10 @@ def private_messages(request):
 
             # Zapisujemy wiadomość, wymuszając nadawcę (request.user)
             # Serializer automatycznie obsłuży plik z 'attachment'
-            message = serializer.save(sender=request.user, room=None)
+            message = serializer.save(
+                sender=request.user,
+                room_id=get_direct_room_id(request.user.id, recipient.id)
+            )
             
             # WebSocket Trigger
             channel_layer = get_channel_layer()
@@ -221,7 +286,7 @@ def private_messages(request):
 @permission_classes([IsAuthenticated])
 def private_message_detail(request, pk):
     try:
-        message = Message.objects.get(pk=pk, room__isnull=True)
+        message = Message.objects.get(pk=pk, recipient__isnull=False)
     except Message.DoesNotExist:
         return Response({'error': 'Wiadomość nie istnieje'}, status=status.HTTP_404_NOT_FOUND)
     
@@ -232,7 +297,7 @@ def private_message_detail(request, pk):
 @permission_classes([IsAuthenticated])
 def delete_private_message(request, pk):
     try:
-        message = Message.objects.get(pk=pk, room__isnull=True)
+        message = Message.objects.get(pk=pk, recipient__isnull=False)
     except Message.DoesNotExist:
         return Response({'error': 'Wiadomość nie istnieje'}, status=status.HTTP_404_NOT_FOUND)
     
@@ -254,26 +319,109 @@ def delete_private_message(request, pk):
 @permission_classes([IsAuthenticated])
 def mark_private_message_as_read(request, pk):
     try:
-        message = Message.objects.get(pk=pk, room__isnull=True)
+        message = Message.objects.get(pk=pk, recipient__isnull=False)
     except Message.DoesNotExist:
         return Response({'error': 'Wiadomość nie istnieje'}, status=status.HTTP_404_NOT_FOUND)
     
     if message.recipient != request.user:
         return Response({'error': 'Tylko odbiorca może oznaczyć wiadomość jako przeczytaną'}, status=status.HTTP_403_FORBIDDEN)
+
+    if message.room_id is None:
+        # Dawne wiadomości do samego siebie nie należą do żadnej rozmowy DM
+        return Response({'error': 'Wiadomość nie należy do rozmowy'}, status=status.HTTP_400_BAD_REQUEST)
     
-    message.is_read = True
-    message.save()
+    # Przesuwa znacznik rozmowy - wcześniejsze wiadomości też stają się przeczytane
+    state, advanced = mark_conversation_read(request.user.id, message.room_id, message.id)
+    if advanced:
+        send_read_receipt(request.user, message.sender_id, state)
+    message.refresh_from_db()
     
     serializer = MessageSerializer(message)
     return Response(serializer.data)
 
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def mark_conversation_as_read(request):
+    """
+    Oznacza rozmowę z recipient_id jako przeczytaną - do najnowszej wiadomości
+    albo do message_id. Jedno żądanie zamiast osobnego na każdą wiadomość.
+    """
+    recipient_id = request.data.get('recipient_id')
+    message_id = request.data.get('message_id')
+    try:
+        recipient_id = int(recipient_id)
+        message_id = int(message_id) if message_id is not None else None
+    except (TypeError, ValueError):
+        return Response({'error': 'Podaj poprawne recipient_id (i opcjonalnie message_id)'}, status=status.HTTP_400_BAD_REQUEST)
+
+    room_id = get_direct_room_id(request.user.id, recipient_id, create=False)
+    if room_id is None:
+        return Response({'error': 'Rozmowa nie istnieje'}, status=status.HTTP_404_NOT_FOUND)
+
+    state, advanced = mark_conversation_read(request.user.id, room_id, message_id)
+    if advanced:
+        send_read_receipt(request.user, recipient_id, state)
+
+    return Response({
+        'room_id': room_id,
+        'last_read_message_id': state.last_read_message_id,
+        'last_read_at': state.last_read_at,
+    })
+
+
+def send_read_receipt(reader, partner_id, state):
+    """Powiadamia otwarte okna czatu, że reader przeczytał wiadomości do znacznika"""
+    try:
+        async_to_sync(get_channel_layer().group_send)(
+            chat_group_name(reader.id, partner_id),
+            {
+                'type': 'messages_read_event',
+                'reader_id': reader.id,
+                'last_read_message_id': state.last_read_message_id,
+            }
+        )
+    except Exception as e:
+        print(f"❌ Błąd wysyłania potwierdzenia odczytu: {e}")
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def unread_message_count(request):
-    unread_count = Message.objects.filter(
-        recipient=request.user,
-        is_read=False,
-        room__isnull=True
-    ).count()
+    # Licznik z cache (court/unread_counters.py), uzgadniany z bazą okresowo
+    unread_count = unread_counters.get(request.user.id, 'messages')
     
-    return Response({'unread_count': unread_count})
\ No newline at end of file
+    return Response({'unread_count': unread_count})
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def conversation_inbox(request):
+    """
+    Lista rozmów prywatnych użytkownika: rozmówca, ostatnia wiadomość
+    i liczba nieprzeczytanych - jednym zapytaniem. Ostatnia wiadomość to
+    podzapytania po indeksie (room, created_at), nieprzeczytane - agregat
+    od znacznika przeczytania (ConversationReadState).
+    """
+    user = request.user
+    rooms = (
+        annotate_room_summaries(direct_rooms_for(user), user)
+        .filter(last_message_id__isnull=False)
+        .select_related('user_a', 'user_b')
+        .order_by('-last_message_at')
+    )
+
+    inbox = []
+    for room in rooms:
+        partner = room.user_b if room.user_a_id == user.id else room.user_a
+        inbox.append({
+            'room_id': room.id,
+            'user': {
+                'id': partner.id,
+                'username': partner.username,
+                'first_name': partner.first_name,
+                'last_name': partner.last_name,
+                'is_online': presence_registry.is_online(partner.id, default=partner.is_online) and partner.is_visible,
+            },
+            'last_message': last_message_summary(room),
+            'unread_count': room.unread_count,
+        })
+    return Response(inbox)
@@ -2,10 +2,10 @@ from rest_framework.decorators import api_view, parser_classes
 from rest_framework.parsers import MultiPartParser, FormParser
 from rest_framework.response import Response
 from rest_framework import status
-from django.http import FileResponse
 from django.shortcuts import get_object_or_404
 from court.models import Document
 from court.serializers import DocumentSerializer
+from court.file_delivery import file_sha256, serve_file
 
 
 @api_view(['GET', 'POST'])
@@ -48,14 +48,24 @@ def document_detail(request, pk):
 @api_view(['GET'])
 def document_download(request, pk):
     """
-    GET - pobieranie pliku dokumentu
+    GET - pobieranie pliku dokumentu (Range, ETag, 304, opcjonalnie X-Sendfile)
     """
     document = get_object_or_404(Document, pk=pk)
     
     try:
-        response = FileResponse(document.file.open('rb'), as_attachment=True)
-        response['Content-Disposition'] = f'attachment; filename="{document.file.name.split("/")[-1]}"'
-        return response
+        if not document.content_hash:
+            # Dokumenty sprzed wprowadzenia sum - liczymy raz i zapisujemy
+            document.content_hash = file_sha256(document.file.open('rb'))
+            document.file.close()
+            Document.objects.filter(pk=document.pk).update(content_hash=document.content_hash)
+        return serve_file(
+            request,
+            document.file,
+            document.download_name,
+            etag_value=document.content_hash,
+            last_modified=document.uploaded_at,
+            size=document.file_size,
+        )
     except Exception as e:
         return Response(
             {"error": f"Błąd podczas pobierania pliku: {str(e)}"},
@@ -76,9 +86,10 @@ def document_delete(request, pk):
             status=status.HTTP_404_NOT_FOUND
         )
     
-    # Usuń plik z dysku
-    if document.file:
-        document.file.delete()
+    # Pliki z magazynu blobów usuwa sygnał po zwolnieniu ostatniego odwołania,
+    # tu tylko pliki sprzed wprowadzenia magazynu (przed `deduplicate_files`)
+    if document.file and not document.file.storage.is_blob(document.file.name):
+        document.file.delete(save=False)
     
     document.delete()
     return Response(
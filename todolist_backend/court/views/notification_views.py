@@ -1,21 +1,68 @@
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 from rest_framework import status
-from court.models import Notification
+from court.models import Case, Notification, Role
+from court.notification_fanout import case_recipients, fan_out_notification, role_recipients
 from court.serializers import NotificationSerializer
+from court.notification_outbox import notification_outbox
+from court.pagination import InvalidCursor, get_page_size, paginate_keyset
+from court.unread_counters import unread_counters
 from django.utils import timezone
 
+def filter_notifications(queryset, params):
+    """
+    Filtry listy powiadomień: is_read (true/false), notification_type, case.
+    Rzuca ValueError przy błędnej wartości.
+    """
+    if params.get('is_read') is not None:
+        value = params['is_read'].lower()
+        if value not in ('true', 'false', '1', '0'):
+            raise ValueError('is_read')
+        # `IN (x)` zamiast `NOT is_read` - SQLite dopasowuje wtedy indeks (user, is_read, sent_at)
+        queryset = queryset.filter(is_read__in=[value in ('true', '1')])
+    if params.get('notification_type'):
+        queryset = queryset.filter(notification_type=params['notification_type'])
+    if params.get('case'):
+        if not params['case'].isdigit():
+            raise ValueError('case')
+        queryset = queryset.filter(case_id=params['case'])
+    return queryset
+
+
 @api_view(['GET'])
 def notification_list(request):
-    """Lista powiadomień zalogowanego użytkownika"""
-    notifications = Notification.objects.filter(user=request.user).order_by('-sent_at')
-    serializer = NotificationSerializer(notifications, many=True)
+    """
+    Lista powiadomień zalogowanego użytkownika (najnowsze pierwsze).
+    Z ?cursor= lub ?page_size= zwraca stronę {results, next_cursor} -
+    zakres indeksu (user, -sent_at) lub (user, is_read, -sent_at) przy is_read.
+    """
+    try:
+        notifications = filter_notifications(
+            Notification.objects.filter(user=request.user), request.query_params
+        )
+    except ValueError as e:
+        return Response({'error': f'Nieprawidłowy parametr: {e}'}, status=status.HTTP_400_BAD_REQUEST)
+    # Nazwy użytkowników i numer sprawy dla serializera - bez zapytania na wiersz
+    notifications = notifications.select_related('user', 'sender', 'case')
+
+    if 'cursor' in request.query_params or 'page_size' in request.query_params:
+        try:
+            page, next_cursor = paginate_keyset(
+                notifications, request.query_params.get('cursor'), get_page_size(request),
+                field='sent_at', descending=True,
+            )
+        except InvalidCursor:
+            return Response({'error': 'Nieprawidłowy kursor'}, status=status.HTTP_400_BAD_REQUEST)
+        serializer = NotificationSerializer(page, many=True)
+        return Response({'results': serializer.data, 'next_cursor': next_cursor})
+
+    serializer = NotificationSerializer(notifications.order_by('-sent_at', '-id'), many=True)
     return Response(serializer.data)
 
 @api_view(['GET'])
 def notification_unread_count(request):
     """Liczba nieprzeczytanych powiadomień"""
-    count = Notification.objects.filter(user=request.user, is_read=False).count()
+    count = unread_counters.get(request.user.id, 'notifications')
     return Response({'unread_count': count})
 
 @api_view(['PUT'])
@@ -23,7 +70,10 @@ def mark_notification_as_read(request, pk):
     """Oznacz powiadomienie jako przeczytane"""
     try:
         notification = Notification.objects.get(pk=pk, user=request.user)
+        was_unread = not notification.is_read
         notification.mark_as_read()
+        if was_unread:
+            unread_counters.adjust(request.user.id, 'notifications', -1)
         serializer = NotificationSerializer(notification)
         return Response(serializer.data, status=status.HTTP_200_OK)
     except Notification.DoesNotExist:
@@ -37,6 +87,7 @@ def mark_all_notifications_as_read(request):
     """Oznacz wszystkie powiadomienia jako przeczytane"""
     notifications = Notification.objects.filter(user=request.user, is_read=False)
     count = notifications.update(is_read=True, read_at=timezone.now())
+    unread_counters.invalidate(request.user.id, 'notifications')
     return Response({'marked_as_read': count}, status=status.HTTP_200_OK)
 
 @api_view(['DELETE'])
@@ -50,4 +101,78 @@ def notification_delete(request, pk):
         return Response(
             {'error': 'Powiadomienie nie znalezione'},
             status=status.HTTP_404_NOT_FOUND
-        )
\ No newline at end of file
+        )
+
+@api_view(['GET'])
+def notification_outbox_stats(request):
+    """Stan kolejki powiadomień WebSocket i opóźnienie wysyłki w bieżącym procesie"""
+    if not request.user.is_staff:
+        return Response(
+            {'error': 'Brak uprawnień'},
+            status=status.HTTP_403_FORBIDDEN
+        )
+
+    return Response(notification_outbox.get_stats())
+
+
+def announcement_fields(data):
+    """(title, message) z żądania albo None, gdy brakuje treści"""
+    title = (data.get('title') or 'Komunikat').strip()[:200]
+    message = (data.get('message') or '').strip()
+    if not message:
+        return None
+    return title, message
+
+
+@api_view(['POST'])
+def case_announcement(request, case_id):
+    """Komunikat do wszystkich aktywnych uczestników sprawy (opcjonalnie tylko wybranych ról)"""
+    try:
+        case = Case.objects.get(pk=case_id)
+    except Case.DoesNotExist:
+        return Response({'error': 'Sprawa nie istnieje'}, status=status.HTTP_404_NOT_FOUND)
+
+    if not (request.user.is_staff or request.user.id in (case.creator_id, case.assigned_judge_id)):
+        return Response({'error': 'Brak uprawnień'}, status=status.HTTP_403_FORBIDDEN)
+
+    fields = announcement_fields(request.data)
+    if fields is None:
+        return Response({'error': 'Treść komunikatu jest wymagana'}, status=status.HTTP_400_BAD_REQUEST)
+
+    roles = request.data.get('roles') or None
+    if roles is not None and not isinstance(roles, list):
+        return Response({'error': 'roles musi być listą'}, status=status.HTTP_400_BAD_REQUEST)
+
+    count = fan_out_notification(
+        case_recipients(case, roles=roles),
+        *fields,
+        notification_type='case_updated',
+        case=case,
+        sender=request.user,
+        exclude=[request.user.id],
+    )
+    return Response({'recipients': count}, status=status.HTTP_201_CREATED)
+
+
+@api_view(['POST'])
+def role_announcement(request):
+    """Komunikat do wszystkich aktywnych użytkowników z daną rolą (tylko administracja)"""
+    if not request.user.is_staff:
+        return Response({'error': 'Brak uprawnień'}, status=status.HTTP_403_FORBIDDEN)
+
+    try:
+        role = Role.objects.get(pk=request.data.get('role_id'))
+    except (Role.DoesNotExist, ValueError, TypeError):
+        return Response({'error': 'Rola nie istnieje'}, status=status.HTTP_404_NOT_FOUND)
+
+    fields = announcement_fields(request.data)
+    if fields is None:
+        return Response({'error': 'Treść komunikatu jest wymagana'}, status=status.HTTP_400_BAD_REQUEST)
+
+    count = fan_out_notification(
+        role_recipients(role),
+        *fields,
+        sender=request.user,
+        exclude=[request.user.id],
+    )
+    return Response({'recipients': count}, status=status.HTTP_201_CREATED)
@@ -0,0 +1,46 @@
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework import status
+from court.pagination import InvalidCursor, get_page_size
+from court.search import KINDS, get_search_backend
+
+MIN_QUERY_LENGTH = 2
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def search(request):
+    """
+    GET ?q=... - wyszukiwanie w sprawach, stronach, dokumentach i wiadomościach.
+    Opcjonalnie ?type=case,party,document,message, ?page_size=, ?cursor=.
+    Wyniki wg trafności, tylko sprawy i rozmowy dostępne dla użytkownika.
+    """
+    query = (request.query_params.get('q') or '').strip()
+    if len(query) < MIN_QUERY_LENGTH:
+        return Response(
+            {'error': f'Zapytanie musi mieć co najmniej {MIN_QUERY_LENGTH} znaki'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    kinds = None
+    if request.query_params.get('type'):
+        kinds = [kind.strip() for kind in request.query_params['type'].split(',') if kind.strip()]
+        unknown = set(kinds) - set(KINDS)
+        if unknown:
+            return Response(
+                {'error': f"Nieznany typ: {', '.join(sorted(unknown))} (dozwolone: {', '.join(KINDS)})"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+    try:
+        results, next_cursor = get_search_backend().search(
+            query,
+            user=request.user,
+            kinds=kinds,
+            cursor=request.query_params.get('cursor'),
+            limit=get_page_size(request, default=20, maximum=100),
+        )
+    except InvalidCursor:
+        return Response({'error': 'Nieprawidłowy kursor'}, status=status.HTTP_400_BAD_REQUEST)
+    return Response({'results': results, 'next_cursor': next_cursor})
@@ -0,0 +1,145 @@
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework import status
+from django.shortcuts import get_object_or_404
+from channels.layers import get_channel_layer
+from asgiref.sync import async_to_sync
+from court.models import Case, Document, Message, UploadSession, User
+from court.serializers import DocumentSerializer, MessageSerializer
+from court.conversations import chat_group_name, get_direct_room_id
+from court.chunked_uploads import (
+    UploadError,
+    create_session,
+    discard_session,
+    finalize_session,
+    session_status,
+    write_chunk,
+)
+
+
+def upload_error(error):
+    return Response({'error': error.message}, status=error.status_code)
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def upload_session_create(request):
+    """
+    POST - nowa sesja przesyłania w kawałkach
+    {filename, size, purpose: document|attachment, checksum?, chunk_size?}
+    """
+    try:
+        session = create_session(
+            request.user,
+            request.data.get('purpose'),
+            request.data.get('filename'),
+            request.data.get('size'),
+            checksum=request.data.get('checksum', ''),
+            chunk_size=request.data.get('chunk_size'),
+        )
+    except UploadError as e:
+        return upload_error(e)
+    return Response(session_status(session), status=status.HTTP_201_CREATED)
+
+
+@api_view(['GET', 'PUT', 'DELETE'])
+@permission_classes([IsAuthenticated])
+def upload_session_detail(request, pk):
+    """
+    GET - stan sesji (brakujące offsety do wznowienia)
+    PUT - kawałek: surowe bajty + Content-Range: bytes start-koniec/rozmiar
+          (opcjonalnie X-Chunk-SHA256)
+    DELETE - przerwanie przesyłania
+    """
+    session = get_object_or_404(UploadSession, pk=pk, user=request.user)
+
+    if request.method == 'GET':
+        return Response(session_status(session))
+
+    if request.method == 'DELETE':
+        if session.status == 'finalizing':
+            return Response({'error': 'Sesja jest właśnie zatwierdzana'}, status=status.HTTP_409_CONFLICT)
+        discard_session(session)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    content_range = request.META.get('HTTP_CONTENT_RANGE')
+    if not content_range:
+        return Response({'error': 'Brak nagłówka Content-Range'}, status=status.HTTP_400_BAD_REQUEST)
+    # Treść czytamy strumieniowo z żądania - bez parserów DRF i bez request.body
+    stream = request.stream
+    if stream is None:
+        return Response({'error': 'Pusty kawałek'}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        offset, size = write_chunk(session, content_range, stream, request.META.get('HTTP_X_CHUNK_SHA256'))
+    except UploadError as e:
+        return upload_error(e)
+    return Response({'offset': offset, 'size': size})
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def upload_session_complete(request, pk):
+    """
+    POST - zatwierdzenie przesyłania, tworzy dokument albo wiadomość
+    document: {checksum?, title, description?, case}
+    attachment: {checksum?, recipient_id, content?}
+    """
+    session = get_object_or_404(UploadSession, pk=pk, user=request.user)
+    data = request.data
+
+    if session.purpose == 'document':
+        if not data.get('title'):
+            return Response({'error': 'Podaj tytuł dokumentu'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            case = Case.objects.get(pk=data.get('case'))
+        except (Case.DoesNotExist, ValueError, TypeError):
+            return Response({'error': 'Sprawa nie istnieje'}, status=status.HTTP_404_NOT_FOUND)
+
+        def materialize(blob_name, sha256):
+            return Document.objects.create(
+                title=data['title'],
+                description=data.get('description', ''),
+                case=case,
+                uploaded_by=request.user,
+                file=blob_name,
+                original_name=session.filename,
+                file_size=session.total_size,
+                content_hash=sha256,
+            )
+    else:
+        try:
+            recipient = User.objects.get(pk=data.get('recipient_id'))
+        except (User.DoesNotExist, ValueError, TypeError):
+            return Response({'error': 'Użytkownik nie istnieje'}, status=status.HTTP_404_NOT_FOUND)
+        if recipient == request.user:
+            return Response({'error': 'Nie możesz wysłać wiadomości do siebie'}, status=status.HTTP_400_BAD_REQUEST)
+
+        def materialize(blob_name, sha256):
+            return Message.objects.create(
+                sender=request.user,
+                recipient=recipient,
+                content=data.get('content', ''),
+                attachment=blob_name,
+                attachment_name=session.filename,
+                room_id=get_direct_room_id(request.user.id, recipient.id),
+            )
+
+    try:
+        result = finalize_session(session, data.get('checksum'), materialize)
+    except UploadError as e:
+        return upload_error(e)
+
+    if session.purpose == 'document':
+        serializer = DocumentSerializer(result, context={'request': request})
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+    serializer = MessageSerializer(result, context={'request': request})
+    async_to_sync(get_channel_layer().group_send)(
+        chat_group_name(request.user.id, recipient.id),
+        {
+            'type': 'chat_message_event',
+            'message': serializer.data
+        }
+    )
+    return Response(serializer.data, status=status.HTTP_201_CREATED)
@@ -5,6 +5,7 @@ from rest_framework import status
 from court.models import User
 from court.serializers import UserSerializer, UserUpdateSerializer, CustomTokenObtainPairSerializer, PasswordResetSerializer, ChangePasswordSerializer
 from rest_framework_simplejwt.views import TokenObtainPairView
+from court.auth_cache import get_auth_cache_stats
 
 # --- 1. LOGOWANIE ---
 class CustomTokenObtainPairView(TokenObtainPairView):
@@ -172,4 +173,12 @@ def user_profile(request):
         'is_active': user.is_active,
         'is_staff': user.is_staff,
         'role': user.role.name if hasattr(user, 'role') and user.role else None,
-    }, status=status.HTTP_200_OK)
\ No newline at end of file
+    }, status=status.HTTP_200_OK)
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def websocket_auth_metrics(request):
+    """Trafienia w cache autoryzacji WebSocket i czas handshake (tylko admini)"""
+    if not request.user.is_staff:
+        return Response({'error': 'Brak uprawnień'}, status=status.HTTP_403_FORBIDDEN)
+    return Response(get_auth_cache_stats(), status=status.HTTP_200_OK)
@@ -10,8 +10,10 @@ from channels.routing import ProtocolTypeRouter, URLRouter
 from court.routing import websocket_urlpatterns
 # Importujemy zaktualizowane middleware
 from court.middleware import JwtAuthMiddleware 
+from court.notification_outbox import OutboxDispatcherMiddleware
 
-application = ProtocolTypeRouter({
+# Dispatcher outboxu powiadomień startuje razem z serwerem, nie z pierwszym WebSocketem
+application = OutboxDispatcherMiddleware(ProtocolTypeRouter({
     "http": get_asgi_application(),
     # Owijamy router WebSocket w middleware autoryzacyjny
     "websocket": JwtAuthMiddleware(
@@ -19,4 +21,4 @@ application = ProtocolTypeRouter({
             websocket_urlpatterns
         )
     ),
-})
\ No newline at end of file
+}))
\ No newline at end of file
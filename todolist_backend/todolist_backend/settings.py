@@ -48,6 +48,22 @@ MIDDLEWARE = [
     'court.middleware.AuditLogMiddleware',
 ]
 
+# Asynchroniczny zapis dziennika audytu (court/audit.py)
+AUDIT_LOG_WRITER = {
+    'ASYNC': True,
+    'BATCH_SIZE': 200,
+    'FLUSH_INTERVAL': 1.0,  # sekundy
+    'QUEUE_SIZE': 10000,
+    'SPOOL_PATH': BASE_DIR / 'audit_spool.ndjson',
+}
+
+# Archiwizacja starych wpisów audytu (court/audit_archive.py)
+AUDIT_LOG_ARCHIVE = {
+    'PATH': BASE_DIR / 'audit_archive',
+    'RETENTION_DAYS': 365,  # wpisy starsze trafiają do archiwum
+    'MAX_READ_ROWS': 1000,  # limit wpisów w historii obiektu/użytkownika (tabela + archiwum)
+}
+
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:3000",  
 ]
@@ -129,6 +145,54 @@ SIMPLE_JWT = {
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Magazyn plików adresowany treścią (court/blob_store.py) - dokumenty i załączniki czatu
+BLOB_STORAGE = {
+    'LOCATION': 'blobs',      # katalog w MEDIA_ROOT
+    'CHUNK_SIZE': 64 * 1024,  # bajty - odczyt uploadu przy liczeniu SHA-256
+    'COLLECT_GRACE': 3600,    # sekundy - młodszych plików bez odwołań nie usuwamy od razu
+}
+
+# Wznawialne przesyłanie w kawałkach (court/chunked_uploads.py)
+CHUNKED_UPLOADS = {
+    'CHUNK_SIZE': 8 * 1024 * 1024,            # bajty - domyślny rozmiar kawałka
+    'MIN_CHUNK_SIZE': 256 * 1024,
+    'MAX_CHUNK_SIZE': 64 * 1024 * 1024,
+    'MAX_CONCURRENCY': 4,                     # zalecana liczba równoległych PUT klienta
+    'MAX_UPLOAD_SIZE': 4 * 1024 * 1024 * 1024,
+    'SESSION_TTL': 24 * 3600,                 # sekundy bez nowego kawałka do wygaśnięcia
+    'MAX_ACTIVE_SESSIONS': 10,                # niewygasłe sesje na użytkownika
+    'MAX_USER_RESERVED_BYTES': 8 * 1024 * 1024 * 1024,     # suma rozmiarów tych sesji
+    'MAX_TOTAL_RESERVED_BYTES': 100 * 1024 * 1024 * 1024,  # wszystkie niezakończone sesje na serwerze
+}
+
+# Podglądy dokumentów w tle (court/document_previews.py) - miniatury wymagają Pillow / poppler-utils
+DOCUMENT_PREVIEWS = {
+    'ENABLED': True,
+    'WORKERS': 2,                             # procesy puli
+    'START_METHOD': 'spawn',
+    'LOCATION': 'previews',                   # katalog w MEDIA_ROOT
+    'THUMBNAIL_SIZE': 320,                    # px
+    'MAX_SOURCE_SIZE': 200 * 1024 * 1024,     # większych plików nie przetwarzamy
+    'EXCERPT_CHARS': 500,                     # fragment tekstu w API
+    'TIMEOUT': 60,                            # sekundy na pdftoppm/pdftotext
+}
+
+# Wyszukiwanie pełnotekstowe (court/search.py) - SQLite FTS5, backend wymienny
+SEARCH = {
+    'BACKEND': 'court.search.SQLiteFTSBackend',
+    'TITLE_WEIGHT': 10.0,                     # waga tytułu względem treści w bm25
+    'MAX_DOCUMENT_TEXT': 100_000,             # znaków tekstu dokumentu w indeksie
+}
+
+# Pobieranie dokumentów (court/file_delivery.py)
+DOCUMENT_DOWNLOAD = {
+    # None - pliki wysyła Django; 'x-sendfile' (Apache/lighttpd) lub 'x-accel-redirect' (nginx)
+    'SENDFILE_MODE': os.environ.get('DOCUMENT_SENDFILE_MODE') or None,
+    'ACCEL_REDIRECT_PREFIX': '/protected-media/',  # lokalizacja `internal` nginx wskazująca na MEDIA_ROOT
+    'CHUNK_SIZE': 64 * 1024,
+    'MAX_RANGES': 16,
+}
+
 # Internationalization
 # https://docs.djangoproject.com/en/5.1/topics/i18n/
 
@@ -154,8 +218,79 @@ ASGI_APPLICATION = 'todolist_backend.asgi.application'
 
 
 
-CHANNEL_LAYERS = {
-    'default': {
-        'BACKEND': 'channels.layers.InMemoryChannelLayer',
-    },
-}
\ No newline at end of file
+# Rejestr obecności użytkowników (court/presence.py), czasy w sekundach
+PRESENCE = {
+    'HEARTBEAT_TIMEOUT': 90,
+    'OFFLINE_GRACE': 5,
+    'PERSIST_INTERVAL': 2.0,
+    'BATCH_INTERVAL': 0.5,  # okno zbierania zmian statusów w jedną ramkę
+    'MAX_INTERESTS': 500,   # limit obserwowanych osób na połączenie
+}
+
+# Cache autoryzacji WebSocket (court/auth_cache.py)
+WS_AUTH_CACHE = {
+    'USER_TTL': 300,  # sekundy
+    'MAX_USERS': 10000,
+    'MAX_TOKENS': 50000,
+}
+
+# Wsadowy zapis wiadomości czatu (court/chat_writer.py)
+CHAT_WRITER = {
+    'FLUSH_INTERVAL': 0.005,  # sekundy
+    'BATCH_SIZE': 100,
+}
+
+# Liczniki nieprzeczytanych dla plakietek (court/unread_counters.py)
+UNREAD_COUNTERS = {
+    'BACKEND': 'local',          # 'local' (pamięć procesu) lub 'cache' (CACHES[CACHE_ALIAS], np. Redis)
+    'CACHE_ALIAS': 'default',
+    'RECONCILE_INTERVAL': 300,   # sekundy - po tym czasie licznik jest liczony od nowa z bazy
+    'MAX_USERS': 10000,
+}
+
+# Outbox powiadomień WebSocket - wysyłka po zatwierdzeniu transakcji (court/notification_outbox.py)
+NOTIFICATION_OUTBOX = {
+    'BATCH_SIZE': 100,
+    'POLL_INTERVAL': 1.0,   # sekundy - sprawdzanie kolejki, gdy nic nie obudziło dispatchera
+    'LEASE': 30,            # sekundy - rezerwacja partii przez jeden proces
+    'MAX_ATTEMPTS': 5,
+    'RETRY_BACKOFF': 2.0,   # kolejna próba po RETRY_BACKOFF ** attempts sekund
+    'MAX_AGE': 3600,        # sekundy - starsze wpisy są usuwane bez wysyłki
+    'RUN_IN_SERVER': True,  # dispatcher w procesie ASGI; False = tylko komenda dispatch_notification_outbox
+}
+
+# Masowe powiadomienia (court/notification_fanout.py)
+NOTIFICATION_FANOUT = {
+    'BATCH_SIZE': 1000,     # powiadomień na jeden bulk_create
+}
+
+# Channel layer wybierany zmienną środowiskową CHANNEL_LAYER_BACKEND:
+#   memory - jeden proces (domyślnie, development)
+#   sqlite - kilka workerów na jednej maszynie, bez zewnętrznych usług (court/channel_layers.py)
+#   redis  - wiele maszyn (REDIS_URL)
+CHANNEL_LAYER_BACKEND = os.environ.get('CHANNEL_LAYER_BACKEND', 'memory')
+
+if CHANNEL_LAYER_BACKEND == 'redis':
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'channels_redis.core.RedisChannelLayer',
+            'CONFIG': {
+                'hosts': [os.environ.get('REDIS_URL', 'redis://127.0.0.1:6379')],
+            },
+        },
+    }
+elif CHANNEL_LAYER_BACKEND == 'sqlite':
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'court.channel_layers.SQLiteChannelLayer',
+            'CONFIG': {
+                'path': os.environ.get('CHANNEL_LAYER_PATH', str(BASE_DIR / 'channel_layer.sqlite3')),
+            },
+        },
+    }
+else:
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'channels.layers.InMemoryChannelLayer',
+        },
+    }
\ No newline at end of file